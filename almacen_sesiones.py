@@ -0,0 +1,280 @@
+"""
+Almacén de sesiones de revisión para la aplicación web.
+Cada análisis se guarda en una base SQLite compartida por todos los procesos
+del servidor: las correcciones son filas indexadas por categoría y párrafo,
+de modo que una página de revisión lee solo lo que muestra y la aplicación
+de cambios carga solo las correcciones aprobadas. Con cada sesión se guarda
+el índice por categoría calculado al analizar (recuentos, rangos de IDs y
+posiciones por párrafo), así que navegar no exige recorrer las correcciones.
+El documento subido y el corregido se guardan también aquí (como BLOB): el
+flujo web no escribe archivos en uploads/ ni en outputs/.
+"""
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+import json
+import os
+import sqlite3
+import time
+
+from corrector_integrado import Correccion, CorrectorIntegrado
+from ediciones import ventana_contexto
+
+
+# Versión del esquema (PRAGMA user_version): si cambia, las sesiones antiguas
+# se descartan (son temporales) y se recrean las tablas
+VERSION_ESQUEMA = 4
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sesiones (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    creada REAL NOT NULL,
+    indice TEXT NOT NULL,
+    documento BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resultados (
+    nombre TEXT PRIMARY KEY,
+    contenido BLOB NOT NULL,
+    creado REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parrafos (
+    sesion_id TEXT NOT NULL,
+    parte TEXT NOT NULL,
+    num INTEGER NOT NULL,
+    texto TEXT NOT NULL,
+    PRIMARY KEY (sesion_id, parte, num)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS correcciones (
+    sesion_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    categoria TEXT NOT NULL,
+    posicion INTEGER NOT NULL,
+    tipo TEXT NOT NULL,
+    texto_original TEXT NOT NULL,
+    texto_nuevo TEXT NOT NULL,
+    explicacion TEXT NOT NULL,
+    confianza REAL NOT NULL,
+    parte TEXT NOT NULL,
+    parrafo_num INTEGER NOT NULL,
+    inicio INTEGER,
+    fin INTEGER,
+    contexto TEXT,
+    PRIMARY KEY (sesion_id, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS correcciones_categoria
+    ON correcciones (sesion_id, categoria, posicion);
+CREATE INDEX IF NOT EXISTS correcciones_parrafo
+    ON correcciones (sesion_id, parte, parrafo_num);
+"""
+
+COLUMNAS = ('id, categoria, tipo, texto_original, texto_nuevo, explicacion, confianza, '
+            'parte, parrafo_num, inicio, fin, contexto')
+
+# Límite de parámetros por consulta en versiones antiguas de SQLite
+MAX_PARAMETROS = 900
+
+# Los documentos corregidos se conservan este tiempo para su descarga
+DURACION_RESULTADOS = 24 * 3600
+
+
+class AlmacenSesiones:
+    """Sesiones de revisión (documento + correcciones) en una base SQLite."""
+
+    def __init__(self, ruta: str):
+        """
+        Args:
+            ruta: Archivo de la base de datos (se crea si no existe)
+        """
+        self.ruta = ruta
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        with self._conectar() as conexion:
+            # WAL: los lectores (páginas de revisión) no esperan a los escritores
+            conexion.execute('PRAGMA journal_mode=WAL')
+            version = conexion.execute('PRAGMA user_version').fetchone()[0]
+            if version != VERSION_ESQUEMA:
+                for tabla in ('correcciones', 'parrafos', 'sesiones', 'resultados'):
+                    conexion.execute(f'DROP TABLE IF EXISTS {tabla}')
+            conexion.executescript(ESQUEMA)
+            conexion.execute(f'PRAGMA user_version = {VERSION_ESQUEMA}')
+
+    @contextmanager
+    def _conectar(self):
+        """Conexión corta por operación (válida en cualquier hilo o proceso)."""
+        conexion = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            with conexion:
+                yield conexion
+        finally:
+            conexion.close()
+
+    # ═══════════════════════════════════════════════════════════════
+    # ESCRITURA
+    # ═══════════════════════════════════════════════════════════════
+    def guardar(self, sesion_id: str, filename: str, documento: bytes,
+                correcciones: List[Correccion], indice: Optional[Dict[str, Dict]] = None):
+        """
+        Guarda una sesión completa en una sola transacción.
+        Solo se guardan los párrafos que tienen alguna corrección (de ellos se
+        deriva el contexto que muestra la revisión).
+        
+        Args:
+            documento: Contenido del .docx analizado
+            correcciones: Correcciones en orden de documento
+            indice: Índice por categoría del análisis (CorrectorIntegrado.indice_categorias);
+                    si falta se calcula aquí
+        """
+        if indice is None:
+            indice = CorrectorIntegrado.indexar_por_categoria(correcciones)
+        filas = []
+        parrafos = {}
+        posiciones = {}
+        for corr in correcciones:
+            posicion = posiciones.get(corr.categoria, 0)
+            posiciones[corr.categoria] = posicion + 1
+            filas.append((
+                sesion_id, corr.id, corr.categoria, posicion, corr.tipo, corr.texto_original,
+                corr.texto_nuevo, corr.explicacion, corr.confianza, corr.parte, corr.parrafo_num,
+                corr.inicio, corr.fin, corr._contexto
+            ))
+            clave = (corr.parte, corr.parrafo_num)
+            if clave not in parrafos:
+                texto = corr._texto_parrafo()
+                if texto is not None:
+                    parrafos[clave] = texto
+
+        with self._conectar() as conexion:
+            self._borrar(conexion, sesion_id)
+            conexion.execute('INSERT INTO sesiones (id, filename, creada, indice, documento) '
+                             'VALUES (?, ?, ?, ?, ?)',
+                             (sesion_id, filename, time.time(),
+                              json.dumps(indice, separators=(',', ':')), sqlite3.Binary(documento)))
+            conexion.executemany('INSERT INTO parrafos (sesion_id, parte, num, texto) VALUES (?, ?, ?, ?)',
+                                 ((sesion_id, parte, num, texto)
+                                  for (parte, num), texto in parrafos.items()))
+            conexion.executemany('INSERT INTO correcciones (sesion_id, id, categoria, posicion, tipo, '
+                                 'texto_original, texto_nuevo, explicacion, confianza, parte, '
+                                 'parrafo_num, inicio, fin, contexto) '
+                                 'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                 filas)
+
+    def eliminar(self, sesion_id: str):
+        """Borra la sesión y todas sus correcciones."""
+        with self._conectar() as conexion:
+            self._borrar(conexion, sesion_id)
+
+    def guardar_resultado(self, nombre: str, contenido: bytes):
+        """Guarda un documento corregido para descargarlo (y purga los caducados)."""
+        ahora = time.time()
+        with self._conectar() as conexion:
+            conexion.execute('DELETE FROM resultados WHERE creado < ?', (ahora - DURACION_RESULTADOS,))
+            conexion.execute('INSERT OR REPLACE INTO resultados (nombre, contenido, creado) VALUES (?, ?, ?)',
+                             (nombre, sqlite3.Binary(contenido), ahora))
+
+    @staticmethod
+    def _borrar(conexion: sqlite3.Connection, sesion_id: str):
+        for tabla, columna in (('correcciones', 'sesion_id'), ('parrafos', 'sesion_id'),
+                               ('sesiones', 'id')):
+            conexion.execute(f'DELETE FROM {tabla} WHERE {columna} = ?', (sesion_id,))
+
+    # ═══════════════════════════════════════════════════════════════
+    # LECTURA
+    # ═══════════════════════════════════════════════════════════════
+    def obtener(self, sesion_id: str) -> Optional[Dict]:
+        """
+        Datos de la sesión (filename e índice por categoría) o None si no
+        existe. No lee ninguna corrección ni el documento.
+        """
+        with self._conectar() as conexion:
+            fila = conexion.execute('SELECT filename, indice FROM sesiones WHERE id = ?',
+                                    (sesion_id,)).fetchone()
+        if fila is None:
+            return None
+        return {'filename': fila[0], 'indice': json.loads(fila[1])}
+
+    def documento(self, sesion_id: str) -> Optional[bytes]:
+        """Contenido del .docx de la sesión, o None si no existe."""
+        with self._conectar() as conexion:
+            fila = conexion.execute('SELECT documento FROM sesiones WHERE id = ?',
+                                    (sesion_id,)).fetchone()
+        return bytes(fila[0]) if fila is not None else None
+
+    def resultado(self, nombre: str) -> Optional[bytes]:
+        """Documento corregido guardado con `guardar_resultado`, o None."""
+        with self._conectar() as conexion:
+            fila = conexion.execute('SELECT contenido FROM resultados WHERE nombre = ?',
+                                    (nombre,)).fetchone()
+        return bytes(fila[0]) if fila is not None else None
+
+    def correcciones_de_categoria(self, sesion_id: str, categoria: str,
+                                  desplazamiento: int = 0, limite: Optional[int] = None) -> List[Correccion]:
+        """
+        Correcciones de una categoría en orden de documento (opcionalmente un
+        tramo). El tramo se busca por posición dentro de la categoría, así que
+        el coste depende del tamaño del tramo y no de dónde empieza.
+        """
+        desplazamiento = max(desplazamiento, 0)
+        hasta = desplazamiento + limite if limite is not None else 2 ** 62
+        with self._conectar() as conexion:
+            filas = conexion.execute(
+                f'SELECT {COLUMNAS} FROM correcciones WHERE sesion_id = ? AND categoria = ? '
+                f'AND posicion >= ? AND posicion < ? ORDER BY posicion',
+                (sesion_id, categoria, desplazamiento, hasta)).fetchall()
+            return self._construir(conexion, sesion_id, filas)
+
+    def ids_de_categoria(self, sesion_id: str, categoria: str) -> List[int]:
+        """IDs de todas las correcciones de una categoría (para aprobarlas en bloque)."""
+        with self._conectar() as conexion:
+            return [fila[0] for fila in conexion.execute(
+                'SELECT id FROM correcciones WHERE sesion_id = ? AND categoria = ? ORDER BY posicion',
+                (sesion_id, categoria))]
+
+    def correcciones_por_ids(self, sesion_id: str, ids: Iterable[int]) -> List[Correccion]:
+        """Correcciones con los IDs dados, en orden de documento."""
+        ids = sorted(set(ids))
+        filas = []
+        with self._conectar() as conexion:
+            for k in range(0, len(ids), MAX_PARAMETROS):
+                tramo = ids[k:k + MAX_PARAMETROS]
+                filas.extend(conexion.execute(
+                    f'SELECT {COLUMNAS} FROM correcciones WHERE sesion_id = ? '
+                    f'AND id IN ({", ".join("?" * len(tramo))}) ORDER BY id',
+                    (sesion_id, *tramo)))
+            return self._construir(conexion, sesion_id, filas)
+
+    @staticmethod
+    def _construir(conexion: sqlite3.Connection, sesion_id: str, filas) -> List[Correccion]:
+        """
+        Reconstruye objetos Correccion leyendo solo los párrafos que necesitan.
+        El contexto se calcula aquí, como haría Correccion con el texto completo.
+        """
+        por_parte = {}
+        for fila in filas:
+            por_parte.setdefault(fila[7], set()).add(fila[8])
+        textos = {}
+        for parte, nums in por_parte.items():
+            nums = sorted(nums)
+            for k in range(0, len(nums), MAX_PARAMETROS):
+                tramo = nums[k:k + MAX_PARAMETROS]
+                for num, texto in conexion.execute(
+                        f'SELECT num, texto FROM parrafos WHERE sesion_id = ? AND parte = ? '
+                        f'AND num IN ({", ".join("?" * len(tramo))})',
+                        (sesion_id, parte, *tramo)):
+                    textos[parte, num] = texto
+
+        correcciones = []
+        for (id_, categoria, tipo, original, nuevo, explicacion, confianza,
+             parte, parrafo_num, inicio, fin, contexto) in filas:
+            texto = textos.get((parte, parrafo_num))
+            antes = despues = ""
+            if texto is not None:
+                if contexto is None:
+                    contexto = texto[:100] + "..." if len(texto) > 100 else texto
+                if inicio is not None:
+                    antes, despues = ventana_contexto(texto, inicio, fin)
+            corr = Correccion(categoria, tipo, original, nuevo, explicacion, confianza,
+                              contexto or "", parrafo_num, inicio, fin, antes, despues, parte)
+            corr.id = id_
+            correcciones.append(corr)
+        return correcciones
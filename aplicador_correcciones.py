@@ -2,13 +2,11 @@
 Aplicador de correcciones aprobadas con Track Changes en azul.
 Preserva el formato original del documento.
 """
-from xml_handler import DocxXMLHandler, NAMESPACES
+from xml_handler import DocxXMLHandler, Documento, IndiceRuns, NAMESPACES, PARTE_DOCUMENTO
+from ediciones import Edicion, recortar_edicion, resolver_conflictos
 from lxml import etree
 from datetime import datetime
-from typing import List, Dict
-import json
-import tempfile
-import shutil
+from typing import BinaryIO, List, Dict, Optional, Union
 from copy import deepcopy
 
 
@@ -19,6 +17,7 @@ class AplicadorCorrecciones:
         self.autor = autor
         self.color_aprobado = "0000FF"  # Azul (mejor legibilidad que verde)
         self.revision_id = 1
+        self.conflictos: List[Dict] = []  # Correcciones no aplicadas en la última llamada
     
     def crear_track_change_verde(self, texto: str, formato_original: etree.Element = None) -> etree.Element:
         """
@@ -71,162 +70,316 @@ class AplicadorCorrecciones:
         self.revision_id += 1
         return w_ins
     
-    def crear_eliminacion(self, texto: str, formato: etree.Element = None) -> etree.Element:
+    # ═══════════════════════════════════════════════════════════════
+    # TRACK CHANGES POR DESPLAZAMIENTO (conservando los runs)
+    # ═══════════════════════════════════════════════════════════════
+    @staticmethod
+    def _dividir_run(w_t: etree.Element, k: int) -> Optional[etree.Element]:
         """
-        Crea un w:del (eliminación).
+        Corta el run de `w_t` justo antes del carácter k de su texto: lo que
+        sigue pasa a un run nuevo con una copia del mismo formato (rPr).
+        Devuelve el w:t que empieza en el corte, o None si el corte cae al
+        final del texto.
         """
-        w_del = etree.Element(f"{{{NAMESPACES['w']}}}del")
-        w_del.set(f"{{{NAMESPACES['w']}}}id", str(self.revision_id))
-        w_del.set(f"{{{NAMESPACES['w']}}}author", self.autor)
-        w_del.set(f"{{{NAMESPACES['w']}}}date", datetime.now().isoformat())
-        self.revision_id += 1
+        run = w_t.getparent()
+        texto = w_t.text or ''
+        anterior = w_t.getprevious()  # w:rPr, si existe, es siempre el primer hijo
+        
+        if k == 0 and (anterior is None or anterior.tag == f'{{{NAMESPACES["w"]}}}rPr'):
+            return w_t  # El run ya empieza aquí
+        if k >= len(texto) and w_t.getnext() is None:
+            return None  # El run ya termina aquí
         
-        w_r = etree.SubElement(w_del, f"{{{NAMESPACES['w']}}}r")
+        siguientes = list(w_t.itersiblings())
         
+        nuevo_run = etree.Element(run.tag, attrib=dict(run.attrib))
+        formato = run.find(f'{{{NAMESPACES["w"]}}}rPr')
         if formato is not None:
-            w_r.append(formato)
+            nuevo_run.append(deepcopy(formato))
         
-        w_delText = etree.SubElement(w_r, f"{{{NAMESPACES['w']}}}delText")
-        w_delText.set("{http://www.w3.org/XML/1998/namespace}space", "preserve")
-        w_delText.text = texto
+        cola = None
+        if k == 0:
+            cola = w_t
+            nuevo_run.append(w_t)
+        elif k < len(texto):
+            cola = etree.SubElement(nuevo_run, f'{{{NAMESPACES["w"]}}}t')
+            cola.set('{http://www.w3.org/XML/1998/namespace}space', 'preserve')
+            cola.text = texto[k:]
+            w_t.text = texto[:k]
+            w_t.set('{http://www.w3.org/XML/1998/namespace}space', 'preserve')
+        for hermano in siguientes:
+            nuevo_run.append(hermano)
         
-        return w_del
+        run.addnext(nuevo_run)
+        return cola
+    
+    def _cortar(self, indice: IndiceRuns, posicion: int) -> Optional[etree.Element]:
+        """
+        Asegura un límite de run en `posicion` y devuelve el w:t que empieza
+        ahí (None si es el final del párrafo).
+        """
+        n = indice.buscar(posicion)
+        if n < 0:
+            return None
+        inicio, _, w_t, _, _ = indice.segmentos[n]
+        return self._dividir_run(w_t, posicion - inicio)
     
-    def aplicar_correccion_a_parrafo(self, parrafo: etree.Element, texto_original: str, texto_nuevo: str):
+    def _marcar_edicion(self, indice: IndiceRuns, edicion: Edicion):
         """
-        Aplica una corrección a un párrafo específico.
-        Preserva el formato del primer run encontrado.
+        Marca una edición con Track Changes: divide solo los runs de los
+        extremos, envuelve en w:del los runs afectados (con su formato
+        intacto) y añade detrás un w:ins con el formato del primero.
         """
-        # Obtener solo los runs que son HIJOS DIRECTOS del párrafo
-        runs = parrafo.findall(f'{{{NAMESPACES["w"]}}}r')
+        inicio, fin, nuevo = edicion
+        w = NAMESPACES['w']
+        
+        segmentos = indice.segmentos
+        if fin > inicio:
+            self._cortar(indice, fin)
+        primero = self._cortar(indice, inicio)
         
-        if not runs:
-            return
+        # w:t del tramo [inicio, fin): el del corte y los que empiezan dentro
+        textos = [primero] if primero is not None and fin > inicio else []
+        n = indice.siguiente(inicio)
+        while n < len(segmentos) and segmentos[n][0] < fin:
+            if segmentos[n][1] > segmentos[n][0]:
+                textos.append(segmentos[n][2])
+            n += 1
         
-        # Extraer formato del primer run (fuente, tamaño, etc.)
-        primer_run = runs[0]
-        formato_original = primer_run.find(f'{{{NAMESPACES["w"]}}}rPr')
+        runs = []
+        for w_t in textos:
+            run = w_t.getparent()
+            if not runs or runs[-1] is not run:
+                runs.append(run)
         
-        # Eliminar todos los runs existentes (solo hijos directos)
+        # Formato de la inserción: el del texto sustituido o, si solo se
+        # inserta, el del run anterior (o el siguiente, al inicio del párrafo)
+        anterior = indice.buscar(inicio - 1) if inicio > 0 else -1
+        if runs:
+            referencia = runs[0]
+        else:
+            referencia = segmentos[anterior][2].getparent() if anterior >= 0 else (
+                primero.getparent() if primero is not None else None)
+        formato = referencia.find(f'{{{w}}}rPr') if referencia is not None else None
+        
+        # Eliminación: un w:del por grupo de runs contiguos del mismo padre
+        ultimo = None
         for run in runs:
-            try:
-                parrafo.remove(run)
-            except ValueError:
-                pass  # Si no es hijo directo, ignorar
-        
-        # Encontrar la diferencia exacta entre texto_original y texto_nuevo
-        # para mostrar solo la parte que cambia
-        prefix_len = 0
-        suffix_len = 0
-        min_len = min(len(texto_original), len(texto_nuevo))
-        
-        # Encontrar prefijo común
-        while prefix_len < min_len and texto_original[prefix_len] == texto_nuevo[prefix_len]:
-            prefix_len += 1
-        
-        # Encontrar sufijo común
-        while suffix_len < min_len - prefix_len and \
-              texto_original[len(texto_original) - 1 - suffix_len] == texto_nuevo[len(texto_nuevo) - 1 - suffix_len]:
-            suffix_len += 1
-        
-        # Extraer las partes
-        prefix = texto_original[:prefix_len]
-        texto_eliminado = texto_original[prefix_len:len(texto_original) - suffix_len if suffix_len > 0 else len(texto_original)]
-        texto_insertado = texto_nuevo[prefix_len:len(texto_nuevo) - suffix_len if suffix_len > 0 else len(texto_nuevo)]
-        suffix = texto_original[len(texto_original) - suffix_len:] if suffix_len > 0 else ""
-        
-        # 1. Añadir prefijo sin cambios (run normal)
-        if prefix:
-            w_r_prefix = etree.SubElement(parrafo, f'{{{NAMESPACES["w"]}}}r')
-            if formato_original is not None:
-                w_r_prefix.append(deepcopy(formato_original))
-            w_t_prefix = etree.SubElement(w_r_prefix, f'{{{NAMESPACES["w"]}}}t')
-            w_t_prefix.set('{http://www.w3.org/XML/1998/namespace}space', 'preserve')
-            w_t_prefix.text = prefix
-        
-        # 2. Track Change de eliminación (SOLO la parte específica que cambia)
-        if texto_eliminado:
-            w_del = etree.Element(f'{{{NAMESPACES["w"]}}}del')
-            w_del.set(f'{{{NAMESPACES["w"]}}}id', str(self.revision_id))
-            w_del.set(f'{{{NAMESPACES["w"]}}}author', self.autor)
-            w_del.set(f'{{{NAMESPACES["w"]}}}date', datetime.now().isoformat())
+            for w_t in run.findall(f'{{{w}}}t'):
+                w_t.tag = f'{{{w}}}delText'
+            if ultimo is not None and ultimo.getnext() is run:
+                ultimo.append(run)
+                continue
+            w_del = etree.Element(f'{{{w}}}del')
+            w_del.set(f'{{{w}}}id', str(self.revision_id))
+            w_del.set(f'{{{w}}}author', self.autor)
+            w_del.set(f'{{{w}}}date', datetime.now().isoformat())
             self.revision_id += 1
-            
-            w_r_del = etree.SubElement(w_del, f'{{{NAMESPACES["w"]}}}r')
-            
-            if formato_original is not None:
-                w_r_del.append(deepcopy(formato_original))
-            
-            w_delText = etree.SubElement(w_r_del, f'{{{NAMESPACES["w"]}}}delText')
-            w_delText.set('{http://www.w3.org/XML/1998/namespace}space', 'preserve')
-            w_delText.text = texto_eliminado
-            
-            parrafo.append(w_del)
-        
-        # 3. Track Change de inserción (SOLO la parte nueva)
-        if texto_insertado:
-            w_ins = self.crear_track_change_verde(texto_insertado, formato_original)
-            parrafo.append(w_ins)
-        
-        # 4. Añadir sufijo sin cambios (run normal)
-        if suffix:
-            w_r_suffix = etree.SubElement(parrafo, f'{{{NAMESPACES["w"]}}}r')
-            if formato_original is not None:
-                w_r_suffix.append(deepcopy(formato_original))
-            w_t_suffix = etree.SubElement(w_r_suffix, f'{{{NAMESPACES["w"]}}}t')
-            w_t_suffix.set('{http://www.w3.org/XML/1998/namespace}space', 'preserve')
-            w_t_suffix.text = suffix
+            run.addprevious(w_del)
+            w_del.append(run)
+            ultimo = w_del
+        
+        # Inserción, justo detrás de lo eliminado o, si solo se inserta, tras
+        # el run que termina en `inicio` (el último si inicio es el final del
+        # texto). Con el índice ya desfasado por una edición posterior en el
+        # mismo punto, _cortar puede no devolver nada: se ancla igualmente al
+        # carácter anterior, que ninguna edición posterior ha tocado.
+        if nuevo:
+            w_ins = self.crear_track_change_verde(nuevo, formato)
+            if ultimo is not None:
+                ultimo.addnext(w_ins)
+            elif anterior >= 0:
+                self._fuera_de_revision(segmentos[anterior][2].getparent()).addnext(w_ins)
+            elif primero is not None:
+                self._fuera_de_revision(primero.getparent()).addprevious(w_ins)
+    
+    @staticmethod
+    def _fuera_de_revision(run: etree.Element) -> etree.Element:
+        """
+        El run o, si está dentro de un w:del/w:ins, esa revisión: un w:ins
+        nuevo no puede quedar anidado en otra revisión.
+        """
+        padre = run.getparent()
+        if padre is not None and padre.tag in (f'{{{NAMESPACES["w"]}}}del',
+                                               f'{{{NAMESPACES["w"]}}}ins'):
+            return padre
+        return run
     
-    def aplicar_correcciones(self, ruta_entrada: str, ruta_salida: str, 
-                           correcciones_aprobadas: Dict[int, Dict]):
+    def aplicar_ediciones_a_parrafo(self, parrafo: etree.Element, texto: str,
+                                    ediciones: List[Edicion],
+                                    indice: Optional[IndiceRuns] = None) -> List[int]:
+        """
+        Marca con Track Changes las ediciones (inicio, fin, reemplazo) sobre
+        el texto original del párrafo, conservando los runs y su formato:
+        solo se dividen los runs de los extremos de cada edición, y cada una
+        produce su propio par w:del/w:ins.
+        
+        Las ediciones se recortan primero a lo que cambian, de modo que una
+        corrección de párrafo completo no choca con las de sus palabras; las
+        que aun así se solapan con otra se descartan (resolver_conflictos).
+        
+        Args:
+            indice: Índice de desplazamientos del párrafo, si ya se tiene
+                    (DocxXMLHandler.indice_parrafo); si no, se construye
+        
+        Returns:
+            Posiciones en `ediciones` de las descartadas por conflicto
+        """
+        if indice is None:
+            indice = IndiceRuns(parrafo)
+        
+        recortadas = []
+        origen = []
+        for n, edicion in enumerate(ediciones):
+            recortada = recortar_edicion(texto, edicion)
+            if recortada is not None:
+                recortadas.append(recortada)
+                origen.append(n)
+        aceptadas, rechazadas = resolver_conflictos(recortadas)
+        
+        # De la última a la primera: los cortes de una edición solo afectan a
+        # runs posteriores, así que el índice sigue valiendo para las anteriores
+        for n in reversed(aceptadas):
+            self._marcar_edicion(indice, recortadas[n])
+        return [origen[n] for n in rechazadas]
+    
+    def aplicar_correccion_a_parrafo(self, parrafo: etree.Element, texto_original: str,
+                                     texto_nuevo: str):
+        """
+        Compatibilidad: marca el paso de texto_original (el del párrafo) a
+        texto_nuevo como una sola edición. Se reduce a la parte que cambia y
+        se marca sin rehacer el párrafo (ver aplicar_ediciones_a_parrafo).
+        """
+        self.aplicar_ediciones_a_parrafo(parrafo, texto_original,
+                                         [(0, len(texto_original), texto_nuevo)])
+    
+    def _edicion_de_correccion(self, texto: str, corr: Dict) -> Optional[Edicion]:
+        """
+        Convierte una corrección aprobada en una edición (inicio, fin, reemplazo).
+        Usa los desplazamientos de la corrección si coinciden con el texto actual;
+        si no los tiene (p. ej. detecciones de estilo), busca su primera aparición.
+        """
+        inicio, fin = corr.get('inicio'), corr.get('fin')
+        if inicio is not None and fin is not None and texto[inicio:fin] == corr['texto_original']:
+            return (inicio, fin, corr['texto_nuevo'])
+        
+        pos = texto.find(corr['texto_original']) if corr['texto_original'] else -1
+        if pos < 0:
+            return None
+        return (pos, pos + len(corr['texto_original']), corr['texto_nuevo'])
+    
+    def _anotar_conflicto(self, corr_id: int, corr: Dict, motivo: str):
+        """Registra una corrección aprobada que no se pudo aplicar y el motivo."""
+        self.conflictos.append({
+            'id': corr_id,
+            'parte': corr.get('parte', PARTE_DOCUMENTO),
+            'parrafo_num': corr['parrafo_num'],
+            'texto_original': corr['texto_original'],
+            'texto_nuevo': corr['texto_nuevo'],
+            'motivo': motivo,
+        })
+    
+    def aplicar_correcciones(self, ruta_entrada: Documento,
+                             ruta_salida: Optional[Union[str, BinaryIO]],
+                             correcciones_aprobadas: Dict[int, Dict]) -> Optional[bytes]:
         """
         Aplica solo las correcciones aprobadas al documento.
-        VERSIÓN SIMPLIFICADA: Solo marca el párrafo completo con el texto corregido.
+        Cada corrección se traduce a una edición por desplazamiento sobre el texto
+        original del párrafo y se marca en su sitio, sin rehacer el párrafo.
+        
+        Args:
+            ruta_entrada: Ruta, bytes o archivo binario del .docx original
+            ruta_salida: Ruta o archivo binario de destino; con None el
+                         documento corregido se devuelve en bytes
+            correcciones_aprobadas: Correcciones por ID; cada una indica su
+                                    'parte' (por defecto el cuerpo) y 'parrafo_num'
+        
+        Returns:
+            El documento corregido si ruta_salida es None. Las correcciones
+            que no pudieron aplicarse quedan en self.conflictos
         """
         print(f"\n📄 Aplicando {len(correcciones_aprobadas)} correcciones...")
+        self.conflictos = []
         
         with DocxXMLHandler(ruta_entrada) as handler:
-            parrafos = handler.obtener_parrafos()
-            
-            # Agrupar por párrafo
+            # Agrupar por (parte, párrafo): las correcciones de encabezados,
+            # notas o comentarios se escriben en su propia parte XML
             corr_por_parrafo = {}
             for corr_id, corr_data in correcciones_aprobadas.items():
-                p_num = corr_data['parrafo_num']
-                if p_num not in corr_por_parrafo:
-                    corr_por_parrafo[p_num] = []
-                corr_por_parrafo[p_num].append(corr_data)
+                clave = (corr_data.get('parte', PARTE_DOCUMENTO), corr_data['parrafo_num'])
+                if clave not in corr_por_parrafo:
+                    corr_por_parrafo[clave] = []
+                corr_por_parrafo[clave].append((corr_id, corr_data))
+            
+            partes_existentes = set(handler.partes())
+            parrafos_por_parte = {}
             
             # Procesar cada párrafo
-            for p_num, correcciones in corr_por_parrafo.items():
+            for (parte, p_num), correcciones in corr_por_parrafo.items():
+                if parte in partes_existentes and parte not in parrafos_por_parte:
+                    parrafos_por_parte[parte] = handler.obtener_parrafos(parte)
+                parrafos = parrafos_por_parte.get(parte, [])
                 if p_num >= len(parrafos):
+                    for corr_id, corr in correcciones:
+                        self._anotar_conflicto(corr_id, corr, 'no_encontrada')
                     continue
                 
                 parrafo = parrafos[p_num]
-                texto_original = handler.obtener_texto_parrafo(parrafo)
+                indice = handler.indice_parrafo(parrafo)
+                texto_original = indice.texto
                 
                 if not texto_original.strip():
                     continue
                 
-                # Aplicar TODAS las correcciones a este párrafo
-                texto_corregido = texto_original
-                for corr in correcciones:
-                    # Reemplazar cada ocurrencia
-                    texto_corregido = texto_corregido.replace(
-                        corr['texto_original'],
-                        corr['texto_nuevo'],
-                        1  # Solo primera ocurrencia
-                    )
-                
-                # Solo si hubo cambio real
-                if texto_corregido != texto_original:
-                    # Usar el método que hace diff y muestra solo la parte que cambia
-                    self.aplicar_correccion_a_parrafo(parrafo, texto_original, texto_corregido)
+                # Marcar TODAS las correcciones de este párrafo en un único paso
+                ediciones = []
+                ids_ediciones = []
+                for corr_id, corr in correcciones:
+                    edicion = self._edicion_de_correccion(texto_original, corr)
+                    if edicion is None:
+                        self._anotar_conflicto(corr_id, corr, 'no_encontrada')
+                        continue
+                    ediciones.append(edicion)
+                    ids_ediciones.append((corr_id, corr))
+                for n in self.aplicar_ediciones_a_parrafo(parrafo, texto_original, ediciones, indice):
+                    self._anotar_conflicto(*ids_ediciones[n], 'solapada')
+                handler.invalidar_indice(parrafo)
+                if ediciones:
+                    handler.marcar_modificada(parte)
+            
+            if self.conflictos:
+                print(f"⚠️  {len(self.conflictos)} correcciones no aplicadas (conflicto o texto no encontrado)")
             
+            if ruta_salida is None:
+                contenido = handler.guardar_en_bytes()
+                print(f"✅ Documento corregido en memoria ({len(contenido)} bytes)")
+                return contenido
             handler.guardar(ruta_salida)
         
         print(f"✅ Documento guardado: {ruta_salida}")
+        return None
+
+
+def test_aplicador():
+    """Test del aplicador: inserción y sustitución en el mismo desplazamiento."""
+    print("Test de AplicadorCorrecciones...")
+    w = NAMESPACES['w']
+    
+    def aplicar(runs, ediciones):
+        xml = ''.join(f'<w:r><w:t xml:space="preserve">{r}</w:t></w:r>' for r in runs)
+        parrafo = etree.fromstring(f'<w:p xmlns:w="{w}">{xml}</w:p>')
+        AplicadorCorrecciones().aplicar_ediciones_a_parrafo(parrafo, ''.join(runs), ediciones)
+        # Texto aceptando los cambios: todo w:t (los eliminados pasan a w:delText)
+        return ''.join(t.text or '' for t in parrafo.iter(f'{{{w}}}t'))
+    
+    assert aplicar(['abcdefghij', ' tail end'], [(5, 5, ','), (5, 8, 'XYZW')]) == 'abcde,XYZWij tail end'
+    assert aplicar(['uno dos', ' tres cuatro'], [(4, 4, ' '), (4, 7, 'DOS')]) == 'uno  DOS tres cuatro'
+    assert aplicar(['hola', ' mundo'], [(0, 0, '¡'), (0, 1, 'H')]) == '¡Hola mundo'
+    assert aplicar(['hola', ' mundo'], [(10, 10, '!')]) == 'hola mundo!'
+    print("✓ Inserciones en el mismo punto que una sustitución")
+    
+    print("✓ Tests básicos pasados")
 
 
 if __name__ == '__main__':
-    aplicador = AplicadorCorrectoriones()
-    print("✓ Aplicador inicializado")
+    test_aplicador()
@@ -4,6 +4,7 @@ from pathlib import Path
 from datetime import datetime
 import pandas as pd
 import difflib
+import html
 
 # Importar lógica de corrección avanzada
 from corrector_integrado import CorrectorIntegrado
@@ -97,6 +98,14 @@ def get_diff_html(old, new):
             
     return result_old, result_new
 
+def get_span_html(c):
+    """Genera HTML resaltado para una corrección localizada por desplazamiento."""
+    antes = html.escape(c.contexto_antes)
+    despues = html.escape(c.contexto_despues)
+    result_old = f'{antes}<span class="del">{html.escape(c.texto_original)}</span>{despues}'
+    result_new = f'{antes}<span class="ins">{html.escape(c.texto_nuevo)}</span>{despues}'
+    return result_old, result_new
+
 # ---------------------------------------------------------
 # INTERFAZ PRINCIPAL
 # ---------------------------------------------------------
@@ -196,7 +205,10 @@ if 'correcciones_por_cat' in st.session_state:
             
             for idx, c in enumerate(corrs):
                     # Generar HTML con colores
-                    html_old, html_new = get_diff_html(c.texto_original, c.texto_nuevo)
+                    if c.inicio is not None:
+                        html_old, html_new = get_span_html(c)
+                    else:
+                        html_old, html_new = get_diff_html(c.texto_original, c.texto_nuevo)
                     
                     st.markdown(f"""
                     <div style="margin-bottom: 20px; border-bottom: 1px solid #f0f0f0; padding-bottom: 10px;">
@@ -231,10 +243,16 @@ if 'correcciones_por_cat' in st.session_state:
                     dict_aprobadas[c.id] = {
                         'texto_original': c.texto_original,
                         'texto_nuevo': c.texto_nuevo,
-                        'parrafo_num': c.parrafo_num
+                        'parte': c.parte,
+                        'parrafo_num': c.parrafo_num,
+                        'inicio': c.inicio,
+                        'fin': c.fin
                     }
                 
                 aplicador.aplicar_correcciones(input_path, str(output_path), dict_aprobadas)
+                if aplicador.conflictos:
+                    st.warning(f"⚠️ {len(aplicador.conflictos)} correcciones no se aplicaron "
+                               "(se solapaban con otra o su texto ya no estaba).")
                 
                 with open(output_path, "rb") as f:
                     st.download_button(
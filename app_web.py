@@ -2,17 +2,24 @@
 Web App para corrección ortotipográfica con revisión interactiva.
 Nuevo flujo: Analizar → Revisar → Aplicar aprobadas
 """
-from flask import Flask, render_template, request, send_file, redirect, url_for, session, make_response
+from flask import (Flask, render_template, request, send_file, redirect, url_for, session,
+                   make_response, jsonify, Response, stream_with_context)
 from werkzeug.utils import secure_filename
+from markupsafe import escape
+import io
 import os
 from pathlib import Path
 from datetime import datetime
 import subprocess
 import json
-import pickle
+import time
 
-from corrector_integrado import CorrectorIntegrado
+from corrector_integrado import CorrectorIntegrado, motor_corrector, precargar_motor
 from aplicador_correcciones import AplicadorCorrecciones
+from spelling_checker import SpellingChecker
+from trabajos_analisis import GestorTrabajos, COMPLETADO, ERROR
+from almacen_sesiones import AlmacenSesiones
+from xml_handler import PARTE_DOCUMENTO, nombre_parte
 
 app = Flask(__name__)
 app.secret_key = 'antigravity_corrector_secret_key_2024'
@@ -20,13 +27,50 @@ app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'outputs'
 app.config['SESSIONS_FOLDER'] = 'sessions'
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max
+# Inicializar el corrector (reglas, léxico y SpaCy) al importar la app, antes
+# del fork de los workers, para que ninguna subida pague la carga del modelo
+app.config['PRECARGAR_CORRECTOR'] = True
+# Correcciones por tramo en la revisión: la página trae el primero y el resto
+# se pide a /review/<id>/<page>/tramo al hacer scroll
+app.config['TRAMO_REVISION'] = 100
+app.config['TRAMO_REVISION_MAX'] = 500
+# La página de carga consulta /progress/<id> periódicamente; con PROGRESO_SSE usa
+# antes /progress/<id>/stream, que ocupa un hilo de petición y por eso se corta
+# a los DURACION_MAXIMA_SSE segundos (el navegador sigue con la consulta)
+app.config['PROGRESO_SSE'] = False
+app.config['DURACION_MAXIMA_SSE'] = 30
 
 # Crear carpetas
 for folder in [app.config['UPLOAD_FOLDER'], app.config['OUTPUT_FOLDER'], app.config['SESSIONS_FOLDER']]:
     os.makedirs(folder, exist_ok=True)
 
+# Léxico ortográfico compartido: se genera al desplegar
+# (python spelling_checker.py --construir) y cada worker lo proyecta con mmap.
+# Aquí solo se comprueba: si falta o está desfasado se avisa y se usan los
+# diccionarios de texto, sin construir nada dentro del worker
+SpellingChecker().lexico_al_dia()
+
+# Análisis en segundo plano: /upload responde al instante y la página de
+# carga consulta el progreso (el estado se guarda junto a las sesiones)
+gestor_trabajos = GestorTrabajos(app.config['SESSIONS_FOLDER'], max_trabajos=2)
+
+# Sesiones de revisión: correcciones indexadas por categoría en SQLite
+# (cada página lee solo lo que muestra)
+almacen_sesiones = AlmacenSesiones(os.path.join(app.config['SESSIONS_FOLDER'], 'sesiones.sqlite3'))
+
+# Motor de corrección caliente: cada análisis toma prestado un corrector ya
+# inicializado en lugar de construir uno nuevo
+if app.config['PRECARGAR_CORRECTOR']:
+    try:
+        precargar_motor()
+    except Exception as e:
+        print(f"⚠️ No se pudo precargar el corrector: {e}")
+
 ALLOWED_EXTENSIONS = {'docx'}
 
+# Nombre legible de la parte del documento (encabezado, notas al pie...) en la revisión
+app.jinja_env.filters['nombre_parte'] = nombre_parte
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -36,7 +80,7 @@ def index():
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Paso 1: Subir archivo y analizarlo"""
+    """Paso 1: Subir archivo y lanzar su análisis en segundo plano"""
     if 'file' not in request.files:
         return "No se seleccionó archivo", 400
     
@@ -44,71 +88,103 @@ def upload_file():
     if file.filename == '' or not allowed_file(file.filename):
         return "Archivo inválido (solo .docx)", 400
     
-    # Guardar archivo uploaded
+    # El documento se queda en memoria: no se escribe en uploads/
     filename = secure_filename(file.filename)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     session_id = f"{Path(filename).stem}_{timestamp}"
+    contenido = file.read()
     
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], session_id + '.docx')
-    file.save(filepath)
+    gestor_trabajos.lanzar(session_id, lambda informar: analizar_en_segundo_plano(
+        session_id, filename, contenido, informar))
     
-    try:
-        print(f"\n{'='*60}")
-        print(f"ANALIZANDO: {filename}")
-        print(f"{'='*60}\n")
-        
-        # Analizar con corrector integrado
-        corrector = CorrectorIntegrado()
-        correcciones_por_categoria = corrector.analizar_documento(filepath)
-        
-        # Guardar estado en sesión
-        session_file = os.path.join(app.config['SESSIONS_FOLDER'], session_id + '.pkl')
-        with open(session_file, 'wb') as f:
-            pickle.dump({
-                'filename': filename,
-                'filepath': filepath,
-                'correcciones': correcciones_por_categoria,
-                'todas_correcciones': corrector.correcciones,
-                'stats': corrector.stats_por_categoria
-            }, f)
-        
-        print(f"✓ Sesión guardada: {session_id}")
-        
-        # Redirigir a primera página de revisión
-        return redirect(f'/review/{session_id}/0')
+    # La página de carga sigue el progreso y redirige a la revisión al terminar
+    return redirect(f'/analizando/{session_id}')
+
+def analizar_en_segundo_plano(session_id, filename, contenido, informar):
+    """Tarea del gestor de trabajos: analiza el documento (bytes) y guarda la sesión."""
+    print(f"\n{'='*60}")
+    print(f"ANALIZANDO: {filename}")
+    print(f"{'='*60}\n")
     
-    except Exception as e:
-        print(f"❌ Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return f"Error al analizar: {str(e)}", 500
+    # Analizar con un corrector caliente del proceso
+    with motor_corrector() as corrector:
+        corrector.analizar_documento(contenido, progreso=informar)
+        todas_correcciones = corrector.correcciones
+        indice = corrector.indice_categorias
+    
+    # Guardar estado en sesión (con el documento y el índice por categoría del análisis)
+    almacen_sesiones.guardar(session_id, filename, contenido, todas_correcciones, indice)
+    
+    print(f"✓ Sesión guardada: {session_id}")
+
+def estado_analisis(session_id):
+    """
+    Estado del análisis, o None si no existe. El gestor borra el estado de los
+    trabajos completados, así que entonces lo da la sesión ya guardada.
+    """
+    estado = gestor_trabajos.estado(session_id)
+    if estado is None and almacen_sesiones.obtener(session_id) is not None:
+        estado = {'estado': COMPLETADO, 'redirigir': f'/review/{session_id}/0'}
+    return estado
+
+@app.route('/analizando/<session_id>')
+def analizando(session_id):
+    """Página de carga: muestra el progreso real del análisis."""
+    estado = estado_analisis(session_id)
+    if estado is None:
+        return "Análisis no encontrado", 404
+    if estado['estado'] == COMPLETADO:
+        return redirect(estado['redirigir'])
+    return render_template('loading.html', session_id=session_id,
+                           usar_sse=app.config['PROGRESO_SSE'])
+
+@app.route('/progress/<session_id>')
+def progreso_analisis(session_id):
+    """Progreso del análisis en JSON (párrafos hechos/total, porcentaje y ETA)."""
+    estado = estado_analisis(session_id)
+    if estado is None:
+        return jsonify({'estado': 'desconocido'}), 404
+    return jsonify(estado)
+
+@app.route('/progress/<session_id>/stream')
+def progreso_analisis_stream(session_id):
+    """
+    Progreso del análisis como Server-Sent Events, hasta que termina o pasan
+    DURACION_MAXIMA_SSE segundos (entonces el cliente pasa a consultar).
+    """
+    limite = time.monotonic() + app.config['DURACION_MAXIMA_SSE']
+    
+    def eventos():
+        ultimo = None
+        while True:
+            estado = estado_analisis(session_id) or {'estado': 'desconocido'}
+            datos = json.dumps(estado, ensure_ascii=False)
+            if datos != ultimo:
+                yield f"data: {datos}\n\n"
+                ultimo = datos
+            if estado['estado'] in (COMPLETADO, ERROR, 'desconocido'):
+                break
+            if time.monotonic() >= limite:
+                break
+            time.sleep(0.5)
+    
+    return Response(stream_with_context(eventos()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/review/<session_id>/<int:page>')
 def review_page(session_id, page):
     """Muestra página de revisión con correcciones agrupadas por categoría COMPLETA."""
     try:
-        # Cargar sesión
-        session_file = os.path.join(app.config['SESSIONS_FOLDER'], session_id + '.pkl')
-        with open(session_file, 'rb') as f:
-            session_data = pickle.load(f)
-        
-        todas_correcciones = session_data['todas_correcciones']
-        
-        # Obtener categorías disponibles
-        corrector_temp = CorrectorIntegrado()
+        # Cargar sesión (sus datos y el índice por categoría, sin correcciones)
+        session_data = almacen_sesiones.obtener(session_id)
+        if session_data is None:
+            return "Sesión no encontrada", 404
         
-        # Agrupar TODAS las correcciones por categoría (documento completo)
-        correcciones_por_categoria_completas = {}
-        categorias_con_datos = []
+        indice = session_data['indice']
         
-        for categoria in corrector_temp.CATEGORIAS.keys():
-            corrs_categoria = [c for c in todas_correcciones if c.categoria == categoria]
-            if corrs_categoria:
-                correcciones_por_categoria_completas[categoria] = {
-                    'nombre': corrector_temp.CATEGORIAS[categoria],
-                    'correcciones': corrs_categoria
-                }
-                categorias_con_datos.append(categoria)
+        # Categorías disponibles (atributo de clase: no hace falta instanciar el corrector)
+        categorias = CorrectorIntegrado.CATEGORIAS
+        categorias_con_datos = [cat for cat in categorias if cat in indice]
         
         # Paginación POR CATEGORÍA (cada página = una categoría completa)
         total_pages = len(categorias_con_datos)
@@ -133,29 +209,33 @@ def review_page(session_id, page):
         # Categoría actual para esta página
         categoria_actual = categorias_con_datos[page]
         
-        # Solo pasar la categoría de esta página
+        # Solo se lee el primer tramo de la categoría de esta página
         datos_para_template = {
-            categoria_actual: correcciones_por_categoria_completas[categoria_actual]
+            categoria_actual: {
+                'nombre': categorias[categoria_actual],
+                'total': indice[categoria_actual]['total'],
+                'correcciones': almacen_sesiones.correcciones_de_categoria(
+                    session_id, categoria_actual, 0, app.config['TRAMO_REVISION'])
+            }
         }
         
         # Estadísticas TOTALES de todas las categorías
-        stats_totales = {}
-        for cat, datos in correcciones_por_categoria_completas.items():
-            stats_totales[cat] = {
-                'nombre': datos['nombre'],
-                'total': len(datos['correcciones'])
-            }
+        stats_totales = {
+            cat: {'nombre': categorias[cat], 'total': indice[cat]['total']}
+            for cat in categorias_con_datos
+        }
         
         return render_template('review_paginated.html',
                              filename=session_data['filename'],
                              session_id=session_id,
                              page=page,
                              total_pages=total_pages,
-                             total_correcciones=len(todas_correcciones),
+                             total_correcciones=sum(entrada['total'] for entrada in indice.values()),
                              correcciones_por_categoria=datos_para_template,
                              stats_totales=stats_totales,
-                             categoria_actual=corrector_temp.CATEGORIAS[categoria_actual],
-                             todas_categorias=[(i, corrector_temp.CATEGORIAS[cat]) for i, cat in enumerate(categorias_con_datos)])
+                             categoria_actual=categorias[categoria_actual],
+                             todas_categorias=[(i, categorias[cat]) for i, cat in enumerate(categorias_con_datos)],
+                             tramo=app.config['TRAMO_REVISION'])
     
     except Exception as e:
         print(f"❌ Error: {str(e)}")
@@ -163,6 +243,55 @@ def review_page(session_id, page):
         traceback.print_exc()
         return f"Error al cargar revisión: {str(e)}", 500
 
+def correccion_a_json(corr):
+    """Datos de una corrección que necesita la página de revisión."""
+    return {
+        'id': corr.id,
+        'texto_original': corr.texto_original,
+        'texto_nuevo': corr.texto_nuevo,
+        'explicacion': corr.explicacion,
+        'parte': None if corr.parte == PARTE_DOCUMENTO else nombre_parte(corr.parte),
+        'localizada': corr.inicio is not None,
+        'contexto_antes': corr.contexto_antes,
+        'contexto_despues': corr.contexto_despues,
+    }
+
+@app.route('/review/<session_id>/<int:page>/tramo')
+def review_tramo(session_id, page):
+    """
+    Tramo de correcciones de la categoría de una página de revisión, en JSON.
+    Parámetros: desde (posición en la categoría) y cuantas. Con ?ids=1
+    devuelve solo los IDs de toda la categoría (para aprobar o rechazar todas).
+    """
+    session_data = almacen_sesiones.obtener(session_id)
+    if session_data is None:
+        return jsonify({'error': 'Sesión no encontrada'}), 404
+    
+    indice = session_data['indice']
+    categorias_con_datos = [cat for cat in CorrectorIntegrado.CATEGORIAS if cat in indice]
+    if not 0 <= page < len(categorias_con_datos):
+        return jsonify({'error': 'Página no encontrada'}), 404
+    categoria = categorias_con_datos[page]
+    total = indice[categoria]['total']
+    
+    if request.args.get('ids'):
+        return jsonify({'categoria': categoria, 'total': total,
+                        'ids': almacen_sesiones.ids_de_categoria(session_id, categoria)})
+    
+    desde = max(request.args.get('desde', 0, type=int), 0)
+    cuantas = request.args.get('cuantas', app.config['TRAMO_REVISION'], type=int)
+    cuantas = min(max(cuantas, 1), app.config['TRAMO_REVISION_MAX'])
+    correcciones = almacen_sesiones.correcciones_de_categoria(session_id, categoria, desde, cuantas)
+    
+    siguiente = desde + len(correcciones)
+    return jsonify({
+        'categoria': categoria,
+        'total': total,
+        'desde': desde,
+        'siguiente': siguiente if siguiente < total else None,
+        'correcciones': [correccion_a_json(corr) for corr in correcciones],
+    })
+
 @app.route('/apply_corrections', methods=['POST'])
 def apply_corrections():
     """Paso 2: Aplicar solo correcciones aprobadas"""
@@ -177,39 +306,60 @@ def apply_corrections():
         selected_ids = [int(id_str) for id_str in selected_ids]
         
         # Cargar sesión
-        session_file = os.path.join(app.config['SESSIONS_FOLDER'], session_id + '.pkl')
-        with open(session_file, 'rb') as f:
-            session_data = pickle.load(f)
+        session_data = almacen_sesiones.obtener(session_id)
+        if session_data is None:
+            return "Sesión no encontrada", 404
         
-        todas_correcciones = session_data['todas_correcciones']
-        filepath = session_data['filepath']
         filename = session_data['filename']
         
-        # Filtrar solo aprobadas
+        # Descartar IDs fuera de los rangos del índice sin consultar la base
+        rangos = [(e['primer_id'], e['ultimo_id']) for e in session_data['indice'].values()]
+        selected_ids = [i for i in selected_ids if any(a <= i <= b for a, b in rangos)]
+        
+        # Cargar solo las aprobadas
         correcciones_aprobadas = {}
-        for corr in todas_correcciones:
-            if corr.id in selected_ids:
-                correcciones_aprobadas[corr.id] = {
+        for corr in almacen_sesiones.correcciones_por_ids(session_id, selected_ids):
+            correcciones_aprobadas[corr.id] = {
                     'texto_original': corr.texto_original,
                     'texto_nuevo': corr.texto_nuevo,
-                    'parrafo_num': corr.parrafo_num
+                    'parte': corr.parte,
+                    'parrafo_num': corr.parrafo_num,
+                    'inicio': corr.inicio,
+                    'fin': corr.fin
                 }
         
         print(f"\n{'='*60}")
         print(f"APLICANDO {len(correcciones_aprobadas)} CORRECCIONES")
         print(f"{'='*60}\n")
         
-        # Aplicar correcciones
+        # Aplicar correcciones en memoria (sin directorio de extracción ni outputs/)
         output_filename = f"{Path(filename).stem}_corregido_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
-        output_path = Path(app.config['OUTPUT_FOLDER']) / output_filename
         
         aplicador = AplicadorCorrecciones()
-        aplicador.aplicar_correcciones(filepath, str(output_path), correcciones_aprobadas)
-        
-        # Limpiar archivos temporales de entrada
+        documento = almacen_sesiones.documento(session_id)
+        corregido = aplicador.aplicar_correcciones(documento, None, correcciones_aprobadas)
+        almacen_sesiones.guardar_resultado(output_filename, corregido)
+        
+        # Correcciones aprobadas que chocaban con otra o ya no se encontraron
+        motivos = {'solapada': 'se solapa con otra corrección',
+                   'no_encontrada': 'texto no encontrado'}
+        aplicadas = len(correcciones_aprobadas) - len(aplicador.conflictos)
+        conflictos_html = ''
+        if aplicador.conflictos:
+            filas = ''.join(
+                f"<li><del>{escape(c['texto_original'])}</del> → <ins>{escape(c['texto_nuevo'])}</ins>"
+                f" <small>({nombre_parte(c['parte'])}, párrafo {c['parrafo_num'] + 1}: {motivos[c['motivo']]})</small></li>"
+                for c in aplicador.conflictos
+            )
+            conflictos_html = f"""
+                <div class="conflicts">
+                    <strong>⚠️ {len(aplicador.conflictos)} correcciones no se aplicaron:</strong>
+                    <ul>{filas}</ul>
+                </div>"""
+        
+        # La sesión ya no se necesita
         try:
-            os.remove(filepath)
-            os.remove(session_file)
+            almacen_sesiones.eliminar(session_id)
         except:
             pass
         
@@ -271,6 +421,20 @@ def apply_corrections():
                     padding: 15px 40px;
                     font-size: 1em;
                 }}
+                .conflicts {{
+                    background: #fff8e1;
+                    border-left: 4px solid #ffc107;
+                    border-radius: 10px;
+                    padding: 15px;
+                    margin: 20px 0;
+                    text-align: left;
+                    max-height: 250px;
+                    overflow-y: auto;
+                }}
+                .conflicts ul {{ margin: 10px 0 0 20px; }}
+                .conflicts del {{ color: #dc3545; }}
+                .conflicts ins {{ color: #28a745; text-decoration: none; }}
+                .conflicts small {{ color: #666; }}
                 .info {{
                     color: #666;
                     margin-top: 20px;
@@ -282,7 +446,8 @@ def apply_corrections():
             <div class="success-box">
                 <div class="check">✅</div>
                 <h1>¡Correcciones Aplicadas!</h1>
-                <p>Se aplicaron <strong>{len(correcciones_aprobadas)}</strong> correcciones con Track Changes.</p>
+                <p>Se aplicaron <strong>{aplicadas}</strong> correcciones con Track Changes.</p>
+                {conflictos_html}
                 
                 <div class="file-name">
                     📄 {output_filename}
@@ -318,13 +483,13 @@ def descargar_archivo():
         if not filename:
             return "Nombre de archivo no especificado", 400
         
-        file_path = Path(app.config['OUTPUT_FOLDER']) / filename
-        if not file_path.exists():
+        contenido = almacen_sesiones.resultado(filename)
+        if contenido is None:
             return "Archivo no encontrado", 404
         
         # Forzar nombre correcto con extensión
         response = make_response(send_file(
-            str(file_path.absolute()),
+            io.BytesIO(contenido),
             mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
         ))
         
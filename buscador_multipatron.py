@@ -0,0 +1,125 @@
+"""
+Buscador multipatrón basado en un autómata Aho–Corasick.
+Encuentra todas las apariciones de un diccionario de términos literales
+en una sola pasada lineal sobre el texto, independientemente del número
+de entradas del diccionario.
+"""
+from collections import deque
+from typing import Iterable, List, Tuple
+
+
+def _es_caracter_palabra(c: str) -> bool:
+    """Equivalente a \\w de `re` para un único carácter."""
+    return c.isalnum() or c == '_'
+
+
+def _minusculas_misma_longitud(texto: str) -> str:
+    """
+    Pasa el texto a minúsculas sin alterar su longitud, para que los
+    desplazamientos sigan siendo válidos sobre el texto original.
+    """
+    minusculas = texto.lower()
+    if len(minusculas) == len(texto):
+        return minusculas
+    # Algunos caracteres (p. ej. 'İ') se expanden al pasar a minúsculas
+    return ''.join(c.lower() if len(c.lower()) == 1 else c for c in texto)
+
+
+class BuscadorMultipatron:
+    """Autómata Aho–Corasick insensible a mayúsculas con límites de palabra."""
+
+    def __init__(self, terminos: Iterable[str], limites_palabra: bool = True):
+        """
+        Construye el autómata una sola vez.
+
+        Args:
+            terminos: Términos literales a buscar (el índice de cada término
+                      en este iterable es el que devuelve `buscar`)
+            limites_palabra: Exigir límite de palabra (como \\b) en ambos extremos
+        """
+        self.terminos = [t.lower() for t in terminos]
+        self.limites_palabra = limites_palabra
+
+        # Nodo 0 = raíz. Cada nodo: transiciones, enlace de fallo y salidas
+        self._transiciones = [{}]
+        self._fallo = [0]
+        self._salidas = [[]]
+
+        for indice, termino in enumerate(self.terminos):
+            if termino:
+                self._insertar(termino, indice)
+        self._construir_fallos()
+
+    def _insertar(self, termino: str, indice: int):
+        """Añade un término al trie."""
+        nodo = 0
+        for c in termino:
+            siguiente = self._transiciones[nodo].get(c)
+            if siguiente is None:
+                siguiente = len(self._transiciones)
+                self._transiciones[nodo][c] = siguiente
+                self._transiciones.append({})
+                self._fallo.append(0)
+                self._salidas.append([])
+            nodo = siguiente
+        self._salidas[nodo].append(indice)
+
+    def _construir_fallos(self):
+        """Calcula los enlaces de fallo en anchura (BFS) y propaga las salidas."""
+        cola = deque(self._transiciones[0].values())
+
+        while cola:
+            nodo = cola.popleft()
+            for c, hijo in self._transiciones[nodo].items():
+                cola.append(hijo)
+
+                fallo = self._fallo[nodo]
+                while fallo and c not in self._transiciones[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._transiciones[fallo].get(c, 0)
+                self._fallo[hijo] = destino if destino != hijo else 0
+
+                # Un nodo también reconoce todo lo que reconoce su enlace de fallo
+                self._salidas[hijo] = self._salidas[hijo] + self._salidas[self._fallo[hijo]]
+
+    def _hay_limite(self, texto: str, pos: int) -> bool:
+        """Indica si hay límite de palabra (\\b) en la posición `pos`."""
+        antes = pos > 0 and _es_caracter_palabra(texto[pos - 1])
+        despues = pos < len(texto) and _es_caracter_palabra(texto[pos])
+        return antes != despues
+
+    def buscar(self, texto: str) -> List[Tuple[int, int, int]]:
+        """
+        Busca todos los términos en una sola pasada.
+
+        Args:
+            texto: Texto donde buscar
+
+        Returns:
+            Lista de (inicio, fin, índice del término) ordenada por posición,
+            incluidas las coincidencias solapadas
+        """
+        resultados = []
+        if not self.terminos:
+            return resultados
+
+        transiciones = self._transiciones
+        fallo = self._fallo
+        salidas = self._salidas
+        nodo = 0
+
+        for pos, c in enumerate(_minusculas_misma_longitud(texto)):
+            while nodo and c not in transiciones[nodo]:
+                nodo = fallo[nodo]
+            nodo = transiciones[nodo].get(c, 0)
+
+            for indice in salidas[nodo]:
+                fin = pos + 1
+                inicio = fin - len(self.terminos[indice])
+                if self.limites_palabra and not (
+                        self._hay_limite(texto, inicio) and self._hay_limite(texto, fin)):
+                    continue
+                resultados.append((inicio, fin, indice))
+
+        resultados.sort()
+        return resultados
@@ -0,0 +1,110 @@
+"""
+Caché LRU acotada y segura entre hilos.
+La usa el corrector ortográfico para no repetir la verificación ni la
+búsqueda de sugerencias de una misma palabra en cada párrafo, documento
+o petición. Opcionalmente se guarda en disco (JSON) entre ejecuciones.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+import json
+import os
+import threading
+
+
+# Valor centinela para distinguir "no está" de un valor None cacheado
+AUSENTE = object()
+
+
+class CacheLRU:
+    """Diccionario de tamaño máximo que descarta la entrada usada hace más tiempo."""
+
+    def __init__(self, capacidad: int = 50000):
+        """
+        Args:
+            capacidad: Número máximo de entradas
+        """
+        self.capacidad = capacidad
+        self.firma = None
+        self.aciertos = 0
+        self.fallos = 0
+        self._datos: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._cerrojo = threading.Lock()
+
+    def obtener(self, clave: Hashable, defecto: Any = AUSENTE) -> Any:
+        """Devuelve el valor (marcándolo como reciente) o `defecto`."""
+        with self._cerrojo:
+            valor = self._datos.get(clave, AUSENTE)
+            if valor is AUSENTE:
+                self.fallos += 1
+                return defecto
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave: Hashable, valor: Any):
+        """Inserta o actualiza una entrada, descartando la más antigua si no cabe."""
+        with self._cerrojo:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+
+    def vaciar(self):
+        """Elimina todas las entradas y reinicia los contadores."""
+        with self._cerrojo:
+            self._datos.clear()
+            self.aciertos = 0
+            self.fallos = 0
+
+    def asegurar_firma(self, firma: str):
+        """
+        Asocia la caché a una versión de los datos de origen (p. ej. el léxico).
+        Si la firma cambia, el contenido ya no es fiable y se vacía.
+        """
+        if firma != self.firma:
+            self.vaciar()
+            self.firma = firma
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Entradas, aciertos, fallos y tasa de aciertos."""
+        with self._cerrojo:
+            total = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'capacidad': self.capacidad,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': self.aciertos / total if total else 0.0,
+            }
+
+    # ═══════════════════════════════════════════════════════════════
+    # PERSISTENCIA
+    # ═══════════════════════════════════════════════════════════════
+
+    def guardar_en_disco(self, ruta: str):
+        """Escribe la caché en JSON (escritura atómica). Las claves deben ser str."""
+        with self._cerrojo:
+            contenido = {'firma': self.firma, 'entradas': list(self._datos.items())}
+        ruta_temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(ruta_temporal, 'w', encoding='utf-8') as f:
+            json.dump(contenido, f, ensure_ascii=False)
+        os.replace(ruta_temporal, ruta)
+
+    def cargar_de_disco(self, ruta: str) -> int:
+        """
+        Carga una caché guardada con `guardar_en_disco` si su firma coincide
+        con la actual. Devuelve el número de entradas cargadas.
+        """
+        if not os.path.exists(ruta):
+            return 0
+        with open(ruta, 'r', encoding='utf-8') as f:
+            contenido = json.load(f)
+        if contenido.get('firma') != self.firma:
+            return 0
+        entradas = contenido.get('entradas', [])
+        for clave, valor in entradas[-self.capacidad:]:
+            self.guardar(clave, tuple(valor) if isinstance(valor, list) else valor)
+        return len(entradas[-self.capacidad:])
@@ -5,27 +5,196 @@ Versión 3: Todas las reglas ortotipográficas y de estilo.
 from ortotipografia_v3 import OrtotipografiaRulesV3
 from style_checker_v2 import StyleCheckerV2
 from spelling_checker import SpellingChecker
-from xml_handler import DocxXMLHandler, NAMESPACES
-from typing import List, Dict, Tuple
+from xml_handler import (Documento, LectorParrafos, PARTE_DOCUMENTO, partes_del_documento,
+                         nombre_parte)
+from ediciones import ventana_contexto
+from typing import Callable, Iterable, Iterator, List, Dict, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from collections import deque
+import itertools
+import multiprocessing
+import os
 import re
+import sys
+import threading
 
 
 class Correccion:
-    """Representa una corrección detectada."""
+    """
+    Representa una corrección detectada.
+    
+    Registro compacto (__slots__, sin __dict__): el contexto no se copia en
+    cada corrección sino que se deriva del texto del párrafo, que se guarda
+    una sola vez por documento en una lista compartida (`textos`) y se
+    referencia por `parrafo_num`. Las cadenas repetidas (categoría, tipo,
+    explicación y fragmentos) se internan.
+    
+    Cada corrección se ubica por (parte, parrafo_num): la parte XML del .docx
+    (cuerpo, encabezado, notas al pie...) y el índice del párrafo en ella.
+    """
+    
+    __slots__ = ('categoria', 'tipo', 'texto_original', 'texto_nuevo', 'explicacion',
+                 'confianza', 'parte', 'parrafo_num', 'inicio', 'fin', 'aprobada', 'id',
+                 'textos', '_contexto', '_contexto_antes', '_contexto_despues')
     
     def __init__(self, categoria: str, tipo: str, texto_original: str, 
                  texto_nuevo: str, explicacion: str, confianza: float,
-                 contexto: str = "", parrafo_num: int = 0):
-        self.categoria = categoria
-        self.tipo = tipo
-        self.texto_original = texto_original
-        self.texto_nuevo = texto_nuevo
-        self.explicacion = explicacion
+                 contexto: str = "", parrafo_num: int = 0,
+                 inicio: Optional[int] = None, fin: Optional[int] = None,
+                 contexto_antes: str = "", contexto_despues: str = "",
+                 parte: str = PARTE_DOCUMENTO):
+        self.categoria = sys.intern(categoria)
+        self.tipo = sys.intern(tipo)
+        # Los mismos fragmentos se repiten mucho en un documento (misma errata,
+        # misma abreviatura...): internados, se guardan y serializan una vez
+        self.texto_original = sys.intern(texto_original)
+        self.texto_nuevo = sys.intern(texto_nuevo)
+        self.explicacion = sys.intern(explicacion)
         self.confianza = confianza
-        self.contexto = contexto
+        self.parte = sys.intern(parte)
         self.parrafo_num = parrafo_num
+        # Desplazamientos de texto_original dentro del párrafo (None si se desconocen)
+        self.inicio = inicio
+        self.fin = fin
         self.aprobada = False
         self.id = None
+        # Textos de los párrafos de su parte (lista compartida; la asigna el corrector)
+        self.textos = None
+        # Contextos explícitos (solo si no se pueden derivar del párrafo)
+        self._contexto = contexto or None
+        self._contexto_antes = contexto_antes or None
+        self._contexto_despues = contexto_despues or None
+    
+    def __reduce__(self):
+        """
+        Serialización compacta (sesiones pickle): una tupla de valores en
+        lugar del diccionario nombre→valor de cada slot.
+        """
+        return (_reconstruir_correccion, (
+            self.categoria, self.tipo, self.texto_original, self.texto_nuevo,
+            self.explicacion, self.confianza, self.parrafo_num, self.inicio, self.fin,
+            self.aprobada, self.id, self.textos,
+            self._contexto, self._contexto_antes, self._contexto_despues, self.parte
+        ))
+    
+    def _texto_parrafo(self) -> Optional[str]:
+        """Texto completo del párrafo, si se conoce."""
+        if self.textos is None or not 0 <= self.parrafo_num < len(self.textos):
+            return None
+        return self.textos[self.parrafo_num]
+    
+    def _ventana(self) -> Tuple[str, str]:
+        """(antes, después) derivados del párrafo, o vacíos si no hay desplazamientos."""
+        texto = self._texto_parrafo()
+        if texto is None or self.inicio is None:
+            return "", ""
+        return ventana_contexto(texto, self.inicio, self.fin)
+    
+    @property
+    def contexto(self) -> str:
+        if self._contexto is not None:
+            return self._contexto
+        texto = self._texto_parrafo()
+        if texto is None:
+            return ""
+        return texto[:100] + "..." if len(texto) > 100 else texto
+    
+    @property
+    def contexto_antes(self) -> str:
+        if self._contexto_antes is not None:
+            return self._contexto_antes
+        return self._ventana()[0]
+    
+    @property
+    def contexto_despues(self) -> str:
+        if self._contexto_despues is not None:
+            return self._contexto_despues
+        return self._ventana()[1]
+
+
+def _reconstruir_correccion(categoria, tipo, texto_original, texto_nuevo, explicacion,
+                            confianza, parrafo_num, inicio, fin, aprobada, id_, textos,
+                            contexto, contexto_antes, contexto_despues,
+                            parte=PARTE_DOCUMENTO) -> Correccion:
+    """Inversa de Correccion.__reduce__ (vuelve a internar las cadenas repetidas)."""
+    corr = Correccion(categoria, tipo, texto_original, texto_nuevo, explicacion, confianza,
+                      contexto or "", parrafo_num, inicio, fin,
+                      contexto_antes or "", contexto_despues or "", parte)
+    corr.aprobada = aprobada
+    corr.id = id_
+    corr.textos = textos
+    return corr
+
+
+# ═══════════════════════════════════════════════════════════════
+# TRABAJADORES DEL ANÁLISIS PARALELO
+# ═══════════════════════════════════════════════════════════════
+# Cada proceso del pool crea su propio corrector una sola vez (reglas,
+# léxico mmap y modelo SpaCy) y lo reutiliza para todos sus bloques
+_CORRECTOR_TRABAJADOR = None
+
+
+def _inicializar_trabajador(perfil_spacy: Optional[str]):
+    """Inicializador del pool: precarga el corrector y el diccionario."""
+    global _CORRECTOR_TRABAJADOR
+    _CORRECTOR_TRABAJADOR = CorrectorIntegrado(perfil_spacy)
+    _CORRECTOR_TRABAJADOR.spelling._cargar_diccionario_si_necesario()
+
+
+def _analizar_bloque_en_trabajador(parrafos: List[Tuple[int, str]]) -> List[Correccion]:
+    """Analiza un bloque de párrafos en un proceso del pool."""
+    return _CORRECTOR_TRABAJADOR._analizar_bloque(parrafos)
+
+
+# Un solo pool por proceso del servidor (y perfil de SpaCy), compartido por
+# todos los correctores: los motores de _MOTORES_LIBRES no arrancan cada uno
+# sus propios trabajadores. Su tamaño lo fija el primer análisis que lo pide.
+_POOLS: Dict[Optional[str], ProcessPoolExecutor] = {}
+_CERROJO_POOLS = threading.Lock()
+
+
+def _pool_compartido(perfil_spacy: Optional[str], procesos: int) -> ProcessPoolExecutor:
+    """Pool de procesos del perfil, con el corrector precargado (se crea la primera vez)."""
+    with _CERROJO_POOLS:
+        pool = _POOLS.get(perfil_spacy)
+        if pool is None:
+            print(f"⏳ Arrancando {procesos} procesos de análisis...")
+            # 'spawn': los trabajadores no heredan hilos ni cerrojos del servidor web
+            pool = ProcessPoolExecutor(
+                max_workers=procesos,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_trabajador,
+                initargs=(perfil_spacy,)
+            )
+            _POOLS[perfil_spacy] = pool
+        return pool
+
+
+def _descartar_pool(perfil_spacy: Optional[str], pool: ProcessPoolExecutor = None):
+    """
+    Retira el pool del perfil (solo si sigue siendo `pool`, cuando se indica:
+    otro análisis puede haberlo sustituido ya) y lo detiene sin esperar.
+    """
+    with _CERROJO_POOLS:
+        actual = _POOLS.get(perfil_spacy)
+        if actual is None or (pool is not None and actual is not pool):
+            return
+        del _POOLS[perfil_spacy]
+    try:
+        actual.shutdown(wait=False)
+    except Exception:
+        pass  # Un pool roto puede fallar al detenerse; ya no se usa
+
+
+def cerrar_procesos():
+    """Detiene todos los pools de análisis paralelo del proceso."""
+    with _CERROJO_POOLS:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.shutdown()
 
 
 class CorrectorIntegrado:
@@ -58,237 +227,375 @@ class CorrectorIntegrado:
         'redundancias': 'Redundancias',
     }
     
-    def __init__(self):
+    def __init__(self, perfil_spacy: str = None):
+        """
+        Args:
+            perfil_spacy: Perfil de pipeline de SpaCy para el análisis de estilo
+                          (ver StyleCheckerV2.PERFILES_SPACY)
+        """
         print("\n🚀 Inicializando Corrector RAE Completo...")
+        self.perfil_spacy = perfil_spacy
         self.ortotipo = OrtotipografiaRulesV3()
-        self.style = StyleCheckerV2()
+        self.style = StyleCheckerV2(perfil_spacy)
         self.spelling = SpellingChecker()
         self.correcciones = []
         self.stats_por_categoria = {}
+        self.indice_categorias = {}
         print("✓ Corrector inicializado con todas las reglas RAE\n")
     
-    def detectar_correcciones_ortotipo(self, texto: str, parrafo_num: int, contexto: str) -> List[Correccion]:
-        """Detecta TODAS las correcciones ortotipográficas."""
+    # ═══════════════════════════════════════════════════════════════
+    # REGLAS ORTOTIPOGRÁFICAS (método de ediciones, categoría, explicación, confianza)
+    # ═══════════════════════════════════════════════════════════════
+    REGLAS_ORTOTIPO = [
+        ('ediciones_comillas_jerarquia', 'ortotipografia', 'Jerarquía de comillas RAE (« > " > \')', 0.95),
+        ('ediciones_rayas_espaciado', 'ortotipografia', 'Rayas con espaciado correcto', 0.95),
+        ('ediciones_espacios_duros', 'ortotipografia', 'Espacio duro antes de unidades', 0.95),
+        ('ediciones_mayusculas', 'mayusculas', 'Días/meses/estaciones en minúscula', 0.90),
+        ('ediciones_abreviaturas', 'abreviaturas', 'Abreviatura con punto', 0.95),
+        ('ediciones_siglas', 'siglas', 'Siglas sin puntos internos', 0.95),
+        ('ediciones_numeros', 'numeros', 'Formato numérico RAE', 0.85),
+        ('ediciones_puntuacion', 'puntuacion', 'Coma antes de conjunción adversativa', 0.80),
+    ]
+    
+    def _correccion_en_span(self, texto: str, inicio: int, fin: int, texto_nuevo: str,
+                            categoria: str, explicacion: str, confianza: float,
+                            parrafo_num: int) -> Correccion:
+        """
+        Crea una corrección localizada por desplazamiento dentro del párrafo.
+        El contexto se deriva después del texto del párrafo (ver Correccion).
+        """
+        return Correccion(
+            categoria=categoria,
+            tipo='reemplazo',
+            texto_original=texto[inicio:fin],
+            texto_nuevo=texto_nuevo,
+            explicacion=explicacion,
+            confianza=confianza,
+            parrafo_num=parrafo_num,
+            inicio=inicio,
+            fin=fin
+        )
+    
+    def detectar_correcciones_ortotipo(self, texto: str, parrafo_num: int) -> List[Correccion]:
+        """
+        Detecta TODAS las correcciones ortotipográficas.
+        Cada regla devuelve ediciones (inicio, fin, reemplazo) sobre el texto
+        original, y cada edición se convierte en una corrección independiente.
+        """
         correcciones = []
         
-        # Aplicar reglas en orden
-        texto_actual = texto
+        # 1-8. Reglas basadas en ediciones
+        for metodo, categoria, explicacion, confianza in self.REGLAS_ORTOTIPO:
+            for inicio, fin, reemplazo in getattr(self.ortotipo, metodo)(texto):
+                correcciones.append(self._correccion_en_span(
+                    texto, inicio, fin, reemplazo, categoria, explicacion,
+                    confianza, parrafo_num
+                ))
         
-        # 1. Comillas
-        texto_comillas, cambios_comillas = self.ortotipo.corregir_comillas_jerarquia(texto_actual)
-        if cambios_comillas > 0:
-            correcciones.append(Correccion(
-                categoria='ortotipografia',
-                tipo='reemplazo',
-                texto_original=texto_actual,
-                texto_nuevo=texto_comillas,
-                explicacion='Jerarquía de comillas RAE (« > " > \')',
-                confianza=0.95,
-                contexto=contexto,
-                parrafo_num=parrafo_num
-            ))
-            texto_actual = texto_comillas
-        
-        # 2. Rayas
-        texto_rayas, cambios_rayas = self.ortotipo.corregir_rayas_espaciado(texto)
-        if cambios_rayas > 0 and texto_rayas != texto:
-            correcciones.append(Correccion(
-                categoria='ortotipografia',
-                tipo='reemplazo',
-                texto_original=texto,
-                texto_nuevo=texto_rayas,
-                explicacion='Rayas con espaciado correcto',
-                confianza=0.95,
-                contexto=contexto,
-                parrafo_num=parrafo_num
-            ))
-        
-        # 3. Espacios duros
-        texto_espacios, cambios_espacios = self.ortotipo.corregir_espacios_duros(texto)
-        if cambios_espacios > 0 and texto_espacios != texto:
-            correcciones.append(Correccion(
-                categoria='ortotipografia',
-                tipo='reemplazo',
-                texto_original=texto,
-                texto_nuevo=texto_espacios,
-                explicacion='Espacio duro antes de unidades',
-                confianza=0.95,
-                contexto=contexto,
-                parrafo_num=parrafo_num
-            ))
-            
-        # 3b. Espacios múltiples (Detección individual con contexto)
+        # Espacios múltiples (detección individual con contexto)
         for match in re.finditer(r'(\S+)(\s{2,})(\S+)', texto):
-            texto_error = match.group(0) # "palabra1  palabra2"
-            texto_corregido = f"{match.group(1)} {match.group(3)}" # "palabra1 palabra2"
-            
-            correcciones.append(Correccion(
-                categoria='ortotipografia',
-                tipo='reemplazo',
-                texto_original=texto_error,
-                texto_nuevo=texto_corregido,
-                explicacion=f'Espacio múltiple detectado entre "{match.group(1)}" y "{match.group(3)}"',
-                confianza=0.99,
-                contexto=contexto,
-                parrafo_num=parrafo_num
+            correcciones.append(self._correccion_en_span(
+                texto, match.start(2), match.end(2), ' ', 'ortotipografia',
+                f'Espacio múltiple detectado entre "{match.group(1)}" y "{match.group(3)}"',
+                0.99, parrafo_num
             ))
         
-        # 4. Mayúsculas
-        texto_mayus, cambios_mayus = self.ortotipo.corregir_mayusculas(texto)
-        if cambios_mayus > 0 and texto_mayus != texto:
-            correcciones.append(Correccion(
-                categoria='mayusculas',
-                tipo='reemplazo',
-                texto_original=texto,
-                texto_nuevo=texto_mayus,
-                explicacion='Días/meses/estaciones en minúscula',
-                confianza=0.90,
-                contexto=contexto,
-                parrafo_num=parrafo_num
+        # 9. Extranjerismos
+        for inicio, fin, alternativa in self.ortotipo.ediciones_extranjerismos(texto):
+            correcciones.append(self._correccion_en_span(
+                texto, inicio, fin, alternativa, 'extranjerismos',
+                f"Extranjerismo: usar '{alternativa}' o escribir en cursiva",
+                0.75, parrafo_num
             ))
         
-        # 5. Abreviaturas
-        texto_abrev, cambios_abrev = self.ortotipo.corregir_abreviaturas(texto)
-        if cambios_abrev > 0 and texto_abrev != texto:
-            correcciones.append(Correccion(
-                categoria='abreviaturas',
-                tipo='reemplazo',
-                texto_original=texto,
-                texto_nuevo=texto_abrev,
-                explicacion='Abreviatura con punto',
-                confianza=0.95,
-                contexto=contexto,
-                parrafo_num=parrafo_num
-            ))
+        return correcciones
+    
+    # ═══════════════════════════════════════════════════════════════
+    # ANÁLISIS PARALELO
+    # ═══════════════════════════════════════════════════════════════
+    # Por debajo de este número de párrafos no compensa arrancar procesos
+    MIN_PARRAFOS_PARALELO = 200
+    # Bloques por proceso: más de uno para repartir bien la carga
+    BLOQUES_POR_PROCESO = 4
+    # Bloques enviados al pool y aún sin consumir, por proceso: acota la
+    # memoria de párrafos y resultados pendientes con un consumidor lento
+    BLOQUES_EN_VUELO_POR_PROCESO = 2
+    
+    def _obtener_pool(self, procesos: int) -> ProcessPoolExecutor:
+        """Pool de procesos compartido del perfil (se reutiliza entre documentos)."""
+        return _pool_compartido(self.perfil_spacy, procesos)
+    
+    def _mapear_acotado(self, pool: ProcessPoolExecutor, bloques: List[List[Tuple[int, str]]],
+                        ventana: int) -> Iterator[List[Correccion]]:
+        """
+        Como `pool.map`, con resultados en orden, pero con como mucho `ventana`
+        bloques enviados y sin consumir. Si el pool se rompe, se descarta para
+        que el siguiente análisis arranque uno nuevo.
+        """
+        pendientes = deque()
+        siguientes = iter(bloques)
+        try:
+            for bloque in itertools.islice(siguientes, ventana):
+                pendientes.append(pool.submit(_analizar_bloque_en_trabajador, bloque))
+            while pendientes:
+                resultado = pendientes.popleft().result()
+                for bloque in itertools.islice(siguientes, 1):
+                    pendientes.append(pool.submit(_analizar_bloque_en_trabajador, bloque))
+                yield resultado
+        except BrokenProcessPool:
+            _descartar_pool(self.perfil_spacy, pool)
+            raise
+        finally:
+            for futuro in pendientes:
+                futuro.cancel()
+    
+    def _iterar_en_paralelo(self, parrafos_por_parte: Dict[str, List[Tuple[int, str]]],
+                            procesos: int) -> Iterator[Tuple[str, int, List[Correccion]]]:
+        """
+        Reparte los párrafos de todas las partes en bloques consecutivos entre
+        procesos (un bloque nunca mezcla partes), de modo que el cuerpo, las
+        notas, los encabezados... se analizan a la vez.
+        Los bloques se recogen en orden, así que las correcciones llegan
+        exactamente en el orden del análisis secuencial (y los IDs son estables).
+        Entrega (parte, índice, correcciones) por párrafo.
+        """
+        total = sum(len(parrafos) for parrafos in parrafos_por_parte.values())
+        tamano = max(1, -(-total // (procesos * self.BLOQUES_POR_PROCESO)))
+        bloques = [
+            (parte, parrafos[k:k + tamano])
+            for parte, parrafos in parrafos_por_parte.items()
+            for k in range(0, len(parrafos), tamano)
+        ]
+        print(f"  Análisis paralelo: {total} párrafos de {len(parrafos_por_parte)} partes "
+              f"en {len(bloques)} bloques, {procesos} procesos")
         
-        # 6. Siglas
-        texto_siglas, cambios_siglas = self.ortotipo.corregir_siglas(texto)
-        if cambios_siglas > 0 and texto_siglas != texto:
-            correcciones.append(Correccion(
-                categoria='siglas',
-                tipo='reemplazo',
-                texto_original=texto,
-                texto_nuevo=texto_siglas,
-                explicacion='Siglas sin puntos internos',
-                confianza=0.95,
-                contexto=contexto,
-                parrafo_num=parrafo_num
-            ))
+        resultados = self._mapear_acotado(self._obtener_pool(procesos),
+                                          [bloque for _, bloque in bloques],
+                                          procesos * self.BLOQUES_EN_VUELO_POR_PROCESO)
+        return self._repartir_por_parrafo(bloques, resultados)
+    
+    def _iterar_con_respaldo(self, parrafos_por_parte: Dict[str, List[Tuple[int, str]]],
+                             procesos: int) -> Iterator[Tuple[str, int, List[Correccion]]]:
+        """
+        Análisis paralelo que, si falla (pool roto, error al arrancar los
+        trabajadores o al serializar un bloque), sigue en secuencial desde el
+        primer párrafo sin resultado: ninguno se repite ni se pierde.
+        Los fallos de los bloques aparecen al consumir sus resultados, por eso
+        se vigila cada paso de la iteración.
+        """
+        # Párrafos ya entregados por parte (siempre un prefijo de cada parte)
+        entregados = {parte: 0 for parte in parrafos_por_parte}
+        fallo = None
+        try:
+            paralelo = self._iterar_en_paralelo(parrafos_por_parte, procesos)
+        except Exception as e:
+            fallo = e
         
-        # 7. Números
-        texto_nums, cambios_nums = self.ortotipo.corregir_numeros(texto)
-        if cambios_nums > 0 and texto_nums != texto:
-            correcciones.append(Correccion(
-                categoria='numeros',
-                tipo='reemplazo',
-                texto_original=texto,
-                texto_nuevo=texto_nums,
-                explicacion='Formato numérico RAE',
-                confianza=0.85,
-                contexto=contexto,
-                parrafo_num=parrafo_num
-            ))
+        while fallo is None:
+            try:
+                parte, i, correcciones = next(paralelo)
+            except StopIteration:
+                return
+            except Exception as e:
+                fallo = e
+                break
+            entregados[parte] += 1
+            yield parte, i, correcciones
         
-        # 8. Puntuación
-        texto_punt, cambios_punt = self.ortotipo.corregir_puntuacion(texto)
-        if cambios_punt > 0 and texto_punt != texto:
-            correcciones.append(Correccion(
-                categoria='puntuacion',
-                tipo='reemplazo',
-                texto_original=texto,
-                texto_nuevo=texto_punt,
-                explicacion='Coma antes de conjunción adversativa',
-                confianza=0.80,
-                contexto=contexto,
-                parrafo_num=parrafo_num
-            ))
+        print(f"⚠️ Análisis paralelo no disponible ({fallo}); se continúa en secuencial")
+        for parte, parrafos in parrafos_por_parte.items():
+            for i, correcciones in self._iterar_parrafos(parrafos[entregados[parte]:]):
+                yield parte, i, correcciones
+    
+    @staticmethod
+    def _repartir_por_parrafo(bloques, resultados) -> Iterator[Tuple[str, int, List[Correccion]]]:
+        """Reparte las correcciones de cada bloque (parte, párrafos) entre sus párrafos."""
+        for n, ((parte, bloque), correcciones) in enumerate(zip(bloques, resultados), 1):
+            por_parrafo = {}
+            for corr in correcciones:
+                por_parrafo.setdefault(corr.parrafo_num, []).append(corr)
+            for i, _ in bloque:
+                yield parte, i, por_parrafo.get(i, [])
+            print(f"  Bloque {n}/{len(bloques)} completado")
+    
+    @staticmethod
+    def _analizable(texto: str) -> bool:
+        """Los párrafos vacíos o muy cortos no se analizan."""
+        return bool(texto.strip()) and len(texto) >= 10
+    
+    def _analizar_bloque(self, parrafos: List[Tuple[int, str]]) -> List[Correccion]:
+        """
+        Analiza un bloque de párrafos consecutivos (índice, texto) y devuelve
+        sus correcciones en orden de documento. Es la unidad de trabajo del
+        análisis paralelo.
+        """
+        return [corr for _, corrs in self._iterar_parrafos(parrafos) for corr in corrs]
+    
+    def _iterar_parrafos(self, parrafos) -> Iterator[Tuple[int, List[Correccion]]]:
+        """
+        Analiza párrafos (índice, texto) uno a uno y entrega, para cada uno,
+        (índice, correcciones del párrafo). Los párrafos no analizables se
+        entregan con una lista vacía para poder informar del progreso.
+        `parrafos` puede ser una lista o un iterador (lectura en streaming).
+        """
+        # La carga del diccionario es diferida: sin ella `habilitado` sigue en False
+        self.spelling._cargar_diccionario_si_necesario()
         
-        # 9. Extranjerismos
-        extranjerismos = self.ortotipo.detectar_extranjerismos(texto)
-        for ext, alternativa, explicacion in extranjerismos:
-            correcciones.append(Correccion(
-                categoria='extranjerismos',
-                tipo='reemplazo',
-                texto_original=ext,
-                texto_nuevo=alternativa,
-                explicacion=explicacion,
-                confianza=0.75,
-                contexto=contexto,
-                parrafo_num=parrafo_num
-            ))
+        # Dos recorridos sobre los párrafos (estilo por lotes y el resto); tee
+        # solo retiene los que separan a ambos (como mucho un lote de SpaCy)
+        parrafos, parrafos_estilo = itertools.tee(parrafos)
         
-        return correcciones
-    
-    def analizar_documento(self, ruta_docx: str) -> Dict[str, List[Correccion]]:
-        """Analiza documento con TODAS las reglas RAE."""
-        print("\n🔍 Analizando documento con reglas RAE completas...\n")
+        # Los párrafos con análisis de estilo pasan por SpaCy en lotes (nlp.pipe);
+        # el generador entrega cada resultado al llegar a su párrafo
+        estilo_por_parrafo = self.style.analizar_estilo_lote(
+            texto for _, texto in parrafos_estilo if self._analizable(texto) and len(texto) > 20
+        )
         
-        with DocxXMLHandler(ruta_docx) as handler:
-            parrafos = handler.obtener_parrafos()
+        for i, texto in parrafos:
+            if not self._analizable(texto):
+                yield i, []
+                continue
             
-            for i, parrafo in enumerate(parrafos):
-                texto = handler.obtener_texto_parrafo(parrafo)
-                
-                if not texto.strip() or len(texto) < 10:
-                    continue
-                
-                contexto = texto[:100] + "..." if len(texto) > 100 else texto
-                
-                # ═══════════════════════════════════════════════════════════
-                # ORTOTIPOGRAFÍA
-                # ═══════════════════════════════════════════════════════════
-                corr_orto = self.detectar_correcciones_ortotipo(texto, i, contexto)
-                self.correcciones.extend(corr_orto)
+            correcciones = []
+            
+            # ═══════════════════════════════════════════════════════════
+            # ORTOTIPOGRAFÍA
+            # ═══════════════════════════════════════════════════════════
+            corr_orto = self.detectar_correcciones_ortotipo(texto, i)
+            correcciones.extend(corr_orto)
+            
+            # ═══════════════════════════════════════════════════════════
+            # ORTOGRAFÍA (LanguageTool)
+            # ═══════════════════════════════════════════════════════════
+            if self.spelling.habilitado:
+                errores_ortografia = self.spelling.localizar_errores(texto, max_errores=10)
+                for inicio, fin, corr, expl in errores_ortografia:
+                    correcciones.append(self._correccion_en_span(
+                        texto, inicio, fin, corr, 'ortografia', expl,
+                        0.85, i
+                    ))
+            
+            # ═══════════════════════════════════════════════════════════
+            # ESTILO (SpaCy + patrones)
+            # ═══════════════════════════════════════════════════════════
+            if len(texto) > 20:
+                resultados_estilo = next(estilo_por_parrafo)
                 
-                # ═══════════════════════════════════════════════════════════
-                # ORTOGRAFÍA (LanguageTool)
-                # ═══════════════════════════════════════════════════════════
-                if self.spelling.habilitado:
-                    errores_ortografia = self.spelling.detectar_errores(texto, max_errores=10)
-                    for error, corr, expl in errores_ortografia:
-                        self.correcciones.append(Correccion(
-                            categoria='ortografia',
+                for categoria, detecciones in resultados_estilo.items():
+                    for fragmento, sugerencia, explicacion in detecciones:
+                        correcciones.append(Correccion(
+                            categoria=categoria,
                             tipo='reemplazo',
-                            texto_original=error,
-                            texto_nuevo=corr,
-                            explicacion=expl,
-                            confianza=0.85,
-                            contexto=contexto,
+                            texto_original=fragmento,
+                            texto_nuevo=sugerencia,
+                            explicacion=explicacion,
+                            confianza=0.70,
                             parrafo_num=i
                         ))
-                
-                # ═══════════════════════════════════════════════════════════
-                # ESTILO (SpaCy + patrones)
-                # ═══════════════════════════════════════════════════════════
-                if len(texto) > 20:
-                    resultados_estilo = self.style.analizar_estilo(texto)
-                    
-                    for categoria, detecciones in resultados_estilo.items():
-                        for fragmento, sugerencia, explicacion in detecciones:
-                            self.correcciones.append(Correccion(
-                                categoria=categoria,
-                                tipo='reemplazo',
-                                texto_original=fragmento,
-                                texto_nuevo=sugerencia,
-                                explicacion=explicacion,
-                                confianza=0.70,
-                                contexto=contexto,
-                                parrafo_num=i
-                            ))
-                
-                if (i + 1) % 100 == 0:
-                    print(f"  Analizados {i + 1} párrafos...")
+            
+            if (i + 1) % 100 == 0:
+                print(f"  Analizados {i + 1} párrafos...")
+            
+            yield i, correcciones
+    
+    def iterar_correcciones(self, ruta_docx: Documento, procesos: int = 1,
+                            progreso: Callable[[int, int], None] = None) -> Iterator[Correccion]:
+        """
+        Analiza el documento y entrega las correcciones a medida que se
+        encuentran, párrafo a párrafo y en orden de documento, con su ID ya
+        asignado. No guarda nada en el corrector: quien consume decide si
+        acumula, muestra o escribe cada corrección.
         
-        # Asignar IDs únicos
-        for idx, corr in enumerate(self.correcciones):
-            corr.id = idx
+        Args:
+            ruta_docx: Documento a analizar (ruta, bytes o archivo binario)
+            procesos: Número de procesos (1 = secuencial, 0 = todos los núcleos).
+                      Los documentos cortos se analizan siempre en secuencial.
+            progreso: Función opcional progreso(párrafos_analizados, total)
+        """
+        # Cuerpo, encabezados, pies, notas y comentarios, con su tamaño (para el progreso)
+        tamanos = partes_del_documento(ruta_docx)
+        # Texto de cada párrafo, una sola vez por parte: las correcciones lo
+        # referencian por parrafo_num en lugar de copiar su contexto
+        textos = {parte: [] for parte in tamanos}
+        lectores = {parte: LectorParrafos(ruta_docx, parte) for parte in tamanos}
         
-        # Agrupar por categoría
-        correcciones_por_categoria = {}
-        for categoria_key in self.CATEGORIAS.keys():
-            correcciones_por_categoria[categoria_key] = [
-                c for c in self.correcciones if c.categoria == categoria_key
-            ]
+        procesos = procesos or os.cpu_count() or 1
+        if procesos > 1:
+            # El reparto en bloques necesita todos los párrafos de antemano
+            parrafos_por_parte = {parte: list(lector) for parte, lector in lectores.items()}
+            for parte, parrafos in parrafos_por_parte.items():
+                textos[parte].extend(texto for _, texto in parrafos)
+        else:
+            # Secuencial: lectura en streaming (iterparse), cada párrafo se
+            # analiza según se lee y las partes se recorren una tras otra
+            def parrafos_leidos(parte):
+                for i, texto in lectores[parte]:
+                    textos[parte].append(texto)
+                    yield i, texto
+            parrafos_por_parte = {parte: parrafos_leidos(parte) for parte in tamanos}
+        
+        def leidos() -> int:
+            return sum(len(t) for t in textos.values())
+        
+        if procesos > 1 and leidos() >= self.MIN_PARRAFOS_PARALELO:
+            por_parrafo = self._iterar_con_respaldo(parrafos_por_parte, procesos)
+        else:
+            por_parrafo = (
+                (parte, i, correcciones)
+                for parte, parrafos in parrafos_por_parte.items()
+                for i, correcciones in self._iterar_parrafos(parrafos)
+            )
+        
+        siguiente_id = 0
+        analizados = 0
+        for parte, _, correcciones in por_parrafo:
+            for corr in correcciones:
+                corr.parte = parte
+                corr.textos = textos[parte]
+                corr.id = siguiente_id
+                siguiente_id += 1
+                yield corr
+            analizados += 1
+            if progreso:
+                progreso(analizados, self._total_estimado(lectores, tamanos, leidos()))
+    
+    @staticmethod
+    def _total_estimado(lectores: Dict[str, LectorParrafos], tamanos: Dict[str, int],
+                        leidos: int) -> int:
+        """
+        Total de párrafos para el progreso. Mientras se lee en streaming aún no
+        se conoce: se extrapola a partir de la fracción de XML (de todas las
+        partes) ya leída.
+        """
+        if all(lector.terminado for lector in lectores.values()):
+            return leidos
+        bytes_leidos = sum(tamanos[parte] * lector.fraccion_leida
+                           for parte, lector in lectores.items())
+        bytes_totales = sum(tamanos.values())
+        estimado = round(leidos * bytes_totales / bytes_leidos) if bytes_leidos else leidos
+        return max(estimado, leidos)
+    
+    def analizar_documento(self, ruta_docx: Documento, procesos: int = 1,
+                           progreso: Callable[[int, int], None] = None) -> Dict[str, List[Correccion]]:
+        """
+        Analiza documento con TODAS las reglas RAE.
+        Consume `iterar_correcciones`, guarda la lista completa en
+        self.correcciones y la devuelve agrupada por categoría. En la misma
+        pasada construye self.indice_categorias (ver `indexar_por_categoria`).
+        """
+        print("\n🔍 Analizando documento con reglas RAE completas...\n")
+        
+        self.correcciones = []
+        correcciones_por_categoria = {categoria_key: [] for categoria_key in self.CATEGORIAS}
+        indice = {}
+        
+        # Agrupar por categoría e indexar en la misma pasada
+        for corr in self.iterar_correcciones(ruta_docx, procesos, progreso):
+            self.correcciones.append(corr)
+            if corr.categoria in correcciones_por_categoria:
+                correcciones_por_categoria[corr.categoria].append(corr)
+            self._indexar(indice, corr)
+        self.indice_categorias = indice
         
         # Stats
         self.stats_por_categoria = {
@@ -302,9 +609,173 @@ class CorrectorIntegrado:
             if count > 0:
                 print(f"  • {self.CATEGORIAS[cat]}: {count}")
         
+        por_parte = {}
+        for corr in self.correcciones:
+            por_parte[corr.parte] = por_parte.get(corr.parte, 0) + 1
+        if set(por_parte) - {PARTE_DOCUMENTO}:
+            print("  Por parte del documento:")
+            for parte, count in por_parte.items():
+                print(f"  • {nombre_parte(parte)}: {count}")
+        
         return correcciones_por_categoria
+    
+    @staticmethod
+    def _indexar(indice: Dict[str, Dict], corr: Correccion):
+        """Añade una corrección (en orden de documento) al índice por categoría."""
+        entrada = indice.get(corr.categoria)
+        if entrada is None:
+            entrada = indice[corr.categoria] = {
+                'total': 0, 'primer_id': corr.id, 'ultimo_id': corr.id, 'parrafos': []
+            }
+        parrafos = entrada['parrafos']
+        if not parrafos or parrafos[-1][:2] != [corr.parte, corr.parrafo_num]:
+            parrafos.append([corr.parte, corr.parrafo_num, entrada['total']])
+        entrada['total'] += 1
+        entrada['ultimo_id'] = corr.id
+    
+    @classmethod
+    def indexar_por_categoria(cls, correcciones: Iterable[Correccion]) -> Dict[str, Dict]:
+        """
+        Índice de correcciones (en orden de documento) por categoría:
+        {categoria: {'total', 'primer_id', 'ultimo_id', 'parrafos'}}, donde
+        'parrafos' es una lista [parte, parrafo_num, posición] con la posición
+        dentro de la categoría de la primera corrección de cada párrafo. Se calcula
+        una vez al analizar y se guarda con la sesión: la revisión navega con
+        él sin volver a recorrer las correcciones.
+        """
+        indice = {}
+        for corr in correcciones:
+            cls._indexar(indice, corr)
+        return indice
+
+
+# ═══════════════════════════════════════════════════════════════
+# MOTORES COMPARTIDOS POR PROCESO
+# ═══════════════════════════════════════════════════════════════
+# Correctores ya inicializados (reglas, léxico y SpaCy) que esperan trabajo,
+# por perfil de SpaCy. Cada análisis toma uno en exclusiva y lo devuelve al
+# terminar: los análisis simultáneos nunca comparten instancia y solo se crea
+# un corrector nuevo cuando todos los existentes están ocupados.
+_MOTORES_LIBRES: Dict[Optional[str], List[CorrectorIntegrado]] = {}
+_CERROJO_MOTORES = threading.Lock()
+
+
+def precargar_motor(perfil_spacy: Optional[str] = None):
+    """
+    Deja un corrector listo para el perfil dado (con el diccionario cargado).
+    Pensado para llamarse al arrancar el servidor, antes de que Passenger o
+    gunicorn hagan fork: los procesos hijos heredan el motor ya caliente.
+    """
+    with _CERROJO_MOTORES:
+        if _MOTORES_LIBRES.get(perfil_spacy):
+            return
+    corrector = CorrectorIntegrado(perfil_spacy)
+    corrector.spelling._cargar_diccionario_si_necesario()
+    with _CERROJO_MOTORES:
+        _MOTORES_LIBRES.setdefault(perfil_spacy, []).append(corrector)
+
+
+@contextmanager
+def motor_corrector(perfil_spacy: Optional[str] = None) -> Iterator[CorrectorIntegrado]:
+    """
+    Presta un corrector caliente del proceso durante el bloque `with`.
+    Al devolverlo se vacían sus resultados para no retener el último documento.
+    """
+    with _CERROJO_MOTORES:
+        libres = _MOTORES_LIBRES.get(perfil_spacy)
+        corrector = libres.pop() if libres else None
+    if corrector is None:
+        corrector = CorrectorIntegrado(perfil_spacy)
+    try:
+        yield corrector
+    finally:
+        corrector.correcciones = []
+        corrector.stats_por_categoria = {}
+        corrector.indice_categorias = {}
+        with _CERROJO_MOTORES:
+            _MOTORES_LIBRES.setdefault(perfil_spacy, []).append(corrector)
+
+
+def test_respaldo_secuencial(corrector: CorrectorIntegrado):
+    """
+    El análisis paralelo entrega lo mismo que el secuencial sin pasar de la
+    ventana de bloques en vuelo, y si falla a mitad (pool roto al enviar o al
+    recoger un bloque, o al arrancar) sigue en secuencial con el mismo
+    resultado. Usa un pool falso que analiza en el propio proceso.
+    """
+    from concurrent.futures import Future
+    
+    textos = ["El lunes de Enero llegó el Sr Pérez a la O.N.U. a las 10 h.",
+              "Dijo que \"sí\" ,pero no vino nadie mas.",
+              "Párrafo corto",
+              "La reunion duró 1000000 de segundos, sin embargo nadie se quejó."]
+    parrafos_por_parte = {
+        PARTE_DOCUMENTO: list(enumerate(textos * 6)),
+        'word/footnotes.xml': list(enumerate(textos[::-1] * 3)),
+    }
+    
+    def resumen(por_parrafo):
+        return [(parte, i, [(c.parrafo_num, c.texto_original, c.texto_nuevo) for c in corrs])
+                for parte, i, corrs in por_parrafo]
+    
+    esperado = resumen((parte, i, corrs)
+                       for parte, parrafos in parrafos_por_parte.items()
+                       for i, corrs in corrector._iterar_parrafos(parrafos))
+    
+    class PoolFalso:
+        def __init__(self, rompe_al_enviar=None, rompe_al_recoger=None):
+            self.enviados = 0
+            self.recogidos = 0
+            self.max_en_vuelo = 0
+            self.rompe_al_enviar = rompe_al_enviar
+            self.rompe_al_recoger = rompe_al_recoger
+        
+        def submit(self, _funcion, bloque):
+            if self.enviados == self.rompe_al_enviar:
+                raise BrokenProcessPool('roto al enviar')
+            pool = self
+            
+            class FuturoContado(Future):
+                def result(self, timeout=None):
+                    pool.recogidos += 1
+                    return super().result(timeout)
+            futuro = FuturoContado()
+            if self.enviados == self.rompe_al_recoger:
+                futuro.set_exception(BrokenProcessPool('roto al recoger'))
+            else:
+                futuro.set_result(corrector._analizar_bloque(bloque))
+            self.enviados += 1
+            self.max_en_vuelo = max(self.max_en_vuelo, self.enviados - self.recogidos)
+            return futuro
+    
+    procesos = 2
+    ventana = procesos * corrector.BLOQUES_EN_VUELO_POR_PROCESO
+    obtener_pool = corrector._obtener_pool
+    try:
+        for rompe in (None, 0, 1, 3, 7):
+            for pool in (PoolFalso(rompe_al_enviar=rompe), PoolFalso(rompe_al_recoger=rompe)):
+                corrector._obtener_pool = lambda _procesos: pool
+                obtenido = resumen(corrector._iterar_con_respaldo(parrafos_por_parte, procesos))
+                assert obtenido == esperado, (pool.rompe_al_enviar, pool.rompe_al_recoger)
+                assert pool.max_en_vuelo <= ventana, pool.max_en_vuelo
+        
+        def sin_pool(_procesos):
+            raise OSError('sin procesos')
+        corrector._obtener_pool = sin_pool
+        assert resumen(corrector._iterar_con_respaldo(parrafos_por_parte, procesos)) == esperado
+    finally:
+        corrector._obtener_pool = obtener_pool
+    print("✓ Respaldo secuencial del análisis paralelo")
 
 
 if __name__ == '__main__':
     corrector = CorrectorIntegrado()
     print("✓ Corrector RAE completo listo")
+    test_respaldo_secuencial(corrector)
+    
+    # Uso: python corrector_integrado.py documento.docx
+    # Las correcciones se muestran según se van encontrando
+    if len(sys.argv) > 1:
+        for corr in corrector.iterar_correcciones(sys.argv[1]):
+            print(f"  [{corr.id}] §{corr.parrafo_num} {corr.categoria}: "
+                  f"'{corr.texto_original}' → '{corr.texto_nuevo}'")
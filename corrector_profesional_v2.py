@@ -69,10 +69,10 @@ class ProfessionalCorrectorV2:
                 
             # Criterio: Solo corregir palabras en minúscula (no nombres propios)
             if token[0].islower():
-                # Verificar si es válida usando nuestro método robusto
-                if not self.spell._es_palabra_valida(token):
-                    # Es un error, buscar corrección
-                    correccion = self.spell.spell.correction(token.lower())
+                # Verificar si es válida (veredicto cacheado en todo el proceso)
+                valida, correccion = self.spell.veredicto(token.lower())
+                if not valida:
+                    # Es un error: usar la corrección sugerida
                     if correccion and correccion != token.lower():
                         texto_corregido.append(correccion)
                     else:
@@ -116,18 +116,15 @@ class ProfessionalCorrectorV2:
         # Extraer formato
         formato = tc.extraer_formato(run)
         
-        # Obtener posición del run en el párrafo
-        run_index = list(parrafo).index(run)
-        
         # Crear eliminación
         w_del = tc.crear_eliminacion(texto_original, formato)
         
         # Crear inserción
         w_ins = tc.crear_insercion(texto_nuevo, formato)
         
-        # Insertar después del run original
-        parrafo.insert(run_index + 1, w_del)
-        parrafo.insert(run_index + 2, w_ins)
+        # Insertar después del run original (sin buscar su posición en el párrafo)
+        run.addnext(w_del)
+        w_del.addnext(w_ins)
         
         # Eliminar run original
         parrafo.remove(run)
@@ -142,11 +139,9 @@ class ProfessionalCorrectorV2:
             for w_ins in list(parrafo.findall(f".//{{{NAMESPACES['w']}}}ins")):
                 runs_internos = w_ins.findall(f"{{{NAMESPACES['w']}}}r")
                 parent = w_ins.getparent()
-                index = list(parent).index(w_ins)
                 
                 for run in runs_internos:
-                    parent.insert(index, run)
-                    index += 1
+                    w_ins.addprevious(run)
                 
                 parent.remove(w_ins)
                 cambios_removidos += 1
@@ -184,16 +179,20 @@ class ProfessionalCorrectorV2:
             print("🔍 Detectando correcciones ortotipográficas...\n")
             
             for i, parrafo in enumerate(parrafos):
-                # Obtener todos los runs del párrafo
-                runs = parrafo.findall(f"{{{NAMESPACES['w']}}}r")
+                # Runs directos del párrafo con su primer w:t, desde el índice
+                # de desplazamientos (un solo recorrido del párrafo)
+                indice = handler.indice_parrafo(parrafo)
+                runs = []
+                for _, _, texto_elem, run, _ in indice.segmentos:
+                    if run.getparent() is parrafo and (not runs or runs[-1][0] is not run):
+                        runs.append((run, texto_elem))
                 
                 if not runs:
                     continue
                 
                 # Procesar cada run
-                for run in list(runs):  # list() para evitar problemas al modificar
-                    texto_elem = run.find(f"{{{NAMESPACES['w']}}}t")
-                    if texto_elem is None or not texto_elem.text:
+                for run, texto_elem in runs:
+                    if not texto_elem.text:
                         continue
                     
                     texto_original = texto_elem.text
@@ -204,11 +203,13 @@ class ProfessionalCorrectorV2:
                         self.stats['correcciones_totales'] += 1
                         self.stats['parrafos_modificados'] += 1
                 
+                handler.invalidar_indice(parrafo)
                 self.stats['parrafos_procesados'] += 1
                 
                 if (i + 1) % 100 == 0:
                     print(f"  Procesados {i + 1} párrafos...")
             
+            handler.marcar_modificada()
             handler.guardar(ruta_salida)
         
         print(f"\n✓ Guardado: {ruta_salida}")
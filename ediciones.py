@@ -0,0 +1,109 @@
+"""
+Ediciones por desplazamiento sobre el texto de un párrafo.
+Cada edición es una tupla (inicio, fin, reemplazo) referida al texto ORIGINAL,
+de modo que varias reglas pueden proponer cambios sin reescanear el resultado.
+"""
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+
+# (inicio, fin, reemplazo) sobre el texto original del párrafo
+Edicion = Tuple[int, int, str]
+
+
+def recortar_edicion(texto: str, edicion: Edicion) -> Optional[Edicion]:
+    """
+    Reduce una edición a la parte que realmente cambia, quitando el prefijo y
+    el sufijo que comparte con el texto original. Así una corrección que
+    reescribe el párrafo entero para cambiar un carácter ocupa solo ese carácter.
+
+    Returns:
+        La edición recortada, o None si no cambia nada
+    """
+    inicio, fin, reemplazo = edicion
+    original = texto[inicio:fin]
+    minimo = min(len(original), len(reemplazo))
+    prefijo = 0
+    while prefijo < minimo and original[prefijo] == reemplazo[prefijo]:
+        prefijo += 1
+    sufijo = 0
+    while sufijo < minimo - prefijo and original[-1 - sufijo] == reemplazo[-1 - sufijo]:
+        sufijo += 1
+
+    inicio, fin = inicio + prefijo, fin - sufijo
+    reemplazo = reemplazo[prefijo:len(reemplazo) - sufijo]
+    if inicio == fin and not reemplazo:
+        return None
+    return (inicio, fin, reemplazo)
+
+
+def resolver_conflictos(ediciones: Sequence[Edicion]) -> Tuple[List[int], List[int]]:
+    """
+    Ordena las ediciones por posición y separa las que pueden aplicarse juntas
+    de las que se solapan con otra ya aceptada (gana la que empieza antes).
+    Una edición idéntica a otra ya aceptada no se repite ni cuenta como conflicto.
+
+    Args:
+        ediciones: Ediciones (inicio, fin, reemplazo) en cualquier orden
+
+    Returns:
+        (aceptadas, rechazadas): posiciones en `ediciones`; las aceptadas en
+        el orden del texto
+    """
+    aceptadas = []
+    rechazadas = []
+    cursor = 0
+    ultima = None
+
+    for n in sorted(range(len(ediciones)), key=lambda n: (ediciones[n][0], ediciones[n][1])):
+        edicion = ediciones[n]
+        if edicion == ultima:
+            continue  # Duplicada: ya se aplica una vez
+        if edicion[0] < cursor:
+            rechazadas.append(n)  # Solapada con una edición ya aceptada
+            continue
+        aceptadas.append(n)
+        cursor = edicion[1]
+        ultima = edicion
+
+    return aceptadas, rechazadas
+
+
+def aplicar_ediciones(texto: str, ediciones: Iterable[Edicion]) -> str:
+    """
+    Aplica las ediciones en un único recorrido lineal.
+    Las ediciones que se solapan con otra anterior se descartan.
+
+    Args:
+        texto: Texto original
+        ediciones: Ediciones (inicio, fin, reemplazo) en cualquier orden
+
+    Returns:
+        Texto con las ediciones aplicadas
+    """
+    ediciones = list(ediciones)
+    aceptadas, _ = resolver_conflictos(ediciones)
+    partes = []
+    cursor = 0
+
+    for n in aceptadas:
+        inicio, fin, reemplazo = ediciones[n]
+        partes.append(texto[cursor:inicio])
+        partes.append(reemplazo)
+        cursor = fin
+
+    partes.append(texto[cursor:])
+    return ''.join(partes)
+
+
+def ventana_contexto(texto: str, inicio: int, fin: int, ancho: int = 40) -> Tuple[str, str]:
+    """
+    Devuelve el texto inmediatamente anterior y posterior a una edición,
+    recortado a `ancho` caracteres por lado (con puntos suspensivos).
+    """
+    antes = texto[max(0, inicio - ancho):inicio]
+    despues = texto[fin:fin + ancho]
+    if inicio > ancho:
+        antes = '…' + antes
+    if fin + ancho < len(texto):
+        despues = despues + '…'
+    return antes, despues
@@ -0,0 +1,246 @@
+"""
+Índice de sugerencias ortográficas por borrado simétrico (estilo SymSpell).
+Se precalculan los borrados de hasta `distancia` caracteres de cada palabra
+del léxico compacto; al consultar una palabra desconocida basta generar sus
+propios borrados y buscarlos en el índice, sin explorar todo el espacio de
+ediciones como hace pyspellchecker.
+
+El índice se guarda junto al léxico compacto (mismo orden de palabras) y se
+abre con mmap, igual que éste.
+
+Formato (little-endian):
+    cabecera     'SDEL' | versión | N palabras | M entradas | distancia | prefijo (u32)
+    frecuencias  N × u32, frecuencia de la palabra i del léxico
+    claves       M × u32, crc32 de cada borrado, ordenadas
+    palabras     M × u32, índice en el léxico de la palabra que generó el borrado
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Set, Tuple
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+
+from lexico_compacto import LexicoCompacto
+
+
+MAGIA = b'SDEL'
+VERSION = 1
+CABECERA = struct.Struct('<4sIIIII')
+
+DISTANCIA_MAXIMA = 2
+LONGITUD_PREFIJO = 7
+
+# Cubetas (bits altos del hash) en que se ordenan las entradas al construir
+BITS_CUBETA = 12
+
+
+def _borrados(palabra: str, distancia: int) -> Set[str]:
+    """Todas las cadenas obtenidas borrando hasta `distancia` caracteres (incluida la propia)."""
+    resultado = {palabra}
+    frontera = [palabra]
+    for _ in range(distancia):
+        siguiente = []
+        for p in frontera:
+            if len(p) <= 1:
+                continue
+            for i in range(len(p)):
+                borrado = p[:i] + p[i + 1:]
+                if borrado not in resultado:
+                    resultado.add(borrado)
+                    siguiente.append(borrado)
+        frontera = siguiente
+    return resultado
+
+
+def _clave(cadena: str) -> int:
+    """Hash estable (igual en todos los procesos y ejecuciones)."""
+    return zlib.crc32(cadena.encode('utf-8'))
+
+
+def distancia_damerau(a: str, b: str, maximo: int) -> int:
+    """
+    Distancia de Damerau-Levenshtein (transposiciones adyacentes).
+    Devuelve `maximo + 1` en cuanto se sabe que la supera.
+    """
+    if abs(len(a) - len(b)) > maximo:
+        return maximo + 1
+    anterior2 = None
+    anterior = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        actual = [i] + [0] * len(b)
+        minimo_fila = i
+        for j in range(1, len(b) + 1):
+            coste = 0 if a[i - 1] == b[j - 1] else 1
+            valor = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + coste)
+            if (anterior2 is not None and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                valor = min(valor, anterior2[j - 2] + 1)
+            actual[j] = valor
+            minimo_fila = min(minimo_fila, valor)
+        if minimo_fila > maximo:
+            return maximo + 1
+        anterior2, anterior = anterior, actual
+    return anterior[len(b)]
+
+
+def escribir_indice(lexico: LexicoCompacto, frecuencias: Dict[str, int], ruta_salida: str,
+                    distancia: int = DISTANCIA_MAXIMA, prefijo: int = LONGITUD_PREFIJO) -> int:
+    """
+    Construye el índice de borrados sobre un léxico compacto ya generado.
+
+    Args:
+        lexico: Léxico compacto (define el índice de cada palabra)
+        frecuencias: Frecuencia de uso por palabra (las ausentes valen 0)
+        ruta_salida: Ruta del archivo .bin a generar
+        distancia: Distancia de edición máxima de las sugerencias
+        prefijo: Solo se indexan los borrados de los primeros `prefijo` caracteres
+
+    Returns:
+        Número de entradas del índice
+    """
+    frec = array('I', (min(frecuencias.get(p, 0), 0xFFFFFFFF) for p in lexico))
+
+    # Clave combinada (hash << 32 | palabra), repartida en cubetas por los
+    # bits altos del hash: cada cubeta se ordena por separado, de modo que
+    # solo una se convierte a enteros de Python a la vez y el resto sigue
+    # en arrays compactos de 8 bytes por entrada
+    cubetas = [array('Q') for _ in range(1 << BITS_CUBETA)]
+    desplazamiento = 64 - BITS_CUBETA
+    for i, palabra in enumerate(lexico):
+        for borrado in _borrados(palabra[:prefijo], distancia):
+            combinada = (_clave(borrado) << 32) | i
+            cubetas[combinada >> desplazamiento].append(combinada)
+    for n, cubeta in enumerate(cubetas):
+        cubetas[n] = array('Q', sorted(cubeta))
+    total = sum(len(cubeta) for cubeta in cubetas)
+
+    def secciones(extraer):
+        """Tabla u32 (claves o palabras) de cada cubeta, en orden."""
+        for cubeta in cubetas:
+            tabla = array('I', map(extraer, cubeta))
+            if sys.byteorder != 'little':
+                tabla.byteswap()
+            yield tabla.tobytes()
+
+    if sys.byteorder != 'little':
+        frec.byteswap()
+
+    ruta_temporal = f"{ruta_salida}.{os.getpid()}.tmp"
+    with open(ruta_temporal, 'wb') as f:
+        f.write(CABECERA.pack(MAGIA, VERSION, len(lexico), total, distancia, prefijo))
+        f.write(frec.tobytes())
+        f.writelines(secciones(lambda c: c >> 32))
+        f.writelines(secciones(lambda c: c & 0xFFFFFFFF))
+    os.replace(ruta_temporal, ruta_salida)
+
+    return total
+
+
+def _tabla_u32(datos: mmap.mmap, inicio: int, n: int):
+    """Tabla de n enteros u32 sobre el mmap (sin copia si el sistema es little-endian)."""
+    fin = inicio + n * 4
+    if sys.byteorder == 'little' and array('I').itemsize == 4:
+        return memoryview(datos)[inicio:fin].cast('I')
+    tabla = array('I')
+    tabla.frombytes(datos[inicio:fin])
+    if array('I').itemsize == 4 and sys.byteorder != 'little':
+        tabla.byteswap()
+    return tabla
+
+
+class IndiceSugerencias:
+    """Consulta de sugerencias sobre el índice de borrados (solo lectura, mmap)."""
+
+    def __init__(self, ruta: str, lexico: LexicoCompacto):
+        """
+        Abre el índice.
+
+        Args:
+            ruta: Ruta del archivo generado por `escribir_indice`
+            lexico: Léxico compacto sobre el que se construyó
+        """
+        self.ruta = ruta
+        self.lexico = lexico
+        with open(ruta, 'rb') as f:
+            self._datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magia, version, n, m, distancia, prefijo = CABECERA.unpack_from(self._datos, 0)
+        if magia != MAGIA or version != VERSION or n != len(lexico):
+            self._datos.close()
+            raise ValueError(f"Índice de sugerencias no válido para este léxico: {ruta}")
+
+        self.distancia = distancia
+        self.prefijo = prefijo
+        inicio = CABECERA.size
+        self._frecuencias = _tabla_u32(self._datos, inicio, n)
+        self._claves = _tabla_u32(self._datos, inicio + n * 4, m)
+        self._palabras = _tabla_u32(self._datos, inicio + (n + m) * 4, m)
+
+    def frecuencia(self, palabra: str) -> int:
+        """Frecuencia de una palabra del léxico (0 si no está)."""
+        i = self.lexico.indice(palabra)
+        return self._frecuencias[i] if i >= 0 else 0
+
+    def sugerencias(self, palabra: str, max_resultados: int = 5) -> List[Tuple[str, int, int]]:
+        """
+        Sugerencias ordenadas por (distancia, frecuencia descendente).
+
+        Args:
+            palabra: Palabra (en minúsculas) a corregir
+            max_resultados: Número máximo de sugerencias
+
+        Returns:
+            Lista de (sugerencia, distancia, frecuencia)
+        """
+        candidatos = set()
+        for borrado in _borrados(palabra[:self.prefijo], self.distancia):
+            clave = _clave(borrado)
+            desde = bisect_left(self._claves, clave)
+            hasta = bisect_right(self._claves, clave, desde)
+            candidatos.update(self._palabras[desde:hasta])
+
+        resultados = []
+        for i in candidatos:
+            candidata = self.lexico.palabra(i)
+            if candidata == palabra:
+                continue
+            d = distancia_damerau(palabra, candidata, self.distancia)
+            if d <= self.distancia:
+                resultados.append((candidata, d, self._frecuencias[i]))
+
+        resultados.sort(key=lambda r: (r[1], -r[2], r[0]))
+        return resultados[:max_resultados]
+
+    def mejor(self, palabra: str):
+        """Mejor sugerencia o None."""
+        resultados = self.sugerencias(palabra, 1)
+        return resultados[0][0] if resultados else None
+
+    def cerrar(self):
+        """Libera el mapeo de memoria."""
+        for tabla in (self._frecuencias, self._claves, self._palabras):
+            if isinstance(tabla, memoryview):
+                tabla.release()
+        self._datos.close()
+
+
+# ═══════════════════════════════════════════════════════════════
+# ÍNDICE COMPARTIDO POR PROCESO
+# ═══════════════════════════════════════════════════════════════
+_INDICES_ABIERTOS: Dict[str, IndiceSugerencias] = {}
+_CERROJO_INDICES = threading.Lock()
+
+
+def obtener_indice(ruta: str, lexico: LexicoCompacto) -> IndiceSugerencias:
+    """Devuelve el índice de `ruta` compartido por todo el proceso."""
+    ruta = os.path.abspath(ruta)
+    with _CERROJO_INDICES:
+        indice = _INDICES_ABIERTOS.get(ruta)
+        if indice is None or indice.lexico is not lexico:
+            indice = IndiceSugerencias(ruta, lexico)
+            _INDICES_ABIERTOS[ruta] = indice
+        return indice
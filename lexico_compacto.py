@@ -0,0 +1,192 @@
+"""
+Léxico compacto en disco para el corrector ortográfico.
+Guarda las palabras ordenadas y sin duplicados en un único archivo binario
+que se abre con mmap: la carga es instantánea y no crea un objeto str por
+palabra en cada proceso.
+
+Todos los procesos (workers de Passenger/Gunicorn) que abren el mismo archivo
+comparten sus páginas a través de la caché de páginas del sistema operativo,
+así que la memoria no crece con el número de workers.
+
+Formato (little-endian):
+    cabecera   'LEXC' | versión (u32) | número de palabras N (u32) | reservado (u32)
+    offsets    (N + 1) × u32, desplazamientos dentro del bloque de texto
+    texto      palabras en UTF-8 concatenadas, en orden de bytes
+"""
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator
+import mmap
+import os
+import struct
+import sys
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+
+MAGIA = b'LEXC'
+VERSION = 1
+CABECERA = struct.Struct('<4sIII')
+
+
+def escribir_lexico(palabras: Iterable[str], ruta_salida: str) -> int:
+    """
+    Escribe el léxico compacto (ordenado y deduplicado).
+
+    Args:
+        palabras: Palabras en cualquier orden, con posibles repeticiones
+        ruta_salida: Ruta del archivo .bin a generar
+
+    Returns:
+        Número de palabras escritas
+    """
+    # El orden de puntos de código de str coincide con el orden de bytes UTF-8
+    ordenadas = sorted({p for p in palabras if p})
+    codificadas = [p.encode('utf-8') for p in ordenadas]
+
+    offsets = array('I', [0])
+    total = 0
+    for palabra in codificadas:
+        total += len(palabra)
+        offsets.append(total)
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+
+    # Escritura atómica: ningún worker llega a proyectar un archivo a medio escribir
+    ruta_temporal = f"{ruta_salida}.{os.getpid()}.tmp"
+    with open(ruta_temporal, 'wb') as f:
+        f.write(CABECERA.pack(MAGIA, VERSION, len(codificadas), 0))
+        f.write(offsets.tobytes())
+        for palabra in codificadas:
+            f.write(palabra)
+    os.replace(ruta_temporal, ruta_salida)
+
+    return len(codificadas)
+
+
+class LexicoCompacto:
+    """Conjunto de palabras de solo lectura respaldado por un archivo mmap."""
+
+    def __init__(self, ruta: str):
+        """
+        Abre el léxico.
+
+        Args:
+            ruta: Ruta del archivo generado por `escribir_lexico`
+        """
+        self.ruta = ruta
+        with open(ruta, 'rb') as f:
+            self._datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magia, version, n, _ = CABECERA.unpack_from(self._datos, 0)
+        if magia != MAGIA or version != VERSION:
+            self._datos.close()
+            raise ValueError(f"Léxico compacto no válido: {ruta}")
+
+        self._n = n
+        inicio_offsets = CABECERA.size
+        fin_offsets = inicio_offsets + (n + 1) * 4
+        if sys.byteorder == 'little' and array('I').itemsize == 4:
+            # Vista directa sobre el mmap: la tabla no se copia a memoria privada
+            self._offsets = memoryview(self._datos)[inicio_offsets:fin_offsets].cast('I')
+        else:
+            self._offsets = array('I')
+            self._offsets.frombytes(self._datos[inicio_offsets:fin_offsets])
+            if array('I').itemsize == 4 and sys.byteorder != 'little':
+                self._offsets.byteswap()
+        self._base = fin_offsets
+
+    def _bytes_palabra(self, i: int) -> bytes:
+        """Devuelve la palabra i-ésima como bytes UTF-8."""
+        return self._datos[self._base + self._offsets[i]:self._base + self._offsets[i + 1]]
+
+    def palabra(self, i: int) -> str:
+        """Devuelve la palabra i-ésima (orden alfabético de bytes)."""
+        return self._bytes_palabra(i).decode('utf-8')
+
+    def indice(self, palabra: str) -> int:
+        """Busca una palabra por búsqueda binaria. Devuelve su índice o -1."""
+        clave = palabra.encode('utf-8')
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes_palabra(mid) < clave:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n and self._bytes_palabra(lo) == clave:
+            return lo
+        return -1
+
+    def __contains__(self, palabra) -> bool:
+        return isinstance(palabra, str) and self.indice(palabra) >= 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._n):
+            yield self.palabra(i)
+
+    def cerrar(self):
+        """Libera el mapeo de memoria."""
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        self._datos.close()
+
+
+# ═══════════════════════════════════════════════════════════════
+# LÉXICO COMPARTIDO POR PROCESO
+# ═══════════════════════════════════════════════════════════════
+_LEXICOS_ABIERTOS: Dict[str, LexicoCompacto] = {}
+_CERROJO_LEXICOS = threading.Lock()
+
+
+def obtener_lexico(ruta: str) -> LexicoCompacto:
+    """
+    Devuelve el léxico de `ruta` compartido por todo el proceso.
+    Cada archivo se proyecta una sola vez, por muchos SpellingChecker que se creen.
+    """
+    ruta = os.path.abspath(ruta)
+    with _CERROJO_LEXICOS:
+        lexico = _LEXICOS_ABIERTOS.get(ruta)
+        if lexico is None:
+            lexico = LexicoCompacto(ruta)
+            _LEXICOS_ABIERTOS[ruta] = lexico
+        return lexico
+
+
+@contextmanager
+def bloqueo_construccion(ruta: str):
+    """
+    Bloqueo entre procesos (archivo .lock) para que, si varios workers
+    arrancan a la vez sin léxico, solo uno lo construya.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{ruta}.lock", 'w') as cerrojo:
+        fcntl.flock(cerrojo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(cerrojo, fcntl.LOCK_UN)
+
+
+def es_mas_reciente(ruta_lexico: str, *fuentes: str) -> bool:
+    """Indica si el léxico existe y es posterior a todas las fuentes existentes."""
+    if not os.path.exists(ruta_lexico):
+        return False
+    fecha = os.path.getmtime(ruta_lexico)
+    return all(os.path.getmtime(f) <= fecha for f in fuentes if os.path.exists(f))
+
+
+if __name__ == '__main__':
+    # Paso de construcción: genera es_lexico.bin a partir de los diccionarios
+    from spelling_checker import SpellingChecker
+
+    SpellingChecker().construir_lexico_compacto()
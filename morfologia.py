@@ -0,0 +1,274 @@
+"""
+Validación morfológica para el corrector ortográfico.
+Reconoce formas que no figuran tal cual en el diccionario pero que se
+derivan de una que sí figura:
+- Enclíticos simples y compuestos: "cómpramelo", "dándoselo", "vámonos", "sentaos"
+- Sufijos derivativos: "-mente", "-ísimo", "-ito", "-illo" (con sus variantes)
+- Gerundios e imperativos plurales a partir del infinitivo ("dando" → "dar")
+- Tildes: la que exige el enclítico se quita y la que desplaza la derivación
+  se restituye ("rapidísimo" → "rápido")
+
+Todas las reglas se guardan en un trie de sufijos invertidos: basta un único
+recorrido desde el final de la palabra para obtener todas las reglas aplicables.
+"""
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+# Cambia con las reglas: invalida los veredictos cacheados con reglas anteriores
+VERSION_REGLAS = 2
+
+QUITAR_TILDE = str.maketrans('áéíóú', 'aeiou')
+PONER_TILDE = str.maketrans('aeiou', 'áéíóú')
+VOCALES = set('aeiouáéíóú')
+
+
+class ReglaAfijo:
+    """Sufijo que se elimina y terminaciones que se prueban en su lugar."""
+
+    __slots__ = ('sufijo', 'reemplazos', 'enclitico', 'restituir_tilde', 'exige_tilde',
+                 'raiz_minima', 'vacio_tras_vocal', 'confirmacion')
+
+    def __init__(self, sufijo, reemplazos, enclitico=False, restituir_tilde=False,
+                 exige_tilde=False, raiz_minima=2, vacio_tras_vocal=True, confirmacion=None):
+        self.sufijo = sufijo
+        self.reemplazos = reemplazos
+        self.enclitico = enclitico
+        self.restituir_tilde = restituir_tilde
+        self.exige_tilde = exige_tilde
+        self.raiz_minima = raiz_minima
+        # Con False, el reemplazo vacío solo vale tras consonante ("papelito")
+        self.vacio_tras_vocal = vacio_tras_vocal
+        # Terminación que, sobre la raíz, debe estar también en el diccionario
+        # para aceptar la forma base ("sentad" → "sentar" solo si existe "sentado")
+        self.confirmacion = confirmacion
+
+
+class ValidadorMorfologico:
+    """Validador de formas derivadas mediante un trie de sufijos invertidos."""
+
+    # ═══════════════════════════════════════════════════════════════
+    # ENCLÍTICOS
+    # ═══════════════════════════════════════════════════════════════
+    ENCLITICOS = ['me', 'te', 'se', 'nos', 'os', 'lo', 'la', 'los', 'las', 'le', 'les']
+
+    # Primer pronombre de un grupo compuesto (indirecto/reflexivo) y segundo (directo)
+    ENCLITICOS_PRIMEROS = ['me', 'te', 'se', 'nos', 'os', 'le', 'les']
+    ENCLITICOS_SEGUNDOS = ['lo', 'la', 'los', 'las', 'le', 'les', 'me', 'te', 'nos']
+
+    # ═══════════════════════════════════════════════════════════════
+    # SUFIJOS DERIVATIVOS (sufijo → terminaciones de la forma base)
+    # ═══════════════════════════════════════════════════════════════
+    SUFIJOS_DERIVATIVOS = {
+        # Adverbios en -mente sobre la forma femenina o invariable
+        'mente': [''],
+        'amente': ['a', 'o'], 'emente': ['e'],
+        # Superlativos
+        'ísimo': ['o', 'e', ''], 'ísima': ['a', 'o', 'e', ''],
+        'ísimos': ['o', 'os', 'e', 'es', ''], 'ísimas': ['a', 'as', 'o', 'e', 'es', ''],
+        'císimo': ['z'], 'císima': ['z'], 'císimos': ['z'], 'císimas': ['z'],
+        'quísimo': ['co'], 'quísima': ['ca', 'co'], 'quísimos': ['co'], 'quísimas': ['ca', 'co'],
+        'guísimo': ['go'], 'guísima': ['ga', 'go'], 'guísimos': ['go'], 'guísimas': ['ga', 'go'],
+        'bilísimo': ['ble'], 'bilísima': ['ble'], 'bilísimos': ['ble'], 'bilísimas': ['ble'],
+        # Diminutivos
+        'ito': ['o', 'e', ''], 'ita': ['a', 'o', 'e', ''],
+        'itos': ['o', 'os', 'e', 'es', ''], 'itas': ['a', 'as', 'o', 'e', 'es', ''],
+        'cito': ['', 'e'], 'cita': ['', 'e'], 'citos': ['', 'e', 's', 'es'], 'citas': ['', 'e', 's', 'es'],
+        'ecito': ['', 'e'], 'ecita': ['', 'a', 'e'],
+        'quito': ['co'], 'quita': ['ca'], 'quitos': ['co', 'cos'], 'quitas': ['ca', 'cas'],
+        'guito': ['go'], 'guita': ['ga'],
+        'illo': ['o', 'e', ''], 'illa': ['a', 'o', 'e', ''],
+        'illos': ['o', 'os', 'e', 'es', ''], 'illas': ['a', 'as', 'o', 'e', 'es', ''],
+    }
+
+    # Raíz mínima de los derivativos: evita que "que", "de" o "nos" hagan de base
+    RAIZ_MINIMA_DERIVATIVOS = 4
+
+    # Gerundio → infinitivo
+    SUFIJOS_VERBALES = {
+        'ando': ['ar'], 'iendo': ['er', 'ir'], 'yendo': ['er', 'ir'],
+    }
+
+    # Imperativo plural → infinitivo, confirmado con el participio regular
+    SUFIJOS_IMPERATIVOS = {
+        'ad': (['ar'], 'ado'), 'ed': (['er'], 'ido'), 'id': (['ir'], 'ido'),
+    }
+
+    _TRIE: Dict = None
+
+    @classmethod
+    def _reglas(cls) -> Iterator[ReglaAfijo]:
+        """Todas las reglas de afijos."""
+        for pronombre in cls.ENCLITICOS:
+            yield ReglaAfijo(pronombre, cls._reemplazos_enclitico(pronombre), enclitico=True)
+
+        # Enclíticos compuestos: la forma resultante siempre lleva tilde escrita
+        for primero in cls.ENCLITICOS_PRIMEROS:
+            for segundo in cls.ENCLITICOS_SEGUNDOS:
+                if primero == segundo:
+                    continue
+                yield ReglaAfijo(primero + segundo, cls._reemplazos_enclitico(primero),
+                                 enclitico=True, exige_tilde=True)
+
+        for sufijo, reemplazos in cls.SUFIJOS_DERIVATIVOS.items():
+            # -cito/-ecito se añaden a bases vocálicas ("cafecito"); el resto
+            # sin cambio de terminación solo tras consonante ("papelito")
+            yield ReglaAfijo(sufijo, reemplazos, restituir_tilde=not sufijo.endswith('mente'),
+                             raiz_minima=cls.RAIZ_MINIMA_DERIVATIVOS,
+                             vacio_tras_vocal=sufijo.lstrip('e').startswith('c'))
+
+        for sufijo, reemplazos in cls.SUFIJOS_VERBALES.items():
+            # Raíz de una letra: "dando" → "dar", "oyendo" → "oír"
+            yield ReglaAfijo(sufijo, reemplazos, restituir_tilde=True, raiz_minima=1)
+
+        for sufijo, (reemplazos, participio) in cls.SUFIJOS_IMPERATIVOS.items():
+            # "mad" no es "mar" ni "fued" es "fuer": hace falta raíz verbal real
+            yield ReglaAfijo(sufijo, reemplazos, restituir_tilde=True, confirmacion=participio)
+
+    @staticmethod
+    def _reemplazos_enclitico(primer_pronombre: str) -> List[str]:
+        """
+        Terminaciones que recupera la forma verbal al quitar el enclítico:
+        'vámonos' → 'vamos' (se pierde la -s) y 'sentaos' → 'sentad' (se pierde la -d).
+        """
+        if primer_pronombre == 'nos':
+            return ['', 's']
+        if primer_pronombre == 'os':
+            return ['', 'd']
+        return ['']
+
+    @classmethod
+    def _compilar_trie(cls):
+        """Construye el trie de sufijos invertidos (una sola vez por clase)."""
+        trie = {}
+        for regla in cls._reglas():
+            nodo = trie
+            for c in reversed(regla.sufijo):
+                nodo = nodo.setdefault(c, {})
+            nodo.setdefault(None, []).append(regla)
+        cls._TRIE = trie
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._compilar_trie()
+
+    def __init__(self, contiene: Callable[[str], bool]):
+        """
+        Args:
+            contiene: Función que indica si una forma está en el diccionario
+        """
+        self.contiene = contiene
+
+    def reglas_aplicables(self, palabra: str) -> List[ReglaAfijo]:
+        """
+        Reglas cuyo sufijo termina la palabra, obtenidas en un único recorrido
+        desde el final y ordenadas del sufijo más largo al más corto
+        ("felicísimo" prueba "-císimo" antes que "-ísimo").
+        """
+        reglas = []
+        nodo = self._TRIE
+        for c in reversed(palabra):
+            nodo = nodo.get(c)
+            if nodo is None:
+                break
+            reglas.extend(nodo.get(None, ()))
+        reglas.reverse()
+        return reglas
+
+    @staticmethod
+    def _variantes_tilde(raiz: str) -> Iterator[str]:
+        """La raíz sin tilde y con tilde en cada una de sus tres últimas vocales."""
+        sin_tilde = raiz.translate(QUITAR_TILDE)
+        yield sin_tilde
+        posiciones = [i for i, c in enumerate(sin_tilde) if c in VOCALES][-3:]
+        for i in reversed(posiciones):
+            yield sin_tilde[:i] + sin_tilde[i].translate(PONER_TILDE) + sin_tilde[i + 1:]
+
+    def analizar(self, palabra: str, encliticos: bool = True) -> Optional[str]:
+        """
+        Busca una forma del diccionario de la que derive `palabra` (en minúsculas).
+
+        Args:
+            palabra: Forma a analizar
+            encliticos: Probar también los enclíticos (False al analizar la
+                        forma verbal que queda tras quitarlos)
+
+        Returns:
+            La forma base encontrada, o None
+        """
+        for regla in self.reglas_aplicables(palabra):
+            if regla.enclitico and not encliticos:
+                continue
+            raiz = palabra[:-len(regla.sufijo)]
+            if len(raiz) < regla.raiz_minima:
+                continue
+
+            tiene_tilde = raiz != raiz.translate(QUITAR_TILDE)
+            if regla.exige_tilde and not tiene_tilde:
+                continue
+            # Enclítico sin tilde: solo raíces largas ("comerlo", pero no "bala" → "ba")
+            if regla.enclitico and not tiene_tilde and len(raiz) <= 3:
+                continue
+
+            for reemplazo in regla.reemplazos:
+                if not reemplazo and not regla.vacio_tras_vocal and raiz[-1] in VOCALES:
+                    continue
+                base = raiz + reemplazo
+                if regla.confirmacion and not self._confirmar(raiz, regla.confirmacion):
+                    continue
+                if self.contiene(base):
+                    return base
+                if regla.enclitico:
+                    # La tilde de "cómpralo" o "dándoselo" la pone el enclítico
+                    variantes = (base.translate(QUITAR_TILDE),) if tiene_tilde else ()
+                elif regla.restituir_tilde:
+                    variantes = self._variantes_tilde(base)
+                else:
+                    variantes = ()
+                for variante in variantes:
+                    if variante != base and self.contiene(variante):
+                        return variante
+                if regla.enclitico:
+                    # "dándoselo" → "dando" → "dar"
+                    forma_verbal = base.translate(QUITAR_TILDE) if tiene_tilde else base
+                    infinitivo = self.analizar(forma_verbal, encliticos=False)
+                    if infinitivo:
+                        return infinitivo
+        return None
+
+    def _confirmar(self, raiz: str, terminacion: str) -> bool:
+        """La raíz (con o sin la tilde desplazada) existe con esa terminación."""
+        return any(self.contiene(variante + terminacion)
+                   for variante in self._variantes_tilde(raiz))
+
+    def es_valida(self, palabra: str) -> bool:
+        """Indica si la palabra deriva de una forma del diccionario."""
+        return self.analizar(palabra) is not None
+
+
+ValidadorMorfologico._compilar_trie()
+
+
+def test_morfologia():
+    """Test del validador con el diccionario de respaldo (es_full.txt)."""
+    import os
+    print("Test de ValidadorMorfologico...")
+    ruta = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'es_full.txt')
+    with open(ruta, encoding='utf-8') as f:
+        palabras = {linea.strip().lower() for linea in f}
+    validador = ValidadorMorfologico(palabras.__contains__)
+
+    for palabra in ['sentad', 'dando', 'papelito', 'fácilmente', 'suavemente',
+                    'rapidísimo', 'cafecito']:
+        assert validador.es_valida(palabra), palabra
+    print("✓ Formas derivadas aceptadas")
+
+    for palabra in ['mad', 'pad', 'fued', 'queito', 'deito', 'tecito', 'laillo',
+                    'quemente', 'nosito', 'masito', 'aguamente']:
+        assert not validador.es_valida(palabra), palabra
+    print("✓ Raíces cortas y falsos imperativos rechazados")
+
+    print("✓ Tests básicos pasados")
+
+
+if __name__ == '__main__':
+    test_morfologia()
@@ -5,6 +5,9 @@ Versión 3: Incluye TODAS las recomendaciones ortotipográficas.
 import re
 from typing import Tuple, List, Dict
 
+from ediciones import Edicion, aplicar_ediciones, resolver_conflictos
+from buscador_multipatron import BuscadorMultipatron
+
 
 class OrtotipografiaRulesV3:
     """Reglas ortotipográficas RAE - Versión completa."""
@@ -108,6 +111,37 @@ class OrtotipografiaRulesV3:
     def __init__(self):
         pass
     
+    # ═══════════════════════════════════════════════════════════════
+    # PATRONES PRECOMPILADOS (una expresión por categoría)
+    # ═══════════════════════════════════════════════════════════════
+    @staticmethod
+    def _alternativa(terminos) -> str:
+        """Une términos literales en una alternancia (los más largos primero)."""
+        return '|'.join(re.escape(t) for t in sorted(terminos, key=len, reverse=True))
+    
+    @classmethod
+    def _compilar_patrones(cls):
+        """
+        Compila los diccionarios de la clase en un patrón por categoría.
+        Se ejecuta una sola vez al cargar la clase (y en cada subclase),
+        de modo que cada párrafo se recorre una vez por categoría.
+        """
+        cls._PATRON_UNIDADES = re.compile(
+            rf'(\d)(\s+)({cls._alternativa(cls.UNIDADES)})(?!\w)')
+        capitalizadas = [p.capitalize() for p in cls.DIAS_SEMANA + cls.MESES + cls.ESTACIONES]
+        cls._PATRON_MAYUSCULAS = re.compile(rf'\b(?:{cls._alternativa(capitalizadas)})\b')
+        cls._PATRON_ABREVIATURAS = re.compile(
+            rf'\b(?:{cls._alternativa(cls.ABREVIATURAS)})(?!\.)\b')
+        cls._PATRON_SIGLAS = re.compile(cls._alternativa(cls.SIGLAS_INCORRECTAS))
+        # Los extranjerismos pueden crecer a miles de entradas: autómata Aho–Corasick
+        cls._LISTA_EXTRANJERISMOS = list(cls.EXTRANJERISMOS.items())
+        cls._BUSCADOR_EXTRANJERISMOS = BuscadorMultipatron(
+            termino for termino, _ in cls._LISTA_EXTRANJERISMOS)
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._compilar_patrones()
+    
     # ═══════════════════════════════════════════════════════════════
     # COMILLAS
     # ═══════════════════════════════════════════════════════════════
@@ -121,79 +155,86 @@ class OrtotipografiaRulesV3:
             return 2 if inglesas_abiertas > 0 else 1
         return 0
     
-    def corregir_comillas_jerarquia(self, texto: str) -> Tuple[str, int]:
-        """Convierte comillas respetando jerarquía RAE."""
-        resultado = texto
-        cambios = 0
+    def ediciones_comillas_jerarquia(self, texto: str) -> List[Edicion]:
+        """Ediciones para convertir comillas respetando jerarquía RAE."""
+        ediciones = []
         
         for match in re.finditer(r'"([^"]+)"', texto):
             nivel = self.detectar_nivel_comillas(texto, match.start())
             apertura, cierre = self.COMILLAS_NIVEL[nivel]
-            original = match.group(0)
-            nuevo = f"{apertura}{match.group(1)}{cierre}"
             
-            if original != nuevo:
-                resultado = resultado.replace(original, nuevo, 1)
-                cambios += 1
-        
-        return resultado, cambios
+            # Solo se tocan las comillas, no el texto citado: así no chocan
+            # con otras correcciones dentro de la cita
+            if texto[match.start()] != apertura:
+                ediciones.append((match.start(), match.start() + 1, apertura))
+            if texto[match.end() - 1] != cierre:
+                ediciones.append((match.end() - 1, match.end(), cierre))
+        
+        return ediciones
+    
+    def corregir_comillas_jerarquia(self, texto: str) -> Tuple[str, int]:
+        """Convierte comillas respetando jerarquía RAE."""
+        return self._aplicar(texto, self.ediciones_comillas_jerarquia(texto))
     
     # ═══════════════════════════════════════════════════════════════
     # RAYAS
     # ═══════════════════════════════════════════════════════════════
-    def corregir_rayas_espaciado(self, texto: str) -> Tuple[str, int]:
-        """Corrige espaciado con rayas según RAE."""
-        resultado = texto
-        cambios = 0
+    def ediciones_rayas_espaciado(self, texto: str) -> List[Edicion]:
+        """Ediciones de espaciado con rayas según RAE."""
+        ediciones = []
         
         # palabra—palabra → palabra —palabra
-        for match in re.finditer(r'(\w)(—)(\w)', resultado):
-            resultado = resultado.replace(match.group(0), 
-                f"{match.group(1)} {match.group(2)}{match.group(3)}", 1)
-            cambios += 1
+        rayas_espaciadas = set()
+        for match in re.finditer(r'(\w)(—)(\w)', texto):
+            ediciones.append((match.start(2), match.start(2), ' '))
+            rayas_espaciadas.add(match.start(2))
         
         # —palabra—palabra → —palabra— palabra
-        for match in re.finditer(r'(—\w+—)(\w)', resultado):
-            resultado = resultado.replace(match.group(0), 
-                f"{match.group(1)} {match.group(2)}", 1)
-            cambios += 1
+        # (salvo si la raya de cierre ya se separó arriba: aplicadas en
+        # secuencia, la regla anterior impedía que esta coincidiera)
+        for match in re.finditer(r'(—\w+—)(\w)', texto):
+            if match.end(1) - 1 not in rayas_espaciadas:
+                ediciones.append((match.end(1), match.end(1), ' '))
         
         # Guion a raya en diálogos
-        for match in re.finditer(r'(^|\n)-\s+', resultado):
-            resultado = resultado.replace(match.group(0), 
-                f"{match.group(1)}{self.RAYA} ", 1)
-            cambios += 1
+        for match in re.finditer(r'(^|\n)(-\s+)', texto):
+            ediciones.append((match.start(2), match.end(2), f"{self.RAYA} "))
         
-        return resultado, cambios
+        # Solapes: la misma política que al aplicar las correcciones
+        aceptadas, _ = resolver_conflictos(ediciones)
+        return [ediciones[n] for n in aceptadas]
+    
+    def corregir_rayas_espaciado(self, texto: str) -> Tuple[str, int]:
+        """Corrige espaciado con rayas según RAE."""
+        return self._aplicar(texto, self.ediciones_rayas_espaciado(texto))
     
     # ═══════════════════════════════════════════════════════════════
     # ESPACIOS DUROS
     # ═══════════════════════════════════════════════════════════════
+    def ediciones_espacios_duros(self, texto: str) -> List[Edicion]:
+        """Ediciones que ponen espacio duro antes de unidades."""
+        return [
+            (match.start(2), match.end(2), self.ESPACIO_DURO)
+            for match in self._PATRON_UNIDADES.finditer(texto)
+            if match.group(2) != self.ESPACIO_DURO  # Ya es correcto
+        ]
+    
     def corregir_espacios_duros(self, texto: str) -> Tuple[str, int]:
         """Añade espacios duros antes de unidades."""
-        resultado = texto
-        cambios = 0
-        
-        for unidad in self.UNIDADES:
-            patron = rf'(\d)\s+{re.escape(unidad)}(?!\w)'
-            for match in re.finditer(patron, resultado):
-                resultado = resultado.replace(match.group(0), 
-                    f"{match.group(1)}{self.ESPACIO_DURO}{unidad}", 1)
-                cambios += 1
-        
-        return resultado, cambios
+        return self._aplicar(texto, self.ediciones_espacios_duros(texto))
 
     # ═══════════════════════════════════════════════════════════════
     # ESPACIOS MÚLTIPLES
     # ═══════════════════════════════════════════════════════════════
+    def ediciones_espacios_multiples(self, texto: str) -> List[Edicion]:
+        """Ediciones que reducen espacios múltiples a uno simple."""
+        if '  ' not in texto:
+            return []
+        return [(m.start(), m.end(), ' ') for m in re.finditer(r'[ ]{2,}', texto)]
+    
     def corregir_espacios_multiples(self, texto: str) -> Tuple[str, int]:
         """Corrige espacios múltiples (dos o más) por un espacio simple."""
-        if '  ' not in texto:
-            return texto, 0
-            
-        nuevo_texto = re.sub(r'[ ]{2,}', ' ', texto)
-        cambios = 1 if nuevo_texto != texto else 0
-        return nuevo_texto, cambios
+        return self._aplicar(texto, self.ediciones_espacios_multiples(texto))
     
     # ═══════════════════════════════════════════════════════════════
     # MAYÚSCULAS INCORRECTAS (con detección de nombres propios)
@@ -241,152 +282,127 @@ class OrtotipografiaRulesV3:
         
         return False
     
-    def corregir_mayusculas(self, texto: str) -> Tuple[str, int]:
+    def ediciones_mayusculas(self, texto: str) -> List[Edicion]:
         """
-        Corrige mayúsculas incorrectas en días, meses, estaciones.
+        Ediciones de mayúsculas incorrectas en días, meses, estaciones.
         RESPETA nombres propios como 'Domingo de Soto', 'Primero de Mayo'.
         """
-        resultado = texto
-        cambios = 0
-        
-        todas_palabras = self.DIAS_SEMANA + self.MESES + self.ESTACIONES
+        ediciones = []
         
-        for palabra in todas_palabras:
-            palabra_mayus = palabra.capitalize()
+        for match in self._PATRON_MAYUSCULAS.finditer(texto):
+            palabra_mayus = match.group(0)
+            pos = match.start()
             
-            # Buscar todas las ocurrencias
-            patron = rf'\b{palabra_mayus}\b'
+            # Verificar si está al inicio de oración (no corregir)
+            texto_antes = texto[:pos].rstrip()
+            if texto_antes == '' or texto_antes[-1] in '.!?¿¡':
+                continue
             
-            for match in re.finditer(patron, resultado):
-                pos = match.start()
-                
-                # Verificar si está al inicio de oración (no corregir)
-                texto_antes = resultado[:pos].rstrip()
-                if texto_antes == '' or texto_antes[-1] in '.!?¿¡':
-                    continue
-                
-                # Verificar si forma parte de nombre propio (no corregir)
-                if self.es_parte_nombre_propio(resultado, pos, palabra_mayus):
-                    continue
-                
-                # Si llegamos aquí, es un uso incorrecto de mayúscula
-                resultado = resultado[:pos] + palabra + resultado[pos + len(palabra_mayus):]
-                cambios += 1
+            # Verificar si forma parte de nombre propio (no corregir)
+            if self.es_parte_nombre_propio(texto, pos, palabra_mayus):
+                continue
+            
+            # Si llegamos aquí, es un uso incorrecto de mayúscula
+            ediciones.append((pos, match.end(), palabra_mayus.lower()))
         
-        return resultado, cambios
+        return ediciones
+    
+    def corregir_mayusculas(self, texto: str) -> Tuple[str, int]:
+        """Corrige mayúsculas incorrectas en días, meses, estaciones."""
+        return self._aplicar(texto, self.ediciones_mayusculas(texto))
 
     
     # ═══════════════════════════════════════════════════════════════
     # ABREVIATURAS
     # ═══════════════════════════════════════════════════════════════
+    def ediciones_abreviaturas(self, texto: str) -> List[Edicion]:
+        """Ediciones para abreviaturas sin punto."""
+        # El patrón solo casa si la abreviatura NO tiene punto después
+        return [
+            (match.start(), match.end(), self.ABREVIATURAS[match.group(0)])
+            for match in self._PATRON_ABREVIATURAS.finditer(texto)
+        ]
+    
     def corregir_abreviaturas(self, texto: str) -> Tuple[str, int]:
         """Corrige abreviaturas sin punto."""
-        resultado = texto
-        cambios = 0
-        
-        for abrev_sin, abrev_con in self.ABREVIATURAS.items():
-            # Solo reemplazar si NO tiene punto después
-            patron = rf'\b{re.escape(abrev_sin)}(?!\.)\b'
-            for match in re.finditer(patron, resultado):
-                resultado = resultado[:match.start()] + abrev_con + resultado[match.end():]
-                cambios += 1
-        
-        return resultado, cambios
+        return self._aplicar(texto, self.ediciones_abreviaturas(texto))
     
     # ═══════════════════════════════════════════════════════════════
     # SIGLAS
     # ═══════════════════════════════════════════════════════════════
+    def ediciones_siglas(self, texto: str) -> List[Edicion]:
+        """Ediciones para siglas con puntos incorrectos."""
+        return [
+            (match.start(), match.end(), self.SIGLAS_INCORRECTAS[match.group(0)])
+            for match in self._PATRON_SIGLAS.finditer(texto)
+        ]
+    
     def corregir_siglas(self, texto: str) -> Tuple[str, int]:
         """Corrige siglas con puntos incorrectos."""
-        resultado = texto
-        cambios = 0
-        
-        for sigla_mal, sigla_bien in self.SIGLAS_INCORRECTAS.items():
-            if sigla_mal in resultado:
-                resultado = resultado.replace(sigla_mal, sigla_bien)
-                cambios += 1
-        
-        return resultado, cambios
+        return self._aplicar(texto, self.ediciones_siglas(texto))
     
     # ═══════════════════════════════════════════════════════════════
     # NÚMEROS (formato español)
     # ═══════════════════════════════════════════════════════════════
-    def corregir_numeros(self, texto: str) -> Tuple[str, int]:
-        """Corrige formato de números según RAE española."""
-        resultado = texto
-        cambios = 0
+    def ediciones_numeros(self, texto: str) -> List[Edicion]:
+        """Ediciones de formato de números según RAE española."""
+        ediciones = []
         
         # Punto decimal → coma decimal (3.14 → 3,14)
-        patron_decimal = r'(\d+)\.(\d{1,2})(?!\d)'
-        for match in re.finditer(patron_decimal, resultado):
-            original = match.group(0)
-            nuevo = f"{match.group(1)},{match.group(2)}"
-            resultado = resultado.replace(original, nuevo, 1)
-            cambios += 1
+        for match in re.finditer(r'(\d+)\.(\d{1,2})(?!\d)', texto):
+            ediciones.append((match.end(1), match.end(1) + 1, ','))
         
         # Horas: 13:30h → 13:30 h (espacio antes de h)
-        patron_hora = r'(\d{1,2}:\d{2})h\b'
-        for match in re.finditer(patron_hora, resultado):
-            resultado = resultado.replace(match.group(0), 
-                f"{match.group(1)} h", 1)
-            cambios += 1
+        for match in re.finditer(r'(\d{1,2}:\d{2})h\b', texto):
+            ediciones.append((match.end(1), match.end(1), ' '))
         
-        return resultado, cambios
+        return ediciones
+    
+    def corregir_numeros(self, texto: str) -> Tuple[str, int]:
+        """Corrige formato de números según RAE española."""
+        return self._aplicar(texto, self.ediciones_numeros(texto))
     
     # ═══════════════════════════════════════════════════════════════
     # PUNTUACIÓN AVANZADA
     # ═══════════════════════════════════════════════════════════════
+    def ediciones_puntuacion(self, texto: str) -> List[Edicion]:
+        """Ediciones de puntuación: coma antes de 'pero', 'aunque' y 'sino'."""
+        return [
+            (match.start(), match.start(), ',')
+            for match in re.finditer(r'(?<=\w)\s+(?:pero|aunque|sino)\b', texto, re.IGNORECASE)
+        ]
+    
     def corregir_puntuacion(self, texto: str) -> Tuple[str, int]:
         """Corrige errores de puntuación según RAE."""
-        resultado = texto
-        cambios = 0
-        
-        # Coma antes de "pero" (si falta)
-        patron_pero = r'(\w)\s+pero\b'
-        for match in re.finditer(patron_pero, resultado, re.IGNORECASE):
-            if match.group(1) not in ',;:':
-                original = match.group(0)
-                nuevo = f"{match.group(1)}, pero"
-                resultado = resultado.replace(original, nuevo, 1)
-                cambios += 1
-        
-        # Coma antes de "aunque"
-        patron_aunque = r'(\w)\s+aunque\b'
-        for match in re.finditer(patron_aunque, resultado, re.IGNORECASE):
-            if match.group(1) not in ',;:':
-                original = match.group(0)
-                nuevo = f"{match.group(1)}, aunque"
-                resultado = resultado.replace(original, nuevo, 1)
-                cambios += 1
-        
-        # Coma antes de "sino"
-        patron_sino = r'(\w)\s+sino\b'
-        for match in re.finditer(patron_sino, resultado, re.IGNORECASE):
-            if match.group(1) not in ',;:':
-                original = match.group(0)
-                nuevo = f"{match.group(1)}, sino"
-                resultado = resultado.replace(original, nuevo, 1)
-                cambios += 1
-        
-        return resultado, cambios
+        return self._aplicar(texto, self.ediciones_puntuacion(texto))
     
     # ═══════════════════════════════════════════════════════════════
     # EXTRANJERISMOS
     # ═══════════════════════════════════════════════════════════════
+    def ediciones_extranjerismos(self, texto: str) -> List[Edicion]:
+        """Localiza extranjerismos: (inicio, fin, alternativa)."""
+        return [
+            (inicio, fin, self._LISTA_EXTRANJERISMOS[indice][1])
+            for inicio, fin, indice in self._BUSCADOR_EXTRANJERISMOS.buscar(texto)
+        ]
+    
     def detectar_extranjerismos(self, texto: str) -> List[Tuple[str, str, str]]:
         """Detecta extranjerismos y sugiere alternativas."""
-        resultados = []
-        
-        for extranjerismo, alternativa in self.EXTRANJERISMOS.items():
-            patron = rf'\b{re.escape(extranjerismo)}\b'
-            for match in re.finditer(patron, texto, re.IGNORECASE):
-                resultados.append((
-                    match.group(0),
-                    alternativa,
-                    f"Extranjerismo: usar '{alternativa}' o escribir en cursiva"
-                ))
-        
-        return resultados
+        return [
+            (texto[inicio:fin], alternativa,
+             f"Extranjerismo: usar '{alternativa}' o escribir en cursiva")
+            for inicio, fin, alternativa in self.ediciones_extranjerismos(texto)
+        ]
+    
+    # ═══════════════════════════════════════════════════════════════
+    # UTILIDADES DE EDICIÓN
+    # ═══════════════════════════════════════════════════════════════
+    @staticmethod
+    def _aplicar(texto: str, ediciones: List[Edicion]) -> Tuple[str, int]:
+        """Aplica las ediciones de una regla y devuelve (texto, cambios)."""
+        if not ediciones:
+            return texto, 0
+        return aplicar_ediciones(texto, ediciones), len(ediciones)
     
     # ═══════════════════════════════════════════════════════════════
     # MÉTODO PRINCIPAL
@@ -425,6 +441,9 @@ class OrtotipografiaRulesV3:
             return 'Corrección ortotipográfica RAE'
 
 
+OrtotipografiaRulesV3._compilar_patrones()
+
+
 if __name__ == '__main__':
     ortotipo = OrtotipografiaRulesV3()
     
@@ -20,14 +20,14 @@ def review_page(session_id, page):
         
         # Agrupar por categoría
         from corrector_integrado import CorrectorIntegrado
-        corrector_temp = CorrectorIntegrado()
+        categorias = CorrectorIntegrado.CATEGORIAS
         
         datos_para_template = {}
-        for categoria in corrector_temp.CATEGORIAS.keys():
+        for categoria in categorias.keys():
             corrs_categoria = [c for c in correcciones_pagina if c.categoria == categoria]
             if corrs_categoria:
                 datos_para_template[categoria] = {
-                    'nombre': corrector_temp.CATEGORIAS[categoria],
+                    'nombre': categorias[categoria],
                     'correcciones': corrs_categoria
                 }
         
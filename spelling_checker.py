@@ -1,108 +1,322 @@
 """
 Detector de errores ortográficos mejorado.
 Usa diccionario local + heurísticas morfológicas para español.
-Optimizado para carga rápida.
+Optimizado para carga rápida: si existe el léxico compacto (es_lexico.bin)
+se abre con mmap en lugar de reconstruir el diccionario en cada proceso.
+Las sugerencias salen del índice de borrados simétricos (es_sugerencias.bin)
+construido sobre ese mismo léxico, y los veredictos (válida / sugerencia)
+se guardan en una caché LRU compartida por todo el proceso.
 """
 from spellchecker import SpellChecker
-from typing import List, Tuple, Set
+from lexico_compacto import (LexicoCompacto, obtener_lexico, escribir_lexico,
+                             es_mas_reciente, bloqueo_construccion)
+from indice_sugerencias import escribir_indice, obtener_indice
+from cache_lru import CacheLRU, AUSENTE
+from morfologia import ValidadorMorfologico, VERSION_REGLAS
+from typing import Dict, List, Optional, Tuple, Set, Iterator
+import atexit
 import re
 import os
+import threading
 
 class SpellingChecker:
     """Detector de errores ortográficos robusto con soporte de morfología simple."""
     
-    def __init__(self, dict_path='es_full.txt'):
+    # Palabras comunes (stopwords) que siempre se aceptan
+    PALABRAS_COMUNES = {
+        'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas',
+        'y', 'e', 'o', 'u', 'pero', 'aunque', 'sin', 'con', 'de', 'del', 'al',
+        'a', 'ante', 'bajo', 'cabe', 'con', 'contra', 'de', 'desde', 'en',
+        'entre', 'hacia', 'hasta', 'para', 'por', 'según', 'sin', 'so', 'sobre', 'tras',
+        'yo', 'tú', 'él', 'ella', 'ello', 'nosotros', 'nosotras', 'vosotros', 'vosotras',
+        'ellos', 'ellas', 'me', 'te', 'se', 'nos', 'os', 'le', 'les', 'lo', 'la',
+        'mi', 'mis', 'tu', 'tus', 'su', 'sus', 'nuestro', 'nuestra', 'nuestros', 'nuestras',
+        'que', 'qué', 'cual', 'cuál', 'quien', 'quién', 'cuanto', 'cuánto',
+        'como', 'cómo', 'donde', 'dónde', 'cuando', 'cuándo',
+        'es', 'son', 'fue', 'fueron', 'era', 'eran', 'ser', 'estar', 'está', 'están',
+        'haber', 'ha', 'han', 'había', 'habían', 'hay',
+        'tener', 'tengo', 'tiene', 'tienen', 'tenía', 'tenían',
+        'hacer', 'hago', 'hace', 'hacen', 'hizo', 'hicieron',
+        'ir', 'voy', 'va', 'van', 'fui', 'fueron', 'iba', 'iban',
+        'decir', 'dice', 'dicen', 'dijo', 'dijeron',
+        'ver', 'veo', 've', 'ven', 'vio', 'vieron',
+        'dar', 'doy', 'da', 'dan', 'dio', 'dieron',
+        'sí', 'no', 'más', 'muy', 'ya', 'bien', 'mal', 'así', 'todo', 'toda', 'todos', 'todas',
+        'este', 'esta', 'estos', 'estas', 'ese', 'esa', 'esos', 'esas', 'aquel', 'aquella',
+        'aquellos', 'aquellas', 'esto', 'eso', 'aquello',
+        'porque', 'pues', 'si', 'tan', 'tanto',
+        'neomarxismo', 'neoliberalismo', 'globalismo', 'identitario', 'identitarios'
+    }
+
+    # Caché de veredictos palabra → (válida, sugerencia), común a todas las
+    # instancias del proceso (párrafos, documentos y peticiones)
+    CACHE_VEREDICTOS = CacheLRU(capacidad=50000)
+    _caches_persistentes: Set[str] = set()
+    _cerrojo_persistencia = threading.Lock()
+    
+    def __init__(self, dict_path='es_full.txt', lexico_path='es_lexico.bin',
+                 indice_path='es_sugerencias.bin', ruta_cache=None):
         """
         Inicializa el detector.
         NOTA: La carga del diccionario se retrasa hasta el primer uso (Lazy Loading)
         para evitar timeouts al arrancar la aplicación web en el servidor.
+        
+        Args:
+            ruta_cache: Si se indica, la caché de veredictos se carga de este
+                        archivo y se guarda en él al terminar el proceso
         """
         self.habilitado = False
         self.custom_words: Set[str] = set()
-        self.spell = None
+        self._spell = None
         self._diccionario_cargado = False
         self.dict_path_backup = dict_path
+        self.lexico_path = lexico_path
+        self.indice_path = indice_path
+        self.indice = None
+        self.ruta_cache = ruta_cache
+        self.morfologia = ValidadorMorfologico(lambda forma: forma in self.custom_words)
         
         print("⏳ SpellingChecker inicializado (carga diferida)")
 
+    @property
+    def spell(self):
+        """Instancia de pyspellchecker; solo se carga cuando hace falta una sugerencia."""
+        if self._spell is None:
+            self._spell = SpellChecker(language='es')
+        return self._spell
+
+    @spell.setter
+    def spell(self, valor):
+        self._spell = valor
+
+    def _rutas(self) -> Tuple[str, str, str]:
+        """Rutas absolutas (corpus, respaldo, léxico compacto)."""
+        # Usamos ruta absoluta para evitar errores en Hostinger/Passenger
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        return (
+            os.path.join(base_dir, 'es_frecuencias.txt'),
+            os.path.join(base_dir, self.dict_path_backup),
+            os.path.join(base_dir, self.lexico_path),
+        )
+
+    def _ruta_indice(self) -> str:
+        """Ruta absoluta del índice de sugerencias."""
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), self.indice_path)
+
+    def leer_frecuencias(self) -> Dict[str, int]:
+        """
+        Frecuencias de uso para ordenar las sugerencias: las de es_frecuencias.txt
+        y, para las palabras que no aparecen ahí, las de pyspellchecker.
+        """
+        frec_path = self._rutas()[0]
+        frecuencias = dict(self.spell.word_frequency.dictionary)
+        if os.path.exists(frec_path):
+            try:
+                with open(frec_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) >= 2 and parts[1].isdigit():
+                            frecuencias[parts[0].lower()] = int(parts[1])
+            except Exception as e:
+                print(f"⚠️ Error leyendo frecuencias: {e}")
+        return frecuencias
+
+    def recopilar_palabras(self) -> Iterator[str]:
+        """
+        Recorre todas las fuentes del diccionario (con posibles repeticiones):
+        corpus de frecuencias, respaldo local, palabras comunes y pyspellchecker.
+        """
+        frec_path, backup_path, _ = self._rutas()
+        
+        # 1. Cargar "es_frecuencias.txt" (Corpus masivo)
+        if os.path.exists(frec_path):
+            print(f"   Cargando corpus masivo: {frec_path} ...")
+            try:
+                with open(frec_path, 'r', encoding='utf-8') as f:
+                    # Leer línea a línea optimizado
+                    count = 0
+                    for line in f:
+                        parts = line.split()
+                        if parts:
+                            word = parts[0].lower()
+                            if word.replace('.', '').replace('-', '').isalpha():
+                                yield word
+                                count += 1
+                    print(f"   ✓ Corpus cargado: {count} formas")
+            except Exception as e:
+                print(f"⚠️ Error leyendo corpus: {e}")
+        else:
+            print(f"⚠️ No se encontró corpus en: {frec_path}")
+
+        # 2. Cargar diccionario local de respaldo (es_full.txt)
+        if os.path.exists(backup_path):
+            print(f"   Cargando respaldo: {backup_path}")
+            try:
+                with open(backup_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            yield line.strip().lower()
+            except Exception as e:
+                print(f"⚠️ Error leyendo respaldo: {e}")
+        
+        # 3. Añadir palabras comunes (Stopwords)
+        yield from self.PALABRAS_COMUNES
+
+        # 4. Diccionario de pyspellchecker
+        yield from self.spell.word_frequency.dictionary.keys()
+
+    def construir_lexico_compacto(self, ruta_salida: str = None) -> str:
+        """
+        Paso de construcción: escribe el léxico compacto (ordenado y
+        deduplicado) con todas las fuentes del diccionario.
+        
+        Returns:
+            Ruta del archivo generado
+        """
+        ruta_salida = ruta_salida or self._rutas()[2]
+        print(f"⏳ Construyendo léxico compacto: {ruta_salida}")
+        total = escribir_lexico(self.recopilar_palabras(), ruta_salida)
+        print(f"✓ Léxico compacto escrito: {total} formas")
+        self.construir_indice_sugerencias(ruta_salida)
+        return ruta_salida
+
+    def construir_indice_sugerencias(self, ruta_lexico: str = None) -> str:
+        """
+        Paso de construcción: escribe el índice de borrados simétricos
+        sobre el léxico compacto (que debe existir ya).
+        
+        Returns:
+            Ruta del índice generado
+        """
+        ruta_lexico = ruta_lexico or self._rutas()[2]
+        ruta_indice = self._ruta_indice()
+        print(f"⏳ Construyendo índice de sugerencias: {ruta_indice}")
+        # Se abre el archivo recién escrito, no la proyección compartida (puede ser antigua)
+        lexico = LexicoCompacto(ruta_lexico)
+        try:
+            total = escribir_indice(lexico, self.leer_frecuencias(), ruta_indice)
+        finally:
+            lexico.cerrar()
+        print(f"✓ Índice de sugerencias escrito: {total} entradas")
+        return ruta_indice
+
+    def asegurar_lexico_compacto(self) -> str:
+        """
+        Genera el léxico compacto si falta o está desactualizado.
+        Es un paso de despliegue (python spelling_checker.py --construir), no
+        de arranque: la aplicación web nunca lo construye. Si se lanza dos
+        veces a la vez, solo una lo construye.
+        
+        Returns:
+            Ruta del léxico compacto
+        """
+        frec_path, backup_path, lexico_path = self._rutas()
+        indice_path = self._ruta_indice()
+
+        def al_dia() -> bool:
+            return (es_mas_reciente(lexico_path, frec_path, backup_path)
+                    and es_mas_reciente(indice_path, lexico_path))
+
+        if al_dia():
+            return lexico_path
+        with bloqueo_construccion(lexico_path):
+            # Otro worker puede haberlo generado mientras esperábamos
+            if not es_mas_reciente(lexico_path, frec_path, backup_path):
+                self.construir_lexico_compacto(lexico_path)
+            elif not es_mas_reciente(indice_path, lexico_path):
+                self.construir_indice_sugerencias(lexico_path)
+        return lexico_path
+
+    def lexico_al_dia(self) -> bool:
+        """
+        Indica si el léxico compacto existe y es posterior a los diccionarios
+        de texto. No construye nada: si no lo está, lo deja dicho en el log.
+        """
+        frec_path, backup_path, lexico_path = self._rutas()
+        if not os.path.exists(lexico_path):
+            print(f"⚠️ Falta el léxico compacto ({os.path.basename(lexico_path)}); se usarán "
+                  "los diccionarios de texto. Genéralo con: python spelling_checker.py --construir")
+            return False
+        if not es_mas_reciente(lexico_path, frec_path, backup_path):
+            print("⚠️ El léxico compacto es anterior a los diccionarios; se usarán los de texto. "
+                  "Regenéralo con: python spelling_checker.py --construir")
+            return False
+        return True
+
+    def _firma_diccionario(self) -> str:
+        """
+        Identifica la versión de los datos cargados (archivos y fechas), para
+        descartar veredictos cacheados con otro diccionario.
+        """
+        frec_path, backup_path, lexico_path = self._rutas()
+        if isinstance(self.custom_words, set):
+            fuentes = [frec_path, backup_path]
+        else:
+            fuentes = [lexico_path, self._ruta_indice() if self.indice is not None else '']
+        return '|'.join(
+            [f"morfologia:{VERSION_REGLAS}"] +
+            [f"{os.path.basename(f)}:{os.path.getmtime(f)}" for f in fuentes if os.path.exists(f)]
+        )
+
+    def _preparar_cache(self):
+        """Vincula la caché al diccionario cargado y, si procede, la carga de disco."""
+        cache = self.CACHE_VEREDICTOS
+        cache.asegurar_firma(self._firma_diccionario())
+        if not self.ruta_cache:
+            return
+
+        with self._cerrojo_persistencia:
+            ruta = os.path.abspath(self.ruta_cache)
+            if ruta in self._caches_persistentes:
+                return
+            self._caches_persistentes.add(ruta)
+            try:
+                cargadas = cache.cargar_de_disco(ruta)
+                if cargadas:
+                    print(f"✓ Caché ortográfica cargada: {cargadas} palabras")
+            except Exception as e:
+                print(f"⚠️ No se pudo leer la caché ortográfica ({e})")
+            atexit.register(self.guardar_cache)
+
+    def guardar_cache(self):
+        """Guarda la caché de veredictos en `ruta_cache`."""
+        if not self.ruta_cache:
+            return
+        try:
+            self.CACHE_VEREDICTOS.guardar_en_disco(self.ruta_cache)
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar la caché ortográfica ({e})")
+
     def _cargar_diccionario_si_necesario(self):
         """Carga los diccionarios solo si no están cargados aún."""
         if self._diccionario_cargado:
             return
 
         print("⏳ Iniciando carga de diccionarios (Lazy Load)...")
-        base_dir = os.path.dirname(os.path.abspath(__file__))
+        frec_path, backup_path, lexico_path = self._rutas()
+        
+        # Camino rápido: léxico compacto precompilado (mmap, sin parseo).
+        # Nunca se construye aquí: falta o desfasado, se usan los de texto
+        if self.lexico_al_dia():
+            try:
+                self.custom_words = obtener_lexico(lexico_path)
+                self.habilitado = True
+                self._diccionario_cargado = True
+                print(f"✓ Léxico compacto cargado: {len(self.custom_words)} formas")
+                self._cargar_indice(lexico_path)
+                self._preparar_cache()
+                return
+            except Exception as e:
+                print(f"⚠️ Léxico compacto no utilizable ({e}); se cargan los diccionarios de texto")
+                self.custom_words = set()
         
         try:
-            # 1. Cargar "es_frecuencias.txt" (Corpus masivo)
-            # Usamos ruta absoluta para evitar errores en Hostinger/Passenger
-            frec_path = os.path.join(base_dir, 'es_frecuencias.txt')
-            
-            if os.path.exists(frec_path):
-                print(f"   Cargando corpus masivo: {frec_path} ...")
-                try:
-                    with open(frec_path, 'r', encoding='utf-8') as f:
-                        # Leer línea a línea optimizado
-                        count = 0
-                        for line in f:
-                            parts = line.split()
-                            if parts:
-                                word = parts[0].lower()
-                                if word.replace('.', '').replace('-', '').isalpha():
-                                    self.custom_words.add(word)
-                                    count += 1
-                        print(f"   ✓ Corpus cargado: {count} formas")
-                except Exception as e:
-                    print(f"⚠️ Error leyendo corpus: {e}")
-            else:
-                print(f"⚠️ No se encontró corpus en: {frec_path}")
-
-            # 2. Cargar diccionario local de respaldo (es_full.txt)
-            backup_path = os.path.join(base_dir, self.dict_path_backup)
-            if os.path.exists(backup_path):
-                print(f"   Cargando respaldo: {backup_path}")
-                try:
-                    with open(backup_path, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            if line.strip():
-                                self.custom_words.add(line.strip().lower())
-                except Exception as e:
-                    print(f"⚠️ Error leyendo respaldo: {e}")
-            
-            # 1.5. Añadir palabras comunes (Stopwords)
-            palabras_comunes = {
-                'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas',
-                'y', 'e', 'o', 'u', 'pero', 'aunque', 'sin', 'con', 'de', 'del', 'al',
-                'a', 'ante', 'bajo', 'cabe', 'con', 'contra', 'de', 'desde', 'en',
-                'entre', 'hacia', 'hasta', 'para', 'por', 'según', 'sin', 'so', 'sobre', 'tras',
-                'yo', 'tú', 'él', 'ella', 'ello', 'nosotros', 'nosotras', 'vosotros', 'vosotras',
-                'ellos', 'ellas', 'me', 'te', 'se', 'nos', 'os', 'le', 'les', 'lo', 'la',
-                'mi', 'mis', 'tu', 'tus', 'su', 'sus', 'nuestro', 'nuestra', 'nuestros', 'nuestras',
-                'que', 'qué', 'cual', 'cuál', 'quien', 'quién', 'cuanto', 'cuánto',
-                'como', 'cómo', 'donde', 'dónde', 'cuando', 'cuándo',
-                'es', 'son', 'fue', 'fueron', 'era', 'eran', 'ser', 'estar', 'está', 'están',
-                'haber', 'ha', 'han', 'había', 'habían', 'hay',
-                'tener', 'tengo', 'tiene', 'tienen', 'tenía', 'tenían',
-                'hacer', 'hago', 'hace', 'hacen', 'hizo', 'hicieron',
-                'ir', 'voy', 'va', 'van', 'fui', 'fueron', 'iba', 'iban',
-                'decir', 'dice', 'dicen', 'dijo', 'dijeron',
-                'ver', 'veo', 've', 'ven', 'vio', 'vieron',
-                'dar', 'doy', 'da', 'dan', 'dio', 'dieron',
-                'sí', 'no', 'más', 'muy', 'ya', 'bien', 'mal', 'así', 'todo', 'toda', 'todos', 'todas',
-                'este', 'esta', 'estos', 'estas', 'ese', 'esa', 'esos', 'esas', 'aquel', 'aquella',
-                'aquellos', 'aquellas', 'esto', 'eso', 'aquello',
-                'porque', 'pues', 'si', 'tan', 'tanto',
-                'neomarxismo', 'neoliberalismo', 'globalismo', 'identitario', 'identitarios'
-            }
-            self.custom_words.update(palabras_comunes)
-
-            # 3. Inicializar pyspellchecker
-            self.spell = SpellChecker(language='es')
-            self.custom_words.update(self.spell.word_frequency.dictionary.keys())
+            self.custom_words.update(self.recopilar_palabras())
             
             self.habilitado = True
             self._diccionario_cargado = True
             print(f"✓ Diccionario TOTAL cargado: {len(self.custom_words)} formas")
+            self._preparar_cache()
             
         except Exception as e:
             print(f"⚠️ Error crítico cargando diccionario: {e}")
@@ -111,6 +325,42 @@ class SpellingChecker:
             # Marcar como intentado para no reintentar infinitamente si falla
             self._diccionario_cargado = True
 
+    def _cargar_indice(self, lexico_path: str):
+        """Abre el índice de sugerencias si corresponde al léxico cargado."""
+        indice_path = self._ruta_indice()
+        if not es_mas_reciente(indice_path, lexico_path):
+            print("⚠️ Sin índice de sugerencias actualizado; se usará pyspellchecker")
+            return
+        try:
+            self.indice = obtener_indice(indice_path, self.custom_words)
+        except Exception as e:
+            print(f"⚠️ Índice de sugerencias no utilizable ({e}); se usará pyspellchecker")
+            self.indice = None
+
+    def sugerir(self, palabra: str) -> Optional[str]:
+        """
+        Mejor sugerencia para una palabra desconocida (en minúsculas).
+        Usa el índice de borrados; sin él, recurre a pyspellchecker.
+        """
+        if self.indice is not None:
+            return self.indice.mejor(palabra)
+        return self.spell.correction(palabra)
+
+    def veredicto(self, palabra: str) -> Tuple[bool, Optional[str]]:
+        """
+        (válida, sugerencia) de una palabra en minúsculas, a través de la caché.
+        La sugerencia es None para las palabras válidas.
+        """
+        self._cargar_diccionario_si_necesario()
+        resultado = self.CACHE_VEREDICTOS.obtener(palabra)
+        if resultado is AUSENTE:
+            if self._es_palabra_valida(palabra):
+                resultado = (True, None)
+            else:
+                resultado = (False, self.sugerir(palabra))
+            self.CACHE_VEREDICTOS.guardar(palabra, resultado)
+        return resultado
+
     def _es_palabra_valida(self, palabra: str) -> bool:
         """
         Verifica si una palabra es válida usando diccionario masivo.
@@ -120,22 +370,18 @@ class SpellingChecker:
         
         p = palabra.lower()
         
-        # 1. Búsqueda directa (O(1))
+        # 1. Búsqueda directa
         if p in self.custom_words:
             return True
 
-        # Enclíticos simples
-        for sufijo in ['lo', 'la', 'los', 'las', 'me', 'te', 'se', 'nos', 'le', 'les']:
-            if p.endswith(sufijo):
-                raiz = p[:-len(sufijo)]
-                if raiz in self.custom_words:
-                    if len(raiz) > 3:
-                        return True
-        return False
+        # 2. Enclíticos (simples y compuestos), derivación y tildes desplazadas
+        return self.morfologia.es_valida(p)
 
-    def detectar_errores(self, texto: str, max_errores: int = 50) -> List[Tuple[str, str, str]]:
+    def localizar_errores(self, texto: str, max_errores: int = 50) -> List[Tuple[int, int, str, str]]:
         """
         Detecta errores ortográficos palabra por palabra.
+        Devuelve (inicio, fin, sugerencia, explicación) con los desplazamientos
+        de cada palabra errónea dentro del texto.
         """
         if not texto.strip():
             return []
@@ -167,19 +413,20 @@ class SpellingChecker:
             if p_lower in palabras_verificadas:
                 continue
                 
-            if self._es_palabra_valida(p_lower):
+            valida, correccion = self.veredicto(p_lower)
+            if valida:
                 palabras_verificadas.add(p_lower)
                 continue
                 
             # Error confirmado
-            correccion = self.spell.correction(p_lower)
             if not correccion or correccion == p_lower:
                 sugerencia = "(sin sugerencia)"
             else:
                 sugerencia = correccion
                 
             resultados.append((
-                palabra,
+                match.start(1),
+                match.end(1),
                 sugerencia,
                 f"Ortografía: '{palabra}' no encontrada"
             ))
@@ -192,52 +439,20 @@ class SpellingChecker:
         """
         Detecta errores ortográficos palabra por palabra.
         """
-        if not self.habilitado or not texto.strip():
-            return []
-            
-        resultados = []
-        
-        # Tokenizar texto
-        palabras_encontradas = re.finditer(r'\b([a-záéíóúñü]+)\b', texto, re.IGNORECASE)
-        
-        errores_count = 0
-        palabras_verificadas = set()
-        
-        for match in palabras_encontradas:
-            if errores_count >= max_errores:
-                break
-                
-            palabra = match.group(1)
-            
-            if not palabra[0].islower():
-                continue
-                
-            p_lower = palabra.lower()
-            if p_lower in palabras_verificadas:
-                continue
-                
-            if self._es_palabra_valida(p_lower):
-                palabras_verificadas.add(p_lower)
-                continue
-                
-            # Error confirmado
-            correccion = self.spell.correction(p_lower)
-            if not correccion or correccion == p_lower:
-                sugerencia = "(sin sugerencia)"
-            else:
-                sugerencia = correccion
-                
-            resultados.append((
-                palabra,
-                sugerencia,
-                f"Ortografía: '{palabra}' no encontrada"
-            ))
-            errores_count += 1
-            palabras_verificadas.add(p_lower)
-                    
-        return resultados
+        return [
+            (texto[inicio:fin], sugerencia, explicacion)
+            for inicio, fin, sugerencia, explicacion in self.localizar_errores(texto, max_errores)
+        ]
 
 if __name__ == '__main__':
+    import sys
+
+    if '--construir' in sys.argv[1:]:
+        # Paso de despliegue: genera es_lexico.bin y es_sugerencias.bin si
+        # faltan o son anteriores a los diccionarios de texto
+        print(f"✓ Léxico listo: {SpellingChecker().asegurar_lexico_compacto()}")
+        sys.exit(0)
+
     # Test
     checker = SpellingChecker()
     
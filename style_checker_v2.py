@@ -3,9 +3,11 @@ Detector de problemas de estilo COMPLETO según RAE.
 Versión 2: Incluye queísmo/dequeísmo, leísmo/laísmo/loísmo y más.
 """
 import spacy
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Iterable, Iterator
 import re
 
+from buscador_multipatron import BuscadorMultipatron
+
 
 class StyleCheckerV2:
     """Analizador de estilo completo con SpaCy."""
@@ -68,37 +70,114 @@ class StyleCheckerV2:
     # ═══════════════════════════════════════════════════════════════
     # COSISMO
     # ═══════════════════════════════════════════════════════════════
+    # Expresiones literales: el buscador multipatrón comprueba los límites de palabra
     PATRONES_COSISMO = [
-        (r'\bla cosa es que\b', 'el asunto es que', 'Expresión vaga'),
-        (r'\balguna cosa\b', 'algo', 'Más específico'),
-        (r'\bcualquier cosa\b', 'cualquier elemento/opción', 'Más preciso'),
-        (r'\buna cosa\b', '[especificar qué]', 'Término vago'),
-        (r'\blas cosas\b', '[especificar qué]', 'Término vago'),
-        (r'\bcosas\b', '[especificar]', 'Término genérico'),
+        ('la cosa es que', 'el asunto es que', 'Expresión vaga'),
+        ('alguna cosa', 'algo', 'Más específico'),
+        ('cualquier cosa', 'cualquier elemento/opción', 'Más preciso'),
+        ('una cosa', '[especificar qué]', 'Término vago'),
+        ('las cosas', '[especificar qué]', 'Término vago'),
+        ('cosas', '[especificar]', 'Término genérico'),
     ]
     
-    def __init__(self):
-        """Inicializa el modelo de SpaCy."""
+    # Párrafos por lote en nlp.pipe
+    TAMANO_LOTE = 64
+    
+    # ═══════════════════════════════════════════════════════════════
+    # PERFILES DE PIPELINE SPACY (componentes que NO se cargan)
+    # ═══════════════════════════════════════════════════════════════
+    # Los detectores solo usan lemma_, tag_, pos_ y morph: el NER nunca
+    # hace falta y el parser (dependencias) tampoco en las reglas actuales
+    PERFILES_SPACY = {
+        'completo': [],
+        'estilo': ['ner'],
+        'minimo': ['ner', 'parser'],
+    }
+    PERFIL_POR_DEFECTO = 'estilo'
+    
+    # Componentes del modelo que necesita cada detector basado en SpaCy
+    COMPONENTES_DETECTOR = {
+        'voz_pasiva': ['morphologizer', 'lemmatizer'],
+        'gerundios': ['morphologizer'],
+    }
+    
+    @classmethod
+    def _compilar_buscadores(cls):
+        """
+        Construye una sola vez (al cargar la clase) los autómatas Aho–Corasick
+        de redundancias y cosismo, para detectar todas las entradas en una pasada.
+        """
+        cls._LISTA_REDUNDANCIAS = list(cls.REDUNDANCIAS.items())
+        cls._BUSCADOR_REDUNDANCIAS = BuscadorMultipatron(
+            redundancia for redundancia, _ in cls._LISTA_REDUNDANCIAS)
+        cls._BUSCADOR_COSISMO = BuscadorMultipatron(
+            patron for patron, _, _ in cls.PATRONES_COSISMO)
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._compilar_buscadores()
+    
+    def __init__(self, perfil: str = None):
+        """
+        Inicializa el modelo de SpaCy.
+        
+        Args:
+            perfil: Perfil de pipeline ('completo', 'estilo' o 'minimo');
+                    por defecto PERFIL_POR_DEFECTO
+        """
+        self.perfil = perfil or self.PERFIL_POR_DEFECTO
+        if self.perfil not in self.PERFILES_SPACY:
+            raise ValueError(f"Perfil de SpaCy desconocido: {self.perfil} "
+                             f"(válidos: {', '.join(self.PERFILES_SPACY)})")
+        self.detectores_no_disponibles: Dict[str, List[str]] = {}
+        
         try:
-            print("⏳ Cargando modelo SpaCy español...")
-            self.nlp = spacy.load("es_core_news_sm")
+            print(f"⏳ Cargando modelo SpaCy español (perfil '{self.perfil}')...")
+            self.nlp = spacy.load("es_core_news_sm", exclude=self.PERFILES_SPACY[self.perfil])
             self.habilitado = True
-            print("✓ SpaCy cargado correctamente")
+            print(f"✓ SpaCy cargado correctamente: {', '.join(self.nlp.pipe_names)}")
         except Exception as e:
             print(f"⚠️ SpaCy no disponible: {e}")
             self.nlp = None
             self.habilitado = False
+        
+        self._comprobar_detectores()
+    
+    def _comprobar_detectores(self):
+        """Anota (e informa de) los detectores sin los componentes que necesitan."""
+        componentes = set(self.nlp.pipe_names) if self.habilitado else set()
+        for detector, necesarios in self.COMPONENTES_DETECTOR.items():
+            faltan = [c for c in necesarios if c not in componentes]
+            if faltan:
+                self.detectores_no_disponibles[detector] = faltan
+        
+        if self.habilitado:
+            for detector, faltan in self.detectores_no_disponibles.items():
+                print(f"⚠️ Detector '{detector}' no disponible en el perfil "
+                      f"'{self.perfil}' (falta: {', '.join(faltan)})")
+    
+    def detector_disponible(self, detector: str) -> bool:
+        """Indica si un detector basado en SpaCy puede ejecutarse."""
+        return self.habilitado and detector not in self.detectores_no_disponibles
+    
+    def _usa_spacy(self) -> bool:
+        """Indica si algún detector necesita analizar el texto con SpaCy."""
+        return any(self.detector_disponible(d) for d in self.COMPONENTES_DETECTOR)
     
     # ═══════════════════════════════════════════════════════════════
     # VOZ PASIVA
     # ═══════════════════════════════════════════════════════════════
-    def detectar_voz_pasiva(self, texto: str) -> List[Tuple[str, str, str]]:
-        """Detecta construcciones de voz pasiva perifrástica."""
-        if not self.habilitado:
+    def detectar_voz_pasiva(self, texto: str, doc=None) -> List[Tuple[str, str, str]]:
+        """
+        Detecta construcciones de voz pasiva perifrástica.
+        Si se pasa `doc` (ya analizado por SpaCy) no se vuelve a analizar el texto.
+        """
+        if not self.detector_disponible('voz_pasiva'):
             return []
         
         resultados = []
-        doc = self.nlp(texto)
+        if doc is None:
+            doc = self.nlp(texto)
         
         for i, token in enumerate(doc):
             if token.lemma_ in ['ser', 'estar'] and i + 1 < len(doc):
@@ -126,9 +205,9 @@ class StyleCheckerV2:
         """Detecta uso excesivo de 'cosa'."""
         resultados = []
         
-        for patron, sugerencia, explicacion in self.PATRONES_COSISMO:
-            for match in re.finditer(patron, texto, re.IGNORECASE):
-                resultados.append((match.group(0), sugerencia, explicacion))
+        for inicio, fin, indice in self._BUSCADOR_COSISMO.buscar(texto):
+            _, sugerencia, explicacion = self.PATRONES_COSISMO[indice]
+            resultados.append((texto[inicio:fin], sugerencia, explicacion))
         
         return resultados
     
@@ -139,27 +218,29 @@ class StyleCheckerV2:
         """Detecta redundancias y pleonasmos."""
         resultados = []
         
-        for redundancia, correccion in self.REDUNDANCIAS.items():
-            patron = r'\b' + re.escape(redundancia) + r'\b'
-            for match in re.finditer(patron, texto, re.IGNORECASE):
-                resultados.append((
-                    match.group(0),
-                    correccion,
-                    "Redundancia: eliminar palabra innecesaria"
-                ))
+        for inicio, fin, indice in self._BUSCADOR_REDUNDANCIAS.buscar(texto):
+            resultados.append((
+                texto[inicio:fin],
+                self._LISTA_REDUNDANCIAS[indice][1],
+                "Redundancia: eliminar palabra innecesaria"
+            ))
         
         return resultados
     
     # ═══════════════════════════════════════════════════════════════
     # GERUNDIOS INCORRECTOS
     # ═══════════════════════════════════════════════════════════════
-    def detectar_gerundios_incorrectos(self, texto: str) -> List[Tuple[str, str, str]]:
-        """Detecta usos incorrectos del gerundio."""
-        if not self.habilitado:
+    def detectar_gerundios_incorrectos(self, texto: str, doc=None) -> List[Tuple[str, str, str]]:
+        """
+        Detecta usos incorrectos del gerundio.
+        Si se pasa `doc` (ya analizado por SpaCy) no se vuelve a analizar el texto.
+        """
+        if not self.detector_disponible('gerundios'):
             return []
         
         resultados = []
-        doc = self.nlp(texto)
+        if doc is None:
+            doc = self.nlp(texto)
         
         for token in doc:
             # Detectar gerundios
@@ -384,11 +465,16 @@ class StyleCheckerV2:
     # ═══════════════════════════════════════════════════════════════
     # MÉTODO PRINCIPAL
     # ═══════════════════════════════════════════════════════════════
-    def analizar_estilo(self, texto: str) -> Dict[str, List[Tuple[str, str, str]]]:
-        """Realiza análisis completo de estilo."""
+    def analizar_estilo(self, texto: str, doc=None) -> Dict[str, List[Tuple[str, str, str]]]:
+        """
+        Realiza análisis completo de estilo.
+        El texto se analiza con SpaCy una sola vez para todos los detectores.
+        """
+        if doc is None and self._usa_spacy():
+            doc = self.nlp(texto)
         return {
-            'voz_pasiva': self.detectar_voz_pasiva(texto),
-            'gerundios': self.detectar_gerundios_incorrectos(texto),
+            'voz_pasiva': self.detectar_voz_pasiva(texto, doc),
+            'gerundios': self.detectar_gerundios_incorrectos(texto, doc),
             'queismo': self.detectar_queismo(texto),
             'dequeismo': self.detectar_dequeismo(texto),
             'laismo': self.detectar_laismo(texto),
@@ -396,6 +482,33 @@ class StyleCheckerV2:
             'cosismo': self.detectar_cosismo(texto),
             'redundancias': self.detectar_redundancias(texto),
         }
+    
+    def analizar_estilo_lote(self, textos: Iterable[str],
+                             tamano_lote: int = None) -> Iterator[Dict[str, List[Tuple[str, str, str]]]]:
+        """
+        Análisis de estilo de muchos párrafos a la vez.
+        SpaCy los procesa por lotes con nlp.pipe y cada Doc se comparte entre
+        todos los detectores. Los resultados se generan en el mismo orden
+        que los textos, a medida que se consumen.
+        
+        Args:
+            textos: Párrafos a analizar
+            tamano_lote: Párrafos por lote (por defecto TAMANO_LOTE)
+        """
+        if not self._usa_spacy():
+            for texto in textos:
+                yield self.analizar_estilo(texto)
+            return
+        
+        # as_tuples: los textos se consumen de forma perezosa, sin copiarlos a una lista
+        pares = self.nlp.pipe(((texto, texto) for texto in textos), as_tuples=True,
+                              batch_size=tamano_lote or self.TAMANO_LOTE)
+        for doc, texto in pares:
+            yield self.analizar_estilo(texto, doc)
+
+
+
+StyleCheckerV2._compilar_buscadores()
 
 
 if __name__ == '__main__':
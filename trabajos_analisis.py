@@ -0,0 +1,145 @@
+"""
+Trabajos de análisis en segundo plano para la aplicación web.
+La subida de un documento responde de inmediato y el análisis se ejecuta
+en un pool de hilos. El progreso se guarda en un archivo JSON por trabajo,
+de modo que cualquier proceso del servidor (Passenger arranca varios)
+puede responder a las consultas de progreso.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+import json
+import os
+import threading
+import time
+import traceback
+
+
+# Estados de un trabajo
+EN_COLA = 'en_cola'
+ANALIZANDO = 'analizando'
+COMPLETADO = 'completado'
+ERROR = 'error'
+
+# Función de progreso que recibe cada tarea: informar(hechos, total)
+Informar = Callable[[int, int], None]
+
+
+class GestorTrabajos:
+    """Ejecuta tareas en segundo plano y publica su progreso en disco."""
+
+    # Como mucho se reescribe el archivo de progreso cada INTERVALO_ESCRITURA segundos
+    INTERVALO_ESCRITURA = 0.5
+    # El estado de un trabajo con error se conserva este tiempo (segundos) para
+    # que la página de carga pueda mostrar el mensaje; luego se purga
+    RETENCION_ERRORES = 600
+
+    def __init__(self, carpeta: str, max_trabajos: int = 2):
+        """
+        Args:
+            carpeta: Carpeta donde se guarda el estado de cada trabajo
+            max_trabajos: Análisis simultáneos (el resto espera en cola)
+        """
+        self.carpeta = carpeta
+        os.makedirs(carpeta, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max_trabajos,
+                                        thread_name_prefix='analisis')
+
+    def _ruta_estado(self, id_trabajo: str) -> str:
+        return os.path.join(self.carpeta, f"{id_trabajo}.progreso.json")
+
+    def _escribir_estado(self, id_trabajo: str, estado: Dict):
+        """Escritura atómica: los lectores nunca ven un JSON a medias."""
+        ruta = self._ruta_estado(id_trabajo)
+        ruta_temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(ruta_temporal, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False)
+        os.replace(ruta_temporal, ruta)
+
+    def _borrar_estado(self, id_trabajo: str):
+        try:
+            os.remove(self._ruta_estado(id_trabajo))
+        except FileNotFoundError:
+            pass
+
+    def purgar(self):
+        """Borra los estados de trabajos con error más antiguos que RETENCION_ERRORES."""
+        limite = time.time() - self.RETENCION_ERRORES
+        for nombre in os.listdir(self.carpeta):
+            if not nombre.endswith('.progreso.json'):
+                continue
+            ruta = os.path.join(self.carpeta, nombre)
+            try:
+                if os.path.getmtime(ruta) >= limite:
+                    continue
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    if json.load(f).get('estado') != ERROR:
+                        continue
+                os.remove(ruta)
+            except (OSError, ValueError):
+                continue  # Otro proceso lo está sustituyendo o ya lo ha borrado
+
+    def lanzar(self, id_trabajo: str, tarea: Callable[[Informar], object]):
+        """
+        Encola una tarea. `tarea(informar)` debe llamar a informar(hechos, total)
+        según avanza. Al completarse, el archivo de estado se borra: la tarea
+        tiene que haber guardado su resultado en otro sitio (ver estado()).
+        """
+        self.purgar()
+        estado = {
+            'estado': EN_COLA,
+            'hechos': 0,
+            'total': 0,
+            'creado': time.time(),
+            'inicio': None,
+            'actualizado': time.time(),
+            'error': None,
+        }
+        self._escribir_estado(id_trabajo, estado)
+        self._pool.submit(self._ejecutar, id_trabajo, tarea, estado)
+
+    def _ejecutar(self, id_trabajo: str, tarea: Callable[[Informar], object], estado: Dict):
+        """Cuerpo del hilo: ejecuta la tarea y va publicando su progreso."""
+        estado.update(estado=ANALIZANDO, inicio=time.time(), actualizado=time.time())
+        self._escribir_estado(id_trabajo, estado)
+        ultima_escritura = [0.0]
+
+        def informar(hechos: int, total: int):
+            estado.update(hechos=hechos, total=total, actualizado=time.time())
+            ahora = time.monotonic()
+            if ahora - ultima_escritura[0] >= self.INTERVALO_ESCRITURA or hechos >= total:
+                ultima_escritura[0] = ahora
+                self._escribir_estado(id_trabajo, estado)
+
+        try:
+            tarea(informar)
+        except Exception as e:
+            print(f"❌ Error en el trabajo {id_trabajo}: {e}")
+            traceback.print_exc()
+            estado.update(estado=ERROR, error=str(e), actualizado=time.time())
+            self._escribir_estado(id_trabajo, estado)
+            return
+        # Completado: el resultado ya está guardado por la tarea
+        self._borrar_estado(id_trabajo)
+
+    def estado(self, id_trabajo: str) -> Optional[Dict]:
+        """
+        Estado actual del trabajo con porcentaje y tiempo restante estimado
+        (segundos), o None si el trabajo no existe o ya se completó (quien
+        consulta distingue ambos casos por el resultado que dejó la tarea).
+        """
+        try:
+            with open(self._ruta_estado(id_trabajo), 'r', encoding='utf-8') as f:
+                estado = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # Archivo en plena sustitución en algunos sistemas: se reintenta en la próxima consulta
+            return {'estado': EN_COLA, 'hechos': 0, 'total': 0, 'porcentaje': 0, 'eta_segundos': None}
+
+        hechos, total = estado.get('hechos', 0), estado.get('total', 0)
+        estado['porcentaje'] = round(100 * hechos / total, 1) if total else 0
+        estado['eta_segundos'] = None
+        if estado['estado'] == ANALIZANDO and estado.get('inicio') and 0 < hechos < total:
+            transcurrido = time.time() - estado['inicio']
+            estado['eta_segundos'] = round(transcurrido / hechos * (total - hechos), 1)
+        return estado
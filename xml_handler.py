@@ -4,10 +4,15 @@ Permite insertar Track Changes (w:ins, w:del) directamente en el XML.
 """
 from lxml import etree
 from datetime import datetime
-from typing import List, Tuple, Optional
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Set, Tuple, Optional, Union
+from copy import copy
+from bisect import bisect_right
+import io
+import re
+import struct
+import sys
 import zipfile
 import os
-import shutil
 
 
 # Namespaces de OpenXML
@@ -116,79 +121,329 @@ class TrackChangesHandler:
         return None
 
 
+# Un .docx puede llegar como ruta, como bytes o como archivo binario abierto
+Documento = Union[str, bytes, BinaryIO]
+
+
+# Parte principal del documento dentro del ZIP
+PARTE_DOCUMENTO = 'word/document.xml'
+
+# Partes con texto que también se corrigen, en el orden en que se analizan
+# (tras el cuerpo), con su nombre para la revisión
+PARTES_SECUNDARIAS = [
+    (re.compile(r'word/header(\d*)\.xml$'), 'Encabezado'),
+    (re.compile(r'word/footer(\d*)\.xml$'), 'Pie de página'),
+    (re.compile(r'word/footnotes\.xml$'), 'Notas al pie'),
+    (re.compile(r'word/endnotes\.xml$'), 'Notas finales'),
+    (re.compile(r'word/comments\.xml$'), 'Comentarios'),
+]
+
+
+def partes_con_texto(nombres: Iterable[str]) -> List[str]:
+    """
+    Partes del .docx que se analizan, de entre los nombres de sus miembros:
+    primero el cuerpo y después encabezados, pies, notas y comentarios
+    (header2 antes que header10).
+    """
+    nombres = list(nombres)
+    partes = [PARTE_DOCUMENTO] if PARTE_DOCUMENTO in nombres else []
+    for patron, _ in PARTES_SECUNDARIAS:
+        encontradas = []
+        for nombre in nombres:
+            m = patron.match(nombre)
+            if m:
+                numero = m.group(1) if m.groups() else ''
+                encontradas.append((int(numero or 0), nombre))
+        partes.extend(nombre for _, nombre in sorted(encontradas))
+    return partes
+
+
+def partes_del_documento(documento: Documento) -> Dict[str, int]:
+    """
+    Partes con texto de un .docx (ruta, bytes o archivo binario), en orden de
+    análisis, con su tamaño sin comprimir.
+    """
+    if isinstance(documento, (bytes, bytearray)):
+        documento = io.BytesIO(documento)
+    with zipfile.ZipFile(documento, 'r') as docx:
+        return {parte: docx.getinfo(parte).file_size for parte in partes_con_texto(docx.namelist())}
+
+
+def nombre_parte(parte: str) -> str:
+    """Nombre legible de una parte ('Cuerpo', 'Encabezado 2', 'Notas al pie'...)."""
+    if parte == PARTE_DOCUMENTO:
+        return 'Cuerpo'
+    for patron, nombre in PARTES_SECUNDARIAS:
+        m = patron.match(parte)
+        if m:
+            numero = m.group(1) if m.groups() else ''
+            return f"{nombre} {numero}" if numero else nombre
+    return parte
+
+# Tamaño fijo de la cabecera local de un miembro ZIP (antes del nombre y el extra)
+_TAM_CABECERA_LOCAL = 30
+# Bit de la cabecera que indica CRC y tamaños en un descriptor posterior
+_BIT_DESCRIPTOR = 0x08
+
+
+# Versiones de Python en las que se ha comprobado la copia en crudo (usa el
+# estado interno de zipfile.ZipFile: fp, filelist, NameToInfo, start_dir...).
+# En cualquier otra se recomprime cada miembro por la vía pública.
+VERSIONES_COPIA_CRUDA = {(3, 8), (3, 9), (3, 10), (3, 11), (3, 12), (3, 13)}
+
+
+def copia_cruda_disponible() -> bool:
+    """Indica si este intérprete es uno de los probados para la copia en crudo."""
+    return sys.version_info[:2] in VERSIONES_COPIA_CRUDA
+
+
+def _copiar_miembro_crudo(zip_entrada: zipfile.ZipFile, zip_salida: zipfile.ZipFile,
+                          info: zipfile.ZipInfo):
+    """
+    Copia un miembro de un ZIP a otro sin descomprimirlo ni volver a
+    comprimirlo: se escriben tal cual los bytes comprimidos, con una
+    cabecera local nueva que ya lleva el CRC y los tamaños.
+    Solo en las versiones de VERSIONES_COPIA_CRUDA (ver test_reescribir_docx).
+    """
+    fp = zip_entrada.fp
+    fp.seek(info.header_offset)
+    cabecera = fp.read(_TAM_CABECERA_LOCAL)
+    largo_nombre, largo_extra = struct.unpack('<HH', cabecera[26:30])
+    fp.seek(info.header_offset + _TAM_CABECERA_LOCAL + largo_nombre + largo_extra)
+    datos = fp.read(info.compress_size)
+
+    nueva = copy(info)
+    nueva.flag_bits &= ~_BIT_DESCRIPTOR
+    nueva.header_offset = zip_salida.fp.tell()
+    zip_salida.fp.write(nueva.FileHeader())
+    zip_salida.fp.write(datos)
+    zip_salida.filelist.append(nueva)
+    zip_salida.NameToInfo[nueva.filename] = nueva
+    zip_salida.start_dir = zip_salida.fp.tell()
+    zip_salida._didModify = True
+
+
+def _copiar_miembro(zip_entrada: zipfile.ZipFile, zip_salida: zipfile.ZipFile,
+                    info: zipfile.ZipInfo):
+    """Copia un miembro por la API pública, con su mismo método de compresión."""
+    nueva = zipfile.ZipInfo(info.filename, info.date_time)
+    nueva.compress_type = info.compress_type
+    nueva.external_attr = info.external_attr
+    nueva.comment = info.comment
+    zip_salida.writestr(nueva, zip_entrada.read(info))
+
+
+def reescribir_docx(zip_entrada: zipfile.ZipFile, salida, partes: Dict[str, bytes]):
+    """
+    Escribe una copia del .docx sustituyendo solo las partes indicadas.
+    Los miembros sin cambios (imágenes, estilos, fuentes...) se copian en
+    crudo, en el mismo orden; solo las partes modificadas se comprimen.
+
+    Args:
+        zip_entrada: Documento original abierto
+        salida: Ruta o archivo (binario, con seek) de destino
+        partes: Contenido nuevo de cada parte modificada, por nombre
+    """
+    copiar = _copiar_miembro_crudo if copia_cruda_disponible() else _copiar_miembro
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as zip_salida:
+        for info in zip_entrada.infolist():
+            if info.filename in partes:
+                nueva = zipfile.ZipInfo(info.filename, info.date_time)
+                nueva.compress_type = zipfile.ZIP_DEFLATED
+                nueva.external_attr = info.external_attr
+                zip_salida.writestr(nueva, partes[info.filename])
+            else:
+                copiar(zip_entrada, zip_salida, info)
+
+
+# (inicio, fin, w:t, run, posición del w:t entre los hijos del run)
+SegmentoTexto = Tuple[int, int, etree._Element, etree._Element, int]
+
+
+class IndiceRuns:
+    """
+    Índice de desplazamientos de un párrafo: para cada w:t, su tramo en el
+    texto del párrafo, su run y su posición dentro del run. Se construye con
+    un solo recorrido y permite localizar un carácter con búsqueda binaria.
+    
+    Los elementos w:t se recorren en el mismo orden que obtener_texto_parrafo.
+    Si se modifica el párrafo, el índice solo sigue siendo válido para los
+    desplazamientos anteriores al primer cambio.
+    """
+    
+    __slots__ = ('parrafo', 'segmentos', 'inicios', 'texto')
+    
+    def __init__(self, parrafo: etree._Element):
+        self.parrafo = parrafo
+        self.segmentos: List[SegmentoTexto] = []
+        self.inicios: List[int] = []
+        
+        textos = []
+        posicion = 0
+        run_actual = None
+        hijos = {}
+        for w_t in parrafo.iter(f'{{{NAMESPACES["w"]}}}t'):
+            run = w_t.getparent()
+            if run is not run_actual:
+                # Posiciones de los hijos del run, una vez por run
+                run_actual = run
+                hijos = {hijo: n for n, hijo in enumerate(run)}
+            texto = w_t.text or ''
+            self.inicios.append(posicion)
+            self.segmentos.append((posicion, posicion + len(texto), w_t, run, hijos[w_t]))
+            textos.append(texto)
+            posicion += len(texto)
+        self.texto = ''.join(textos)
+    
+    def buscar(self, desplazamiento: int) -> int:
+        """
+        Número del segmento que contiene el carácter `desplazamiento`
+        (se saltan los w:t vacíos), o -1 si queda fuera del texto.
+        """
+        n = bisect_right(self.inicios, desplazamiento) - 1
+        while 0 <= n < len(self.segmentos) and self.segmentos[n][1] <= desplazamiento:
+            n += 1
+        if n < 0 or n >= len(self.segmentos):
+            return -1
+        return n
+    
+    def siguiente(self, desplazamiento: int) -> int:
+        """Número del primer segmento que empieza después de `desplazamiento`."""
+        return bisect_right(self.inicios, desplazamiento)
+    
+    def localizar(self, desplazamiento: int) -> Optional[Tuple[etree._Element, int, int]]:
+        """
+        Localiza un carácter del párrafo.
+        
+        Returns:
+            (run, posición del w:t en el run, desplazamiento dentro del w:t),
+            o None si queda fuera del texto
+        """
+        n = self.buscar(desplazamiento)
+        if n < 0:
+            return None
+        inicio, _, _, run, posicion = self.segmentos[n]
+        return run, posicion, desplazamiento - inicio
+
+
 class DocxXMLHandler:
     """Manejador de bajo nivel para archivos .docx (OpenXML)."""
     
-    def __init__(self, ruta_docx: str):
+    def __init__(self, ruta_docx: Documento):
         """
         Inicializa el manejador.
         
         Args:
-            ruta_docx: Ruta del archivo .docx
+            ruta_docx: Ruta del archivo .docx, su contenido en bytes o un
+                       archivo binario con seek (p. ej. una subida web)
         """
+        if isinstance(ruta_docx, (bytes, bytearray)):
+            ruta_docx = io.BytesIO(ruta_docx)
         self.ruta_docx = ruta_docx
-        self.ruta_temp = None
+        self.zip = None
         self.document_xml = None
         self.tree = None
+        # Árboles de las partes XML cargadas y las que se han modificado
+        # (solo éstas se reescriben al guardar; ver marcar_modificada)
+        self.arboles: Dict[str, etree._ElementTree] = {}
+        self.modificadas: Set[str] = set()
+        # Índices de desplazamientos por párrafo (ver indice_parrafo)
+        self._indices: Dict[etree._Element, IndiceRuns] = {}
     
     def __enter__(self):
-        """Context manager: abrir documento."""
-        # Usar directorio temporal del sistema (evita problemas de permisos en Windows)
-        import tempfile
-        self.ruta_temp = tempfile.mkdtemp(prefix='docx_antigravity_')
-        
-        # Descomprimir .docx (es un ZIP)
-        with zipfile.ZipFile(self.ruta_docx, 'r') as zip_ref:
-            zip_ref.extractall(self.ruta_temp)
-        
-        # Cargar word/document.xml
-        doc_xml_path = os.path.join(self.ruta_temp, 'word', 'document.xml')
-        self.tree = etree.parse(doc_xml_path)
+        """
+        Context manager: abrir documento.
+        No se descomprime nada a disco: solo se leen del ZIP las partes XML
+        que se necesitan (word/document.xml al abrir; el resto, al pedirlas).
+        """
+        self.zip = zipfile.ZipFile(self.ruta_docx, 'r')
+        try:
+            self.tree = self.cargar_parte(PARTE_DOCUMENTO)
+        except Exception:
+            self.zip.close()
+            raise
         self.document_xml = self.tree.getroot()
         
         return self
     
+    def partes(self) -> List[str]:
+        """Partes con texto del documento (cuerpo, encabezados, pies, notas, comentarios)."""
+        return partes_con_texto(self.zip.namelist())
+    
+    def cargar_parte(self, parte: str) -> etree._ElementTree:
+        """Árbol de una parte XML (se lee del ZIP la primera vez que se pide)."""
+        arbol = self.arboles.get(parte)
+        if arbol is None:
+            with self.zip.open(parte) as contenido:
+                arbol = etree.parse(contenido)
+            self.arboles[parte] = arbol
+        return arbol
+    
+    def marcar_modificada(self, parte: str = PARTE_DOCUMENTO):
+        """Indica que el árbol de una parte ha cambiado y debe reescribirse al guardar."""
+        self.modificadas.add(parte)
+    
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """Context manager: cerrar y limpiar."""
-        if self.ruta_temp and os.path.exists(self.ruta_temp):
-            try:
-                shutil.rmtree(self.ruta_temp, ignore_errors=True)
-            except Exception:
-                pass  # Silenciar errores de limpieza
+        """Context manager: cerrar el ZIP."""
+        if self.zip is not None:
+            self.zip.close()
+            self.zip = None
+        self._indices.clear()
         return False
     
-    def guardar(self, ruta_salida: str):
+    def guardar(self, ruta_salida: Union[str, BinaryIO]):
         """
         Guarda el documento modificado.
+        Solo se serializan y recomprimen las partes marcadas como modificadas;
+        el resto de miembros (también las partes cargadas solo para leer) se
+        copia en crudo desde el original. Si no se ha marcado ninguna, se
+        reescriben todas las cargadas (para quien modifica sin marcar).
         
         Args:
-            ruta_salida: Ruta donde guardar el .docx
-        """
-        # Escribir el XML modificado
-        doc_xml_path = os.path.join(self.ruta_temp, 'word', 'document.xml')
-        self.tree.write(
-            doc_xml_path,
-            encoding='utf-8',
-            xml_declaration=True,
-            standalone=True
-        )
-        
-        # Recomprimir como ZIP (.docx)
-        with zipfile.ZipFile(ruta_salida, 'w', zipfile.ZIP_DEFLATED) as docx:
-            for root, dirs, files in os.walk(self.ruta_temp):
-                for file in files:
-                    archivo_completo = os.path.join(root, file)
-                    arcname = os.path.relpath(archivo_completo, self.ruta_temp)
-                    docx.write(archivo_completo, arcname)
-    
-    def obtener_parrafos(self) -> List[etree.Element]:
+            ruta_salida: Ruta donde guardar el .docx (puede ser la de entrada)
+                         o archivo binario con seek donde escribirlo
+        """
+        modificadas = self.modificadas or self.arboles.keys()
+        partes = {
+            parte: etree.tostring(
+                self.arboles[parte],
+                encoding='utf-8',
+                xml_declaration=True,
+                standalone=True
+            )
+            for parte in modificadas if parte in self.arboles
+        }
+        
+        if not isinstance(ruta_salida, str):
+            reescribir_docx(self.zip, ruta_salida, partes)
+            return
+        
+        # Se escribe a un temporal y se sustituye: el original sigue abierto
+        ruta_temporal = f"{ruta_salida}.{os.getpid()}.tmp"
+        try:
+            reescribir_docx(self.zip, ruta_temporal, partes)
+            os.replace(ruta_temporal, ruta_salida)
+        finally:
+            if os.path.exists(ruta_temporal):
+                os.remove(ruta_temporal)
+    
+    def guardar_en_bytes(self) -> bytes:
+        """Devuelve el documento modificado como bytes, sin tocar el disco."""
+        salida = io.BytesIO()
+        self.guardar(salida)
+        return salida.getvalue()
+    
+    def obtener_parrafos(self, parte: str = PARTE_DOCUMENTO) -> List[etree.Element]:
         """
         Obtiene todos los párrafos (w:p) del documento.
         
+        Args:
+            parte: Parte XML (por defecto el cuerpo, word/document.xml)
+        
         Returns:
             Lista de elementos w:p
         """
-        return self.document_xml.findall(f".//{{{NAMESPACES['w']}}}p")
+        return self.cargar_parte(parte).getroot().findall(f".//{{{NAMESPACES['w']}}}p")
     
     def obtener_texto_parrafo(self, parrafo: etree.Element) -> str:
         """
@@ -202,6 +457,111 @@ class DocxXMLHandler:
         """
         textos = parrafo.findall(f".//{{{NAMESPACES['w']}}}t")
         return ''.join([t.text or '' for t in textos])
+    
+    def indice_parrafo(self, parrafo: etree.Element) -> IndiceRuns:
+        """
+        Índice de desplazamientos del párrafo (carácter → run, posición en el
+        run, desplazamiento local). Se construye la primera vez y se reutiliza;
+        tras modificar el párrafo hay que llamar a invalidar_indice.
+        """
+        indice = self._indices.get(parrafo)
+        if indice is None:
+            indice = IndiceRuns(parrafo)
+            self._indices[parrafo] = indice
+        return indice
+    
+    def invalidar_indice(self, parrafo: etree.Element):
+        """Descarta el índice de un párrafo que se ha modificado."""
+        self._indices.pop(parrafo, None)
+
+
+class _LecturaContada(io.RawIOBase):
+    """Envoltorio de lectura que cuenta los bytes leídos (para estimar el avance)."""
+
+    def __init__(self, origen: BinaryIO):
+        self.origen = origen
+        self.leidos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, n: int = -1) -> bytes:
+        datos = self.origen.read(n)
+        self.leidos += len(datos)
+        return datos
+
+
+class LectorParrafos:
+    """
+    Lector en streaming del texto de los párrafos de una parte XML, para el
+    análisis (que nunca modifica el árbol). Recorre el XML con
+    etree.iterparse y libera cada párrafo en cuanto se ha leído, así que la
+    memoria no crece con el tamaño del documento y el análisis puede empezar
+    antes de terminar de leerlo.
+
+    Entrega (índice, texto) con los mismos índices y textos que
+    DocxXMLHandler.obtener_parrafos / obtener_texto_parrafo.
+    """
+
+    def __init__(self, documento: Documento, parte: str = PARTE_DOCUMENTO):
+        """
+        Args:
+            documento: Ruta, bytes o archivo binario del .docx
+            parte: Parte XML que se lee
+        """
+        if isinstance(documento, (bytes, bytearray)):
+            documento = io.BytesIO(documento)
+        self.documento = documento
+        self.parte = parte
+        self.leidos = 0
+        self.tamano = 0
+        self.terminado = False
+
+    @property
+    def fraccion_leida(self) -> float:
+        """Fracción (0-1) del XML sin comprimir leída hasta ahora."""
+        if self.terminado:
+            return 1.0
+        return self.leidos / self.tamano if self.tamano else 0.0
+
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        tag_p = f"{{{NAMESPACES['w']}}}p"
+        tag_t = f"{{{NAMESPACES['w']}}}t"
+
+        with zipfile.ZipFile(self.documento, 'r') as docx:
+            self.tamano = docx.getinfo(self.parte).file_size
+            with docx.open(self.parte) as origen:
+                lectura = _LecturaContada(origen)
+                # Índice asignado al abrir cada w:p (mismo orden que findall('.//w:p')).
+                # Un párrafo puede contener otros (cuadros de texto): el interior
+                # termina antes, así que los textos se entregan en orden de índice
+                abiertos = []
+                pendientes = {}
+                siguiente = 0
+                contador = 0
+
+                for evento, elemento in etree.iterparse(lectura, events=('start', 'end'), tag=tag_p):
+                    self.leidos = lectura.leidos
+                    if evento == 'start':
+                        abiertos.append(contador)
+                        contador += 1
+                        continue
+
+                    indice = abiertos.pop()
+                    pendientes[indice] = ''.join(t.text or '' for t in elemento.iter(tag_t))
+
+                    # Solo se libera un párrafo exterior: el texto de los
+                    # interiores forma parte del suyo
+                    if not abiertos:
+                        elemento.clear()
+                        while elemento.getprevious() is not None:
+                            del elemento.getparent()[0]
+
+                    while siguiente in pendientes:
+                        yield siguiente, pendientes.pop(siguiente)
+                        siguiente += 1
+
+        self.terminado = True
 
 
 def test_xml_handler():
@@ -222,5 +582,61 @@ def test_xml_handler():
     print("✓ Tests básicos pasados")
 
 
+def test_reescribir_docx():
+    """
+    Ida y vuelta de reescribir_docx: el ZIP resultante se reabre y se
+    comprueba el CRC y el contenido de cada miembro (también los copiados
+    en crudo y los que en el original llevaban descriptor de datos).
+    """
+    print("Test de reescribir_docx...")
+    miembros = {
+        '[Content_Types].xml': (b'<Types/>', zipfile.ZIP_DEFLATED),
+        'word/document.xml': (b'<w:document/>' * 50, zipfile.ZIP_DEFLATED),
+        'word/media/image1.png': (bytes(range(256)) * 20, zipfile.ZIP_STORED),
+        'word/styles.xml': (b'<w:styles/>' * 30, zipfile.ZIP_DEFLATED),
+    }
+    class SinSeek(io.RawIOBase):
+        """Salida sin seek: zipfile escribe descriptores de datos."""
+        def __init__(self):
+            self.datos = io.BytesIO()
+        def writable(self):
+            return True
+        def write(self, b):
+            return self.datos.write(b)
+
+    miembros['word/footnotes.xml'] = (b'<w:footnotes/>' * 40, zipfile.ZIP_DEFLATED)
+    flujo = SinSeek()
+    with zipfile.ZipFile(flujo, 'w', zipfile.ZIP_DEFLATED) as z:
+        for nombre, (datos, metodo) in miembros.items():
+            z.writestr(zipfile.ZipInfo(nombre), datos, compress_type=metodo)
+    original = io.BytesIO(flujo.datos.getvalue())
+    with zipfile.ZipFile(original) as z:
+        assert all(i.flag_bits & _BIT_DESCRIPTOR for i in z.infolist())
+
+    nuevo = b'<w:document>nuevo</w:document>'
+    for copiar in (_copiar_miembro_crudo, _copiar_miembro):
+        salida = io.BytesIO()
+        with zipfile.ZipFile(original) as entrada, \
+                zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as zip_salida:
+            for info in entrada.infolist():
+                if info.filename == 'word/document.xml':
+                    zip_salida.writestr(info.filename, nuevo)
+                else:
+                    copiar(entrada, zip_salida, info)
+        with zipfile.ZipFile(io.BytesIO(salida.getvalue())) as resultado:
+            assert resultado.testzip() is None, "CRC incorrecto"
+            assert resultado.namelist() == list(miembros), resultado.namelist()
+            for nombre, (datos, metodo) in miembros.items():
+                esperado = nuevo if nombre == 'word/document.xml' else datos
+                assert resultado.read(nombre) == esperado, nombre
+                if nombre != 'word/document.xml':
+                    assert resultado.getinfo(nombre).compress_type == metodo, nombre
+        print(f"✓ {copiar.__name__}: CRC y contenido correctos")
+
+    print(f"✓ Copia en crudo {'activa' if copia_cruda_disponible() else 'desactivada'} "
+          f"en Python {sys.version_info[0]}.{sys.version_info[1]}")
+
+
 if __name__ == '__main__':
     test_xml_handler()
+    test_reescribir_docx()